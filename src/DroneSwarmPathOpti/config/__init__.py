@@ -1,3 +1,7 @@
 from .config_manager import get_settings
 
-__all__ = ['get_settings']
\ No newline at end of file
+from .random_streams import random_stream
+from .random_streams import seed_sequence
+from .random_streams import STREAM_ENVIRONMENT, STREAM_SWARM, STREAM_PARTICLE, STREAM_OPTIMIZER, STREAM_ROBUSTNESS, STREAM_TUNING
+
+__all__ = ['get_settings', 'random_stream', 'seed_sequence', 'STREAM_ENVIRONMENT', 'STREAM_SWARM', 'STREAM_PARTICLE', 'STREAM_OPTIMIZER', 'STREAM_ROBUSTNESS', 'STREAM_TUNING']
\ No newline at end of file
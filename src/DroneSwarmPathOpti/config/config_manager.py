@@ -28,8 +28,12 @@ class Settings(BaseSettings):
     ENVIRONMENT_SIZE_Y: int = 100 # Height of the environment
 
     ENVIRONMENT_TRAVERSABLE: bool = True # Forces at least one path without any collisions from start to goal (NOTE: depending on environment size and number of obstacles, the calculation power needed can be exceedingly high.)
+    ENVIRONMENT_GRID_CONNECTIVITY: int = 8 # Neighbors of a cell when validating the map -> 4 (horizontal and vertical) or 8 (diagonal as well)
+    ENVIRONMENT_GRID_HIERARCHICAL: bool = False # Validate the map on a coarse grid first and refine the path inside a corridor (faster on large maps)
     NUMBER_OBSTACLES: int = 10 # Number of obstacles in the environment
     AVG_SIZE_OBSTACLE: int = 20 # Average size of all the obstacles
+    ENVIRONMENT_ROADMAP_VERTICES: int = 8 # Vertices of the polygon surrounding every obstacle in the roadmap (visibility graph)
+    ENVIRONMENT_CACHE_DIR: str = '' # Directory in which seeded environments are cached and reused by later runs -> empty for no caching
 
     START_X: int = 10 # Starting point X-coordinate
     START_Y: int = 10 # Starting point Y-coordinate
@@ -48,6 +52,9 @@ class Settings(BaseSettings):
     PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY: float = 0.3 # Max drone velocity when initializing for the first time
     PSO_INITIAL_POSITION_BOUNDS: float = 30 # Area around an initial point when generating in which the actual point generates for the first time
     PSO_INITIAL_DISTANCE_PATHS: float = 10 # Probable distance between different drone paths when initializing for the first time
+    PSO_INITIAL_SAMPLING: str = 'uniform' # Sampling method of the initial positions around their anchor points -> 'uniform', 'sobol' or 'latin_hypercube'
+    PSO_INITIAL_PATH_SHARE: float = 0.0 # Portion of particles initialized along a collision free path (the rest is initialized around the anchor points)
+    PSO_INITIAL_PATH_SOURCE: str = 'validation' # Collision free path to seed particles with -> 'validation' (validation path of a traversable environment) or 'roadmap' (shortest path through the environment's roadmap)
 
     PSO_MAX_VELOCITY_X: float = 5.0 # Max velocity of a particle (X)
     PSO_MAX_VELOCITY_Y: float = 5.0 # Max velocity of a particle (Y)
@@ -56,6 +63,35 @@ class Settings(BaseSettings):
 
     PSO_FLUSH_SHARE: float = 0.03 # Portion of particles to be flushed each generation
     PSO_FLUSH_WHEN: float = 0.5 # After how many generations will the flush occur for the first time (depending on the max number of iterations)
+    PSO_REPLAN_ITERATIONS: int = 20 # Number of iterations the optimization continues for when re-planning after the environment changed
+
+    PSO_REFINE_START_CONTROL_POINTS: int = 0 # Number of points in a single drone path when the optimization starts, points are inserted up to INITIAL_CONTROL_POINTS during the optimization -> 0 to start with INITIAL_CONTROL_POINTS
+    PSO_REFINE_STEPS: int = 2 # Number of times points are inserted into the drone paths
+    PSO_REFINE_WHEN: float = 0.5 # After how many generations will the last points be inserted (depending on the max number of iterations)
+
+    PSO_LOCAL_SEARCH_EVERY: int = 0 # Refine the global best with a gradient-based local search (L-BFGS-B on a smooth fitness) every n iterations -> 0 for no local search
+    PSO_LOCAL_SEARCH_MAX_ITERATIONS: int = 20 # Maximum number of iterations of a single local search
+
+    PSO_SURROGATE_ENABLED: bool = False # Predict the fitness of particles from evaluated positions (k nearest neighbours) and only evaluate promising or uncertain particles (not in multi-objective mode)
+    PSO_SURROGATE_NEIGHBORS: int = 5 # Number of evaluated positions a prediction is based on
+    PSO_SURROGATE_CAPACITY: int = 2000 # Number of most recently evaluated positions the surrogate keeps
+    PSO_SURROGATE_CONFIDENCE: float = 1.0 # A particle is evaluated if its predicted fitness minus this many times the uncertainty is below its personal best -> higher to evaluate more often
+
+    PSO_MULTI_OBJECTIVE: bool = False # Keep an archive of non-dominated solutions (time, energy, collisions with obstacles, collisions between drones) from which any weighting can be selected after the run
+    PSO_ARCHIVE_SIZE: int = 100 # Maximum number of solutions in the archive of the multi-objective mode
+
+    PSO_COOPERATIVE: bool = False # Optimize the path of every drone in its own sub-swarm, rated against the best paths of the other drones (cooperative coevolution) -> for large fleets
+    PSO_ASYNC_WORKERS: int = 0 # Evaluate the particles in this many worker processes without waiting for the whole swarm: every particle moves on as soon as its own evaluation returns (not reproducible with more than one worker) -> 0 for the generation-synchronous PSO
+
+    PSO_HORIZON_ENABLED: bool = False # Optimize the paths window by window along a guide path (receding horizon) instead of as one problem -> for very large maps
+    PSO_HORIZON_WINDOW_LENGTH: float = 60.0 # Length of the guide path covered by a window
+    PSO_HORIZON_COMMIT: int = 2 # Number of control points per drone committed after every window (at most INITIAL_CONTROL_POINTS)
+    PSO_HORIZON_ITERATIONS: int = 40 # Number of iterations the particle swarm optimization of a window will perform
+
+    OPTIMIZER_BACKEND: str = 'pso' # Optimizer searching the drone paths -> 'pso' (particle swarm optimization), 'vectorized_pso' (PSO on arrays of the whole swarm), 'de' (differential evolution) or 'cma_es' (covariance matrix adaptation)
+    DE_WEIGHT: float = 0.5 # Differential weight of the 'de' backend (scales the difference of two candidates added to a third)
+    DE_CROSSOVER: float = 0.9 # Crossover probability of the 'de' backend (portion of coordinates taken from the mutant)
+    CMA_ES_SIGMA: float = 0.1 # Initial step size of the 'cma_es' backend (share of the map size and the max drone speed)
 
     PSO_DECREASE_MAX_VELOCITY_WHEN: float = 0.5 # After how many generations will the max velocity begin to adapt (depending on the max number of iterations)
     PSO_DECREASE_MAX_VELOCITY_GOAL: float = 3.0 # Max velocity value to gradually be approached through the generations
@@ -75,6 +111,47 @@ class Settings(BaseSettings):
     FITNESS_WEIGHT_TIME: float = 1.0 # How important is time usage
     FITNESS_WEIGHT_COLLISIONS_OBSTACLES: float = 1.0 # How important is obstacle collision prevention
     FITNESS_WEIGHT_COLLISIONS_DRONES: float = 1.0 # How important is drone collision prevention
+    FITNESS_ANALYTIC_COLLISIONS: bool = False # Use exact collision durations (polynomial root finding) instead of counting sampled collisions
+    FITNESS_ROBUST_SAMPLES: int = 0 # Rate particles by their mean collision durations in this many perturbed environments (see ROBUSTNESS PARAMETERS) -> 0 to rate them in the exact environment
+
+    # ROBUSTNESS PARAMETERS
+    ROBUSTNESS_SAMPLES: int = 0 # Number of perturbed environments the final solution is evaluated in (collision probability and clearances) -> 0 for no robustness evaluation
+    ROBUSTNESS_OBSTACLE_JITTER: float = 1.0 # Standard deviation of the obstacle centres in a perturbed environment
+    ROBUSTNESS_RADIUS_JITTER: float = 0.5 # Standard deviation of the obstacle radii in a perturbed environment
+    ROBUSTNESS_TIME_JITTER: float = 1.0 # Standard deviation of the time offset of every drone in a perturbed environment
+    ROBUSTNESS_RATE: float = 2.0 # Samples per time unit of the trajectories compared in all perturbed environments
+
+    # TUNING PARAMETERS
+    TUNING_METHOD: str = 'hyperband' # Method of the tuning driver -> 'hyperband' or 'successive_halving'
+    TUNING_CONFIGURATIONS: int = 27 # Number of sampled configurations of successive halving (Hyperband derives the number of every bracket itself)
+    TUNING_MIN_ITERATIONS: int = 20 # Iterations of the first rung, increased by TUNING_ETA from rung to rung up to PSO_ITERATIONS
+    TUNING_ETA: int = 3 # Only the best 1/TUNING_ETA configurations of a rung advance to the next one
+    TUNING_ENVIRONMENTS: int = 3 # Number of seeded environments every configuration is rated on (seeds following SEED_ENVIRONMENT)
+    TUNING_WORKERS: int = 0 # Number of worker processes running the configurations -> 0 for one per CPU
+    TUNING_RESULTS_FILE: str = 'tuning.csv' # File the ranked configurations are written to -> empty for no file
+
+    # SCENARIO BANK PARAMETERS
+    SCENARIO_BANK_FILE: str = '' # Scenario bank the environment is loaded from instead of generating it (written by droneswarm-bank) -> empty to generate the environment
+    SCENARIO_BANK_INDEX: int = 0 # Index of the scenario loaded from the bank (the tuning rates configurations on the scenarios following it)
+    SCENARIO_BANK_SIZE: int = 1000 # Number of scenarios generated by droneswarm-bank (seeded by SEED_ENVIRONMENT, shaped by the environment parameters)
+    SCENARIO_BANK_BLOCK_SIZE: int = 256 # Number of candidate maps generated at once by a worker
+    SCENARIO_BANK_WORKERS: int = 0 # Number of worker processes generating the scenario bank -> 0 for one per CPU
+
+    # TELEMETRY PARAMETERS
+    TELEMETRY_FILE: str = '' # File the per-iteration metrics of an optimization are streamed to -> empty for no telemetry
+    TELEMETRY_FORMAT: str = 'jsonl' # Format of the telemetry file -> 'jsonl' or 'binary' (float64 rows, fields described in <file>.json)
+
+    # EVALUATION TRACE PARAMETERS
+    TRACE_FILE: str = '' # File every evaluated particle of an optimization is recorded to (float32 rows, layout described in <file>.json) -> empty for no trace
+    TRACE_BUFFER_ROWS: int = 65536 # Number of evaluations collected before they are written to the trace file at once
+
+    # TRAJECTORY EXPORT PARAMETERS
+    TRAJECTORY_EXPORT_FILE: str = '' # File the sampled trajectories of the final solution are exported to -> empty for no export
+    TRAJECTORY_EXPORT_FORMAT: str = 'binary' # Format of the trajectory file -> 'binary' (float32 columns, memory-mappable, header in <file>.json) or 'npz'
+    TRAJECTORY_EXPORT_RATE: float = 10.0 # Samples per time unit of the exported trajectories
+
+    # VISUALIZATION PARAMETERS
+    PLOT_TIME_STEPS: int = 200 # Number of steps of the time slider, the positions of all drones are precomputed for every step
 
 @lru_cache # Only create the first instance and return the cached instance otherwise
 def get_settings() -> Settings:
@@ -0,0 +1,41 @@
+"""
+Reproducible random number streams.
+
+Every consumer of random numbers draws from its own stream instead of a shared module-level generator. A stream is
+addressed by the configured seed, a domain and an arbitrary key (e.g. the index of a particle) and derived with
+`SeedSequence` exactly like `SeedSequence(seed).spawn(...)` would derive it. The numbers a particle, an environment or a
+worker receives therefore only depend on the seed and its address, never on the order of evaluation or on how the work
+is distributed across threads or processes.
+"""
+
+import numpy as np
+
+STREAM_ENVIRONMENT: int = 0 # Generation of environments (obstacles)
+STREAM_SWARM: int = 1 # Initialization of a swarm
+STREAM_PARTICLE: int = 2 # Movement of a single particle
+STREAM_OPTIMIZER: int = 3 # Decisions of an optimizer affecting the whole swarm
+STREAM_ROBUSTNESS: int = 5 # Perturbed scenarios of robustness evaluations
+STREAM_TUNING: int = 6 # Configurations sampled by the tuning
+
+
+def seed_sequence(seed: int, domain: int, *key: int) -> np.random.SeedSequence:
+    """
+    Derives the seed sequence of a stream. The result equals spawning children from `SeedSequence(seed)` along the path (domain, *key).
+
+    :param seed: The configured seed, -1 for no seed (fresh entropy from the operating system).
+    :param domain: Domain of the stream (one of the STREAM_* constants).
+    :param key: Further non-negative integers addressing the stream inside its domain.
+    :return: The seed sequence.
+    """
+    return np.random.SeedSequence(None if seed == -1 else seed, spawn_key=(domain, *key))
+
+def random_stream(seed: int, domain: int, *key: int) -> np.random.Generator:
+    """
+    Creates the generator of a stream.
+
+    :param seed: The configured seed, -1 for no seed (fresh entropy from the operating system).
+    :param domain: Domain of the stream (one of the STREAM_* constants).
+    :param key: Further non-negative integers addressing the stream inside its domain.
+    :return: The generator.
+    """
+    return np.random.default_rng(seed_sequence(seed, domain, *key))
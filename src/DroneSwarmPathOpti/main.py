@@ -1,10 +1,18 @@
 import asyncio
+import os
 
 from DroneSwarmPathOpti.config import get_settings
+from DroneSwarmPathOpti.optimization.asynchronous import AsynchronousPSO
+from DroneSwarmPathOpti.optimization.backends import create_optimizer
+from DroneSwarmPathOpti.optimization.coevolution import CooperativePSO
 from DroneSwarmPathOpti.optimization.fitness import calculate_fitness
 from DroneSwarmPathOpti.optimization.pso import PSO
+from DroneSwarmPathOpti.optimization.receding_horizon import RecedingHorizonPlanner
+from DroneSwarmPathOpti.optimization.robustness import RobustnessEvaluator
+from DroneSwarmPathOpti.optimization.tuning import tune
 from DroneSwarmPathOpti.project_logger import log_info, Source, log_debug
 from DroneSwarmPathOpti.simulation import Environment, Drone, CubicBSpline
+from DroneSwarmPathOpti.simulation.environment_utils import export_trajectories, generate_scenario_bank
 from DroneSwarmPathOpti.visualization.plot import plot_environment
 
 settings = get_settings()
@@ -21,6 +29,33 @@ def cli_main():
     """
     asyncio.run(main())
 
+def cli_tune():
+    """
+    CLI entry point for tuning the PSO settings on seeded environments (see optimization.tuning).
+    """
+    tune()
+
+def cli_bank():
+    """
+    CLI entry point for generating a scenario bank of many environments shaped by the config (see environment_utils.scenario_bank).
+    """
+    log_info(Source.main, 'Generating %d scenarios...', settings.SCENARIO_BANK_SIZE)
+    path: str = settings.SCENARIO_BANK_FILE or 'scenarios.bank'
+    candidates: int = generate_scenario_bank(
+        path,
+        settings.SCENARIO_BANK_SIZE,
+        settings.SEED_ENVIRONMENT,
+        (settings.ENVIRONMENT_SIZE_X, settings.ENVIRONMENT_SIZE_Y),
+        (settings.START_X, settings.START_Y, settings.START_RADIUS),
+        (settings.GOAL_X, settings.GOAL_Y, settings.GOAL_RADIUS),
+        settings.NUMBER_OBSTACLES,
+        settings.AVG_SIZE_OBSTACLE,
+        settings.ENVIRONMENT_TRAVERSABLE,
+        settings.SCENARIO_BANK_BLOCK_SIZE,
+        settings.SCENARIO_BANK_WORKERS or os.cpu_count() or 1
+    )
+    log_info(Source.main, 'Wrote %d scenarios (%d candidate maps) to %s', settings.SCENARIO_BANK_SIZE, candidates, path)
+
 async def initialize_async():
     drones: list[Drone] = [
         Drone(None,
@@ -40,11 +75,25 @@ async def initialize_async():
         (settings.GOAL_X, settings.GOAL_Y),
         settings.GOAL_RADIUS
     )
-    environment.generate_obstacles(settings.NUMBER_OBSTACLES, settings.AVG_SIZE_OBSTACLE)
+    if settings.SCENARIO_BANK_FILE:
+        environment.load_scenario(settings.SCENARIO_BANK_FILE, settings.SCENARIO_BANK_INDEX)
+    else:
+        environment.load_or_generate_obstacles(settings.NUMBER_OBSTACLES, settings.AVG_SIZE_OBSTACLE)
 
-    pso: PSO = PSO(calculate_fitness, environment)
     log_info(Source.main, 'Optimizing...')
-    solution = pso.optimize()
+    fitness_function = RobustnessEvaluator(settings.FITNESS_ROBUST_SAMPLES) if settings.FITNESS_ROBUST_SAMPLES > 0 else calculate_fitness
+    if settings.PSO_HORIZON_ENABLED:
+        solution = RecedingHorizonPlanner(fitness_function, environment).plan()
+    else:
+        if settings.PSO_COOPERATIVE:
+            optimizer = CooperativePSO(fitness_function, environment)
+        elif settings.PSO_ASYNC_WORKERS > 0:
+            optimizer = AsynchronousPSO(fitness_function, environment)
+        elif settings.OPTIMIZER_BACKEND == 'pso':
+            optimizer = PSO(fitness_function, environment)
+        else:
+            optimizer = create_optimizer(settings.OPTIMIZER_BACKEND, fitness_function, environment)
+        solution = optimizer.optimize()
 
     for drone, path in zip(drones, solution[0]):
         spline: CubicBSpline = CubicBSpline(
@@ -53,6 +102,23 @@ async def initialize_async():
             + [(environment.goal.position[0], environment.goal.position[1], 1.0)]
         )
         drone.path = spline
+
+    if settings.ROBUSTNESS_SAMPLES > 0:
+        log_info(Source.main, 'Evaluating robustness...')
+        report = RobustnessEvaluator(settings.ROBUSTNESS_SAMPLES).evaluate(solution[0], environment)
+        log_info(Source.main, 'Robustness in %d perturbed environments: %s', settings.ROBUSTNESS_SAMPLES, report.summary())
+
+    if settings.TRAJECTORY_EXPORT_FILE:
+        log_info(Source.main, 'Exporting trajectories...')
+        export_trajectories(
+            settings.TRAJECTORY_EXPORT_FILE,
+            [drone.path for drone in drones],
+            settings.TRAJECTORY_EXPORT_RATE,
+            settings.TRAJECTORY_EXPORT_FORMAT,
+            metadata={'fitness': float(solution[1]), 'obstacles': environment.get_obstacle_array().tolist(), 'settings': settings.model_dump()},
+            radii=[drone.radius for drone in drones]
+        )
+
     log_info(Source.main, 'Plot simulation...')
     plot_environment(environment)
 
@@ -0,0 +1,217 @@
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from copy import deepcopy
+
+import numpy as np
+
+from DroneSwarmPathOpti.simulation import Environment
+
+from .particle import Particle, position_to_array, array_to_position
+from .pso import PSO, _get_parameters, _set_parameters
+from ..config import get_settings
+from ..project_logger import log_info, log_debug, Source, start_telemetry, flush_telemetry, telemetry_enabled
+
+settings = get_settings()
+
+_worker_fitness = None # Fitness function of a worker process
+_worker_environment: Environment | None = None # Environment of a worker process
+
+
+class AsynchronousPSO(PSO):
+    """
+    This class performs the particle swarm optimization without waiting for the whole swarm after every iteration (barrier-free).
+
+    Every particle is evaluated in a pool of worker processes. As soon as the evaluation of a particle returns, its bests are updated, it moves
+    using the latest global best and is submitted again, so a worker never waits for the slowest particle of an iteration.
+    Progress is counted in evaluations: every PSO_PARTICLES evaluations complete an iteration, which adapts the schedule and is logged.
+    A returning particle is flushed if the flush is due and its fitness ranks among the worst PSO_FLUSH_SHARE of the latest fitness values of the swarm.
+    The number of evaluations equals the one of the PSO, but the order in which particles return depends on the timing of the workers,
+    so results are only reproducible with a single worker.
+    Re-planning adapts the swarm like the PSO and continues asynchronously.
+    Multi-objective mode, local search, surrogate, refinement and the trace are not supported.
+    """
+
+    workers: int # Number of worker processes
+    utilization: float # Share of the wall time the workers spent evaluating during the last optimization
+
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = (), workers: int | None = None):
+        """
+        :param fitness_function: Function rating the position of a particle in an environment (lower is better). Has to be picklable.
+        :param environment: The environment to optimize the drone paths for.
+        :param max_iterations: Number of iterations to perform (the optimization performs max_iterations times PSO_PARTICLES evaluations). Defaults to the config.
+        :param key: Address of the random streams of this optimization.
+        :param workers: Number of worker processes. Defaults to PSO_ASYNC_WORKERS of the config.
+        """
+        if settings.PSO_MULTI_OBJECTIVE:
+            raise ValueError('The asynchronous PSO does not support the multi-objective mode')
+        super().__init__(fitness_function, environment, max_iterations, key)
+        self.refinements = {}
+        self.workers = workers if workers is not None else settings.PSO_ASYNC_WORKERS
+        if self.workers <= 0:
+            raise ValueError(f'The asynchronous PSO needs at least one worker, got {self.workers}')
+        self.utilization = 0.0
+
+    def optimize(self):
+        """
+        This method evaluates and moves the particles asynchronously until max_iterations times PSO_PARTICLES evaluations are completed.
+        The settings adapted by the schedule are restored afterwards.
+
+        :return: A tuple containing the best solution found after the optimization process has been completed and its corresponding fitness value.
+        """
+        start_telemetry()
+        initial_parameters: dict[str, float] = _get_parameters()
+        self._adjust_parameters(0)
+        try:
+            self._run(self.max_iterations, 0, 'Iteration')
+        finally:
+            self.final_parameters = _get_parameters()
+            _set_parameters(initial_parameters)
+            flush_telemetry()
+
+        self._snapshot_environment()
+        return self.global_best_position, self.global_best_fitness
+
+    def replan(self, iterations: int | None = None):
+        """
+        This method continues the optimization asynchronously after the environment changed instead of starting from scratch.
+
+        The swarm is adapted like the one of the PSO (control points inside added obstacles are pushed out, personal bests are rated again),
+        then every particle is submitted again and the optimization continues for iterations times PSO_PARTICLES evaluations using the final parameters of the schedule.
+
+        :param iterations: Number of iterations to continue for. Defaults to PSO_REPLAN_ITERATIONS of the config.
+        :return: A tuple containing the best solution found after re-planning and its corresponding fitness value.
+        """
+        iterations = iterations if iterations is not None else settings.PSO_REPLAN_ITERATIONS
+        start_telemetry()
+        self._warm_start()
+
+        initial_parameters: dict[str, float] = _get_parameters()
+        if self.final_parameters is not None:
+            _set_parameters(self.final_parameters) # Continue after the schedule, all parameters keep their final values
+        try:
+            self._run(iterations, self.max_iterations, 'Re-planning')
+        finally:
+            _set_parameters(initial_parameters)
+            flush_telemetry()
+
+        self._snapshot_environment()
+        return self.global_best_position, self.global_best_fitness
+
+    def _run(self, iterations: int, first_iteration: int, label: str) -> None:
+        """
+        This method evaluates and moves the particles in a pool of worker processes until iterations times PSO_PARTICLES evaluations are completed.
+        The schedule is only adapted during the iterations of the optimization (first_iteration 0), re-planning keeps the current parameters.
+
+        :param iterations: Number of iterations to perform.
+        :param first_iteration: Iteration the first evaluations belong to (the flush and the telemetry continue counting from there).
+        :param label: Label of the iterations in the log.
+        :return: None
+        """
+        budget: int = iterations * self.num_particles
+        submitted: int = 0
+        completed: int = 0
+        busy: float = 0.0 # Time the workers spent evaluating
+        iteration_start: float = time.perf_counter()
+
+        start: float = time.perf_counter()
+        with ProcessPoolExecutor(self.workers, initializer=_initialize_worker, initargs=(self.fitness_function, self.environment, settings.model_dump())) as pool:
+            pending: dict[Future, Particle] = {}
+            for particle in self.particles:
+                pending[pool.submit(_evaluate, position_to_array(particle.particle_position))] = particle
+                submitted += 1
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    particle: Particle = pending.pop(future)
+                    fitness, duration = future.result()
+                    busy += duration
+                    completed += 1
+                    self._receive(particle, fitness)
+
+                    if completed % self.num_particles == 0: # An iteration worth of evaluations is completed
+                        iteration: int = completed // self.num_particles
+                        log_info(Source.optimization, '[%s %d/%d] Global best fitness: %.4f', label, iteration, iterations, self.global_best_fitness)
+                        if telemetry_enabled():
+                            self._log_telemetry(first_iteration + iteration - 1, [p.current_fitness for p in self.particles], time.perf_counter() - iteration_start, self.num_particles)
+                        iteration_start = time.perf_counter()
+                        if first_iteration == 0 and iteration < iterations:
+                            self._adjust_parameters(iteration)
+
+                    if submitted < budget:
+                        self._move(particle, first_iteration + completed // self.num_particles)
+                        pending[pool.submit(_evaluate, position_to_array(particle.particle_position))] = particle
+                        submitted += 1
+
+        self.utilization = busy / (self.workers * (time.perf_counter() - start))
+        log_info(Source.optimization, 'Asynchronous PSO: %d evaluations in %d workers, utilization %.1f%%', completed, self.workers, 100 * self.utilization)
+
+    def _create_surrogate(self) -> None:
+        """
+        This method disables the surrogate, every particle is evaluated by the workers.
+
+        :return: None
+        """
+        return None
+
+    def _receive(self, particle: Particle, fitness: float) -> None:
+        """
+        This method updates the personal and global best with the fitness of a returned particle.
+
+        :param particle: The particle.
+        :param fitness: Fitness of its current position.
+        :return: None
+        """
+        self.true_evaluations += 1
+        particle.current_fitness = fitness
+        if fitness < particle.best_fitness:
+            particle.best_fitness = fitness
+            particle.best_position = deepcopy(particle.particle_position)
+        if fitness < self.global_best_fitness:
+            self.global_best_fitness = fitness
+            self.global_best_position = deepcopy(particle.particle_position)
+            self.global_best_objectives = None
+
+    def _move(self, particle: Particle, iteration: int) -> None:
+        """
+        This method flushes a returned particle if it is among the worst of the swarm and the flush is due, and moves it towards the latest global best.
+
+        :param particle: The particle.
+        :param iteration: The current iteration (completed evaluations divided by the number of particles).
+        :return: None
+        """
+        if iteration > self.max_iterations * settings.PSO_FLUSH_WHEN:
+            rank: int = sum(other.current_fitness < particle.current_fitness for other in self.particles) # Position in the swarm sorted by fitness
+            if rank > int(self.num_particles - self.num_particles * settings.PSO_FLUSH_SHARE): # Same particles as the flush of the PSO
+                log_debug(Source.optimization, 'Flushing particle with fitness %.4f', particle.current_fitness)
+                particle.particle_position = deepcopy(self.global_best_position)
+                particle.best_position = deepcopy(self.global_best_position)
+                particle.reset_velocity()
+        particle.update_velocity(self.global_best_position)
+        particle.update_position()
+
+
+def _initialize_worker(fitness_function, environment: Environment, configuration: dict) -> None:
+    """
+    Prepares a worker process: stores the fitness function and the environment and applies the settings of the main process.
+
+    :param fitness_function: Function rating the position of a particle in an environment.
+    :param environment: The environment to optimize the drone paths for.
+    :param configuration: All settings of the main process (workers started by spawning would otherwise only know the config file).
+    """
+    global _worker_fitness, _worker_environment
+    for name, value in configuration.items():
+        setattr(settings, name, value)
+    _worker_fitness = fitness_function
+    _worker_environment = environment
+
+def _evaluate(position: np.ndarray) -> tuple[float, float]:
+    """
+    Rates a position in a worker process.
+
+    :param position: The position, shape (drones, control points, 3).
+    :return: A tuple of the fitness and the time in seconds the evaluation took.
+    """
+    start: float = time.perf_counter()
+    fitness: float = _worker_fitness(array_to_position(position), _worker_environment)
+    return float(fitness), time.perf_counter() - start
@@ -0,0 +1,379 @@
+"""
+Optimizer backends working on batched population arrays.
+
+Every backend searches the same space as the PSO: a candidate is a flat array of all control points (x, y and drone
+velocity of every point of every drone), bounded by the map and the max drone speed. A backend only proposes candidates
+(`ask`) and learns from their fitness (`tell`), while `Optimizer` owns everything they share: the initial population
+(SwarmInitializer), the bounds, the fitness of a batch (the fitness function of the PSO, so splines, energy and collisions
+are rated exactly like before), the global best and the logging. Backends:
+- 'vectorized_pso': the update rules of the PSO (including its schedule and flush) applied to the whole swarm at once
+- 'de': differential evolution (DE/rand/1/bin)
+- 'cma_es': covariance matrix adaptation evolution strategy on coordinates normalized by the bounds
+All backends evaluate PSO_PARTICLES candidates per iteration, so they can be compared at the same number of evaluations.
+The PSO itself (OPTIMIZER_BACKEND 'pso') is not a backend: it drives its own loop (flush, local search, surrogate, refinement) and is created directly.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Callable
+
+import numpy as np
+
+from DroneSwarmPathOpti.simulation import Environment
+
+from .particle import DronePath, SwarmInitializer, array_to_position
+from .pso import seed_path
+from ..config import get_settings, random_stream, STREAM_OPTIMIZER, STREAM_PARTICLE
+from ..project_logger import log_info, Source
+
+settings = get_settings()
+
+OPTIMIZER_BACKENDS = ('vectorized_pso', 'de', 'cma_es')
+
+
+def batch_fitness(fitness_function: Callable[[list[DronePath], Environment], float], positions: np.ndarray, environment: Environment) -> np.ndarray:
+    """
+    Rates a batch of positions with a fitness function of the PSO.
+    The positions are rated one by one, because the fitness function is exchangeable (e.g. calculate_fitness or a RobustnessEvaluator).
+
+    :param fitness_function: Function rating the position of a particle in an environment (lower is better).
+    :param positions: The positions, shape (positions, drones, control points, 3).
+    :param environment: The environment to rate the positions in.
+    :return: The fitness of every position, shape (positions,).
+    """
+    return np.array([fitness_function(array_to_position(position), environment) for position in positions.tolist()], dtype=float)
+
+
+class Optimizer(ABC):
+    """
+    This class is the interface of all backends (see module documentation). Subclasses implement ask and tell.
+    """
+
+    name: str # Name of the backend in OPTIMIZER_BACKENDS
+
+    fitness_function: Callable[[list[DronePath], Environment], float]
+    environment: Environment
+    population_size: int # Number of candidates rated per iteration
+    max_iterations: int
+    shape: tuple[int, int, int] # Shape of a position (drones, control points, 3)
+    lower: np.ndarray # Lower bound of every coordinate of a flat candidate, shape (dimension,)
+    upper: np.ndarray # Upper bound of every coordinate of a flat candidate, shape (dimension,)
+
+    key: tuple[int, ...] # Address of the random streams of this optimization
+    rng: np.random.Generator # Random stream of the backend
+
+    global_best_position: list[DronePath]
+    global_best_fitness: float
+    evaluations: int # Number of candidates rated so far
+
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+        """
+        :param fitness_function: Function rating the position of a particle in an environment (lower is better).
+        :param environment: The environment to optimize the drone paths for.
+        :param max_iterations: Number of iterations to perform. Defaults to the config.
+        :param key: Address of the random streams of this optimization.
+        """
+        self.fitness_function = fitness_function
+        self.environment = environment
+        self.population_size = settings.PSO_PARTICLES
+        self.max_iterations = max_iterations if max_iterations is not None else settings.PSO_ITERATIONS
+        self.key = tuple(key)
+        self.rng = random_stream(settings.SEED_PARTICLE, STREAM_OPTIMIZER, *self.key)
+
+        self.shape = (len(environment.drones), settings.INITIAL_CONTROL_POINTS, 3)
+        point_lower = np.array([0.0, 0.0, 0.1]) # Same bounds as a particle's position
+        point_upper = np.array([settings.ENVIRONMENT_SIZE_X, settings.ENVIRONMENT_SIZE_Y, settings.DRONE_MAX_SPEED], dtype=float)
+        self.lower = np.broadcast_to(point_lower, self.shape).ravel().copy()
+        self.upper = np.broadcast_to(point_upper, self.shape).ravel().copy()
+
+        self.initializer = SwarmInitializer(
+            num_drones=self.shape[0],
+            num_control_points=self.shape[1],
+            start=environment.start.position,
+            goal=environment.goal.position,
+            seed_path=seed_path(environment),
+            key=self.key
+        )
+        self.global_best_position = array_to_position(((self.lower + self.upper) / 2).reshape(self.shape)) # Placeholder until the first candidates are rated, sampling it would shift the random stream of the initial population
+        self.global_best_fitness = float('inf')
+        self.evaluations = 0
+
+    def optimize(self):
+        """
+        This method runs the backend for the configured number of iterations. The first iteration rates the initial population.
+
+        :return: A tuple containing the best solution found and its corresponding fitness value.
+        """
+        for iteration in range(self.max_iterations):
+            candidates: np.ndarray = self.ask(iteration)
+            fitness: np.ndarray = self.evaluate(candidates)
+            self.tell(iteration, candidates, fitness)
+            log_info(Source.optimization, '[Iteration %d/%d] Global best fitness: %.4f', iteration + 1, self.max_iterations, self.global_best_fitness)
+        log_info(Source.optimization, 'Backend %s: %d evaluations', self.name, self.evaluations)
+        return self.global_best_position, self.global_best_fitness
+
+    def evaluate(self, candidates: np.ndarray) -> np.ndarray:
+        """
+        This method rates flat candidates and updates the global best.
+
+        :param candidates: The candidates inside of the bounds, shape (candidates, dimension).
+        :return: The fitness of every candidate, shape (candidates,).
+        """
+        fitness = batch_fitness(self.fitness_function, candidates.reshape(-1, *self.shape), self.environment)
+        self.evaluations += len(candidates)
+        best: int = int(np.argmin(fitness))
+        if fitness[best] < self.global_best_fitness:
+            self.global_best_fitness = float(fitness[best])
+            self.global_best_position = array_to_position(candidates[best].reshape(self.shape))
+        return fitness
+
+    def initial_population(self) -> np.ndarray:
+        """
+        This method samples the initial population like the swarm of the PSO.
+
+        :return: The flat candidates inside of the bounds, shape (population, dimension).
+        """
+        return np.clip(self.initializer.create_positions(self.population_size).reshape(self.population_size, -1), self.lower, self.upper)
+
+    @abstractmethod
+    def ask(self, iteration: int) -> np.ndarray:
+        """
+        This method proposes the candidates of an iteration.
+
+        :param iteration: The current iteration.
+        :return: The flat candidates inside of the bounds, shape (population, dimension).
+        """
+
+    @abstractmethod
+    def tell(self, iteration: int, candidates: np.ndarray, fitness: np.ndarray) -> None:
+        """
+        This method updates the state of the backend with the fitness of the proposed candidates.
+
+        :param iteration: The current iteration.
+        :param candidates: The candidates returned by ask, shape (population, dimension).
+        :param fitness: Their fitness, shape (population,).
+        :return: None
+        """
+
+
+class VectorizedPSO(Optimizer):
+    """
+    This class applies the update rules of the PSO (see Particle.update_velocity and Particle.update_position) to the whole swarm at once.
+    The schedule of the velocity limits and weights is calculated per iteration instead of adapting the global settings, and the worst particles are flushed like in the PSO.
+    Every particle draws its random factors from the same stream as the corresponding particle of the PSO, so both follow the same trajectory with the same settings
+    (unless an initial drone velocity is below the lower bound, which the backends clip and the PSO only corrects when the particle moves).
+    """
+
+    name = 'vectorized_pso'
+
+    positions: np.ndarray # Current positions, shape (particles, dimension)
+    velocities: np.ndarray # Current velocities, shape (particles, dimension)
+    best_positions: np.ndarray # Personal bests, shape (particles, dimension)
+    best_fitness: np.ndarray # Fitness of the personal bests, shape (particles,)
+    fitness: np.ndarray # Fitness of the current positions, shape (particles,)
+    order: np.ndarray # Indices of the particles in the order of the PSO's swarm (sorted by fitness every iteration), shape (particles,)
+    particle_rngs: list[np.random.Generator] # Random stream of every particle
+
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+        super().__init__(fitness_function, environment, max_iterations, key)
+        self.positions = self.initial_population()
+        self.velocities = self.initializer.sample_velocities(self.population_size).reshape(self.population_size, -1)
+        self.best_positions = self.positions.copy()
+        self.best_fitness = np.full(self.population_size, np.inf)
+        self.fitness = np.full(self.population_size, np.inf)
+        self.order = np.arange(self.population_size)
+        self.particle_rngs = [random_stream(settings.SEED_PARTICLE, STREAM_PARTICLE, 0, *self.key, i) for i in range(self.population_size)] # Same streams as the particles of the PSO
+
+    def ask(self, iteration: int) -> np.ndarray:
+        if iteration == 0:
+            return self.positions
+
+        # The PSO moves its particles at the end of an iteration, so the candidates of this iteration were moved with the parameters of the previous one
+        previous: int = iteration - 1
+        weight_personal = self._scheduled(settings.PSO_WEIGHT_PERSONAL_POSITION, settings.PSO_DECREASE_WEIGHT_PERSONAL_GOAL, settings.PSO_DECREASE_WEIGHT_PERSONAL_WHEN, previous)
+        weight_global = self._scheduled(settings.PSO_WEIGHT_GLOBAL_BEST, settings.PSO_INCREASE_WEIGHT_GLOBAL_GOAL, settings.PSO_INCREASE_WEIGHT_GLOBAL_WHEN, previous)
+        limits = np.broadcast_to(np.array([
+            self._scheduled(settings.PSO_MAX_VELOCITY_X, settings.PSO_DECREASE_MAX_VELOCITY_GOAL, settings.PSO_DECREASE_MAX_VELOCITY_WHEN, previous),
+            self._scheduled(settings.PSO_MAX_VELOCITY_Y, settings.PSO_DECREASE_MAX_VELOCITY_GOAL, settings.PSO_DECREASE_MAX_VELOCITY_WHEN, previous),
+            settings.PSO_MAX_VELOCITY_DRONE_VELOCITY
+        ]), self.shape).ravel()
+
+        # One pair of random factors per control point, shared by x, y and drone velocity (like Particle.update_velocity)
+        factors = np.array([rng.uniform(0, 1, size=(self.shape[0] * self.shape[1], 2)) for rng in self.particle_rngs])
+        factor_personal = np.broadcast_to(factors[..., :1], (self.population_size, self.shape[0] * self.shape[1], 3)).reshape(self.population_size, -1)
+        factor_global = np.broadcast_to(factors[..., 1:], (self.population_size, self.shape[0] * self.shape[1], 3)).reshape(self.population_size, -1)
+        global_best = np.array([point for path in self.global_best_position for point in path.control_points], dtype=float).ravel()
+        self.velocities = np.clip(
+            weight_personal * self.velocities
+            + settings.PSO_WEIGHT_PERSONAL_BEST * factor_personal * (self.best_positions - self.positions)
+            + weight_global * factor_global * (global_best - self.positions),
+            -limits, limits
+        )
+
+        moved = self.positions + self.velocities
+        outside = (moved < self.lower) | (moved > self.upper)
+        self.velocities[outside] *= -settings.PSO_VELOCITY_DAMPING # Bounce back from the bounds
+        self.positions = np.clip(moved, self.lower, self.upper)
+        return self.positions
+
+    def tell(self, iteration: int, candidates: np.ndarray, fitness: np.ndarray) -> None:
+        self.fitness = fitness
+        improved = fitness < self.best_fitness
+        self.best_positions[improved] = candidates[improved]
+        self.best_fitness[improved] = fitness[improved]
+
+        self.order = self.order[np.argsort(fitness[self.order], kind='stable')] # The PSO sorts its swarm in place, ties keep the previous order
+        if iteration > self.max_iterations * settings.PSO_FLUSH_WHEN:
+            flushed = self.order[int(self.population_size - self.population_size * settings.PSO_FLUSH_SHARE) + 1:]
+            global_best = np.array([point for path in self.global_best_position for point in path.control_points], dtype=float).ravel()
+            self.positions[flushed] = global_best
+            self.best_positions[flushed] = global_best
+            limits = np.broadcast_to(np.array([
+                self._scheduled(settings.PSO_MAX_INITIAL_VELOCITY_X, settings.PSO_DECREASE_INITIAL_VELOCITY_GOAL, settings.PSO_DECREASE_INITIAL_VELOCITY_WHEN, iteration),
+                self._scheduled(settings.PSO_MAX_INITIAL_VELOCITY_Y, settings.PSO_DECREASE_INITIAL_VELOCITY_GOAL, settings.PSO_DECREASE_INITIAL_VELOCITY_WHEN, iteration),
+                settings.PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY
+            ]), self.shape).ravel()
+            for i in flushed:
+                self.velocities[i] = self.particle_rngs[i].uniform(-limits, limits)
+
+    def _scheduled(self, initial: float, goal: float, when: float, iteration: int) -> float:
+        """
+        This method calculates the value of a scheduled parameter in an iteration, equal to the value the PSO's schedule reaches in it.
+
+        :param initial: The configured value.
+        :param goal: The value approached at the end of the optimization.
+        :param when: After how many iterations the parameter begins to adapt (depending on the max number of iterations).
+        :param iteration: The current iteration.
+        :return: The value of the parameter.
+        """
+        begin: float = self.max_iterations * when
+        steps: int = max(0, iteration - math.floor(begin)) # Iterations after begin (the PSO adapts before every iteration > begin)
+        return initial - (initial - goal) / (self.max_iterations - begin) * steps
+
+
+class DifferentialEvolution(Optimizer):
+    """
+    This class implements differential evolution (DE/rand/1/bin): every candidate is challenged by a trial mixing it with the difference of two random members added to a third.
+    """
+
+    name = 'de'
+
+    population: np.ndarray # Current population, shape (population, dimension)
+    fitness: np.ndarray # Fitness of the population, shape (population,)
+
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+        super().__init__(fitness_function, environment, max_iterations, key)
+        if self.population_size < 4:
+            raise ValueError(f'Differential evolution needs at least 4 candidates, got {self.population_size}')
+        self.population = self.initial_population()
+        self.fitness = np.full(self.population_size, np.inf)
+
+    def ask(self, iteration: int) -> np.ndarray:
+        if iteration == 0:
+            return self.population
+
+        n, dimension = self.population.shape
+        others = np.argsort(self.rng.uniform(size=(n, n - 1)), axis=1)[:, :3] # Three distinct members other than the candidate itself
+        others += others >= np.arange(n)[:, None]
+        a, b, c = self.population[others[:, 0]], self.population[others[:, 1]], self.population[others[:, 2]]
+        mutant = a + settings.DE_WEIGHT * (b - c)
+
+        crossover = self.rng.uniform(size=(n, dimension)) < settings.DE_CROSSOVER
+        crossover[np.arange(n), self.rng.integers(0, dimension, size=n)] = True # At least one coordinate of the mutant
+        return np.clip(np.where(crossover, mutant, self.population), self.lower, self.upper)
+
+    def tell(self, iteration: int, candidates: np.ndarray, fitness: np.ndarray) -> None:
+        improved = fitness <= self.fitness
+        self.population[improved] = candidates[improved]
+        self.fitness[improved] = fitness[improved]
+
+
+class CMAES(Optimizer):
+    """
+    This class implements the (mu/mu_w, lambda) covariance matrix adaptation evolution strategy with cumulative step size adaptation.
+    It searches coordinates normalized by the bounds (0 to 1), so a step size of CMA_ES_SIGMA means the same share of the map and the drone speed.
+    The initial population of the first iteration only places the mean (weighted recombination of its best members), the distribution is adapted afterwards.
+    Candidates outside of the bounds are clipped, and the clipped candidates are used for the update.
+    """
+
+    name = 'cma_es'
+
+    mean: np.ndarray # Mean of the search distribution, shape (dimension,)
+    sigma: float # Step size
+    covariance: np.ndarray # Covariance matrix, shape (dimension, dimension)
+
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+        super().__init__(fitness_function, environment, max_iterations, key)
+        if self.population_size < 2:
+            raise ValueError(f'CMA-ES needs at least 2 candidates, got {self.population_size}')
+        n: int = len(self.lower)
+        self.mu = self.population_size // 2
+        weights = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mu_eff = 1.0 / np.sum(self.weights ** 2)
+
+        self.c_c = (4 + self.mu_eff / n) / (n + 4 + 2 * self.mu_eff / n)
+        self.c_sigma = (self.mu_eff + 2) / (n + self.mu_eff + 5)
+        self.c_1 = 2 / ((n + 1.3) ** 2 + self.mu_eff)
+        self.c_mu = min(1 - self.c_1, 2 * (self.mu_eff - 2 + 1 / self.mu_eff) / ((n + 2) ** 2 + self.mu_eff))
+        self.damping = 1 + 2 * max(0.0, math.sqrt((self.mu_eff - 1) / (n + 1)) - 1) + self.c_sigma
+        self.expected_norm = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2)) # Expected length of a standard normal vector
+
+        self.mean = np.full(n, 0.5)
+        self.sigma = settings.CMA_ES_SIGMA
+        self.covariance = np.eye(n)
+        self.path_c = np.zeros(n)
+        self.path_sigma = np.zeros(n)
+        self._basis = np.eye(n) # Eigenvectors of the covariance
+        self._scales = np.ones(n) # Square roots of its eigenvalues
+
+    def ask(self, iteration: int) -> np.ndarray:
+        if iteration == 0:
+            return self.initial_population()
+        z = self.rng.standard_normal((self.population_size, len(self.mean)))
+        unit = np.clip(self.mean + self.sigma * (z * self._scales) @ self._basis.T, 0.0, 1.0)
+        return self.lower + unit * (self.upper - self.lower)
+
+    def tell(self, iteration: int, candidates: np.ndarray, fitness: np.ndarray) -> None:
+        unit = (candidates - self.lower) / (self.upper - self.lower)
+        selected = unit[np.argsort(fitness, kind='stable')[:self.mu]]
+        previous = self.mean
+        self.mean = self.weights @ selected
+        if iteration == 0:
+            return # The initial population was not sampled from the distribution
+
+        steps = (selected - previous) / self.sigma # (mu, dimension)
+        step = self.weights @ steps
+        inverse_root = self._basis @ np.diag(1 / self._scales) @ self._basis.T
+        self.path_sigma = (1 - self.c_sigma) * self.path_sigma + math.sqrt(self.c_sigma * (2 - self.c_sigma) * self.mu_eff) * inverse_root @ step
+        norm: float = float(np.linalg.norm(self.path_sigma))
+        stalled: bool = norm / math.sqrt(1 - (1 - self.c_sigma) ** (2 * iteration)) / self.expected_norm >= 1.4 + 2 / (len(self.mean) + 1)
+        self.path_c = (1 - self.c_c) * self.path_c + (0.0 if stalled else math.sqrt(self.c_c * (2 - self.c_c) * self.mu_eff)) * step
+
+        self.covariance = (
+                (1 - self.c_1 - self.c_mu) * self.covariance
+                + self.c_1 * (np.outer(self.path_c, self.path_c) + (self.c_c * (2 - self.c_c) * self.covariance if stalled else 0.0))
+                + self.c_mu * (steps.T * self.weights) @ steps
+        )
+        self.sigma *= math.exp(self.c_sigma / self.damping * (norm / self.expected_norm - 1))
+
+        self.covariance = (self.covariance + self.covariance.T) / 2
+        eigenvalues, self._basis = np.linalg.eigh(self.covariance)
+        self._scales = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+
+def create_optimizer(backend: str, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+    """
+    Creates the optimizer of a backend.
+
+    :param backend: One of OPTIMIZER_BACKENDS.
+    :param fitness_function: Function rating the position of a particle in an environment (lower is better).
+    :param environment: The environment to optimize the drone paths for.
+    :param max_iterations: Number of iterations to perform. Defaults to the config.
+    :param key: Address of the random streams of this optimization.
+    :return: The optimizer, its optimize method returns the best solution and its fitness.
+    """
+    backends = {'vectorized_pso': VectorizedPSO, 'de': DifferentialEvolution, 'cma_es': CMAES}
+    if backend not in backends:
+        raise ValueError(f"Unknown optimizer backend '{backend}', expected one of {OPTIMIZER_BACKENDS}")
+    return backends[backend](fitness_function, environment, max_iterations, key)
@@ -0,0 +1,230 @@
+import numpy as np
+
+from DroneSwarmPathOpti.simulation import CubicBSpline, Environment
+from DroneSwarmPathOpti.simulation.environment_utils import obstacle_collisions, drone_collisions, ReservationTable
+
+from .fitness import build_splines
+from .particle import Particle, DronePath, SwarmInitializer, position_to_array, array_to_position, copy_position
+from .pso import PSO
+from .replanning import repair_positions
+from ..config import get_settings, random_stream, STREAM_PARTICLE
+from ..project_logger import log_debug, log_info, log_warning, Source
+
+settings = get_settings()
+
+
+class CooperativePSO(PSO):
+    """
+    This class optimizes the drone paths by cooperative coevolution: every drone has its own sub-swarm searching only the space of its own path.
+
+    The sub-swarms are initialized by splitting the particles of a regular swarm. A path is rated in the context of the best paths of all other drones:
+        - Time, energy and obstacle collisions of the path itself
+        - Collisions of the drone with all other drones, whose splines are cached
+    The sum of these contributions of all drones counts every drone-drone collision twice, but only the contribution of the changed drone has to be calculated.
+    The sub-swarms take turns, and a sub-swarm improving its best path immediately changes the context of all following ones.
+    With FITNESS_ANALYTIC_COLLISIONS, collisions are calculated exactly. Otherwise they are counted at sampled moments like in the fitness function, and the
+    best paths are kept in a space-time reservation table: a path is only compared to the drones reserving the cells around each of its samples.
+
+    The global best is the combination of the best paths of all drones, rated by the fitness function once per iteration.
+    The schedule, flushing and re-planning work as in the PSO. Multi-objective mode, local search, surrogate, refinement, telemetry and the trace are not supported.
+    """
+
+    subswarms: list[list[Particle]] # Particles of every drone, each with a single drone path (the swarm of the PSO, particles, stays empty)
+    context: list[DronePath] # Best path of every drone
+    context_splines: list[CubicBSpline] # Cached splines of the best paths
+    context_fitness: np.ndarray # Contribution of every best path in the current context, shape (drones,)
+    reservations: ReservationTable # Sampled trajectories of the best paths
+    radii: np.ndarray # Radius of every drone, shape (drones,)
+    drone_evaluations: int # Number of single paths rated so far
+
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+        """
+        :param fitness_function: Function rating the combination of all drone paths in an environment (lower is better).
+        :param environment: The environment to optimize the drone paths for.
+        :param max_iterations: Number of iterations to perform. Defaults to the config.
+        :param key: Address of the random streams of this optimization.
+        """
+        if settings.PSO_MULTI_OBJECTIVE:
+            raise ValueError('The cooperative coevolution does not support the multi-objective mode')
+        super().__init__(fitness_function, environment, max_iterations, key)
+        self.refinements = {}
+
+        self.radii = np.array([drone.radius for drone in environment.drones], dtype=float)
+        self.context = copy_position(self.global_best_position)
+        self.context_splines = build_splines(self.context, environment)
+        self.context_fitness = np.full(len(environment.drones), float('inf'))
+        self.reservations = ReservationTable(1.0, 2 * float(np.max(self.radii))) # Resolution of the sampled collisions in the fitness function
+        self._reserve_context()
+        self.drone_evaluations = 0
+
+    def _initialize_swarm(self, initializer: SwarmInitializer) -> None:
+        """
+        This method samples a regular swarm and splits every position into the sub-swarms of the drones. No particle of the whole swarm is created.
+
+        :param initializer: The initializer sampling the swarm.
+        :return: None
+        """
+        positions: np.ndarray = initializer.create_positions(self.num_particles)
+        velocities: np.ndarray = initializer.sample_velocities(self.num_particles)
+        self.subswarms = [
+            [
+                Particle(
+                    array_to_position(positions[i, drone:drone + 1]),
+                    array_to_position(velocities[i, drone:drone + 1]),
+                    random_stream(settings.SEED_PARTICLE, STREAM_PARTICLE, 2, *self.key, drone, i)
+                ) for i in range(self.num_particles)
+            ] for drone in range(positions.shape[1])
+        ]
+        self.particles = []
+        self.global_best_position = array_to_position(positions[0])
+
+    def _create_surrogate(self) -> None:
+        """
+        This method disables the surrogate, every path is rated in the context of the other drones.
+
+        :return: None
+        """
+        return None
+
+    def _start_trace(self) -> None:
+        """
+        This method records nothing: a particle of a sub-swarm only holds the path of a single drone, which does not fit the layout of the trace.
+
+        :return: None
+        """
+        if settings.TRACE_FILE:
+            log_warning(Source.optimization, 'The cooperative coevolution does not record a trace')
+
+    def _iterate(self, iteration: int) -> None:
+        """
+        This method performs a single iteration: every sub-swarm is evaluated, flushed and moved in turn.
+
+        :param iteration: The current iteration.
+        :return: None
+        """
+        obstacles: np.ndarray = self.environment.get_obstacle_array()
+        for drone, subswarm in enumerate(self.subswarms):
+            if np.isfinite(self.context_fitness[drone]): # The other drones may have changed since the last turn
+                self.context_fitness[drone], _ = self._contribution(drone, self.context[drone], obstacles)
+
+            for particle in subswarm:
+                fitness, spline = self._contribution(drone, particle.particle_position[0], obstacles)
+                particle.current_fitness = fitness
+                if fitness < particle.best_fitness:
+                    particle.best_fitness = fitness
+                    particle.best_position = copy_position(particle.particle_position)
+                if fitness < self.context_fitness[drone]:
+                    self.context_fitness[drone] = fitness
+                    self.context[drone] = DronePath(list(particle.particle_position[0].control_points))
+                    self.context_splines[drone] = spline
+                    self.reservations.insert(drone, spline, float(self.radii[drone]))
+
+            subswarm.sort(key=lambda p: p.current_fitness)
+            if iteration > self.max_iterations * settings.PSO_FLUSH_WHEN:
+                for particle in subswarm[int(len(subswarm) - len(subswarm) * settings.PSO_FLUSH_SHARE) + 1:]:
+                    particle.particle_position = [DronePath(list(self.context[drone].control_points))]
+                    particle.best_position = [DronePath(list(self.context[drone].control_points))]
+                    particle.reset_velocity()
+
+            for particle in subswarm:
+                particle.update_velocity([self.context[drone]])
+                particle.update_position()
+
+        fitness: float = self.fitness_function(self.context, self.environment)
+        if fitness < self.global_best_fitness:
+            self.global_best_fitness = fitness
+            self.global_best_position = copy_position(self.context)
+            self.global_best_objectives = None
+        log_debug(Source.optimization, 'Contributions: %s (%d paths rated so far)', self.context_fitness, self.drone_evaluations)
+
+    def _contribution(self, drone: int, path: DronePath, obstacles: np.ndarray) -> tuple[float, CubicBSpline]:
+        """
+        This method rates the path of a single drone in the context of the best paths of all other drones.
+
+        :param drone: Index of the drone.
+        :param path: The path of the drone.
+        :param obstacles: The obstacles of the environment, shape (obstacles, 3).
+        :return: A tuple of the weighted contribution of the path and its spline.
+        """
+        self.drone_evaluations += 1
+        spline: CubicBSpline = build_splines([path], self.environment)[0]
+
+        collisions_obstacles: float
+        collisions_drones: float
+        if settings.FITNESS_ANALYTIC_COLLISIONS:
+            splines: list[CubicBSpline] = list(self.context_splines)
+            splines[drone] = spline
+            _, _, entry_obstacles, exit_obstacles, _ = obstacle_collisions([spline], self.radii[drone:drone + 1], obstacles)
+            _, _, entry_drones, exit_drones, _ = drone_collisions(splines, self.radii, drone=drone)
+            collisions_obstacles = float(np.sum(exit_obstacles - entry_obstacles))
+            collisions_drones = float(np.sum(exit_drones - entry_drones))
+        else:
+            collisions_obstacles = float(len(Environment.sample_collisions_obstacles(spline, float(self.radii[drone]), obstacles)[0]))
+            collisions_drones = float(len(self.reservations.conflicts(spline, float(self.radii[drone]), exclude=drone)[0]))
+        return (
+                settings.FITNESS_WEIGHT_TIME * spline.calculate_time_usage()
+                + settings.FITNESS_WEIGHT_ENERGY * spline.calculate_energy_usage()
+                + settings.FITNESS_WEIGHT_COLLISIONS_OBSTACLES * collisions_obstacles
+                + settings.FITNESS_WEIGHT_COLLISIONS_DRONES * collisions_drones
+        ), spline
+
+    def _repair_particles(self, obstacles: np.ndarray) -> None:
+        """
+        This method pushes the control points of all particles of all sub-swarms out of the given obstacles. Velocities and bests are kept.
+
+        :param obstacles: The obstacles, shape (obstacles, 3).
+        :return: None
+        """
+        if len(obstacles) == 0:
+            return
+        for drone, subswarm in enumerate(self.subswarms):
+            positions: np.ndarray = np.array([position_to_array(particle.particle_position) for particle in subswarm])
+            repaired, changed = repair_positions(positions, obstacles, float(self.radii[drone]), self.environment.bounds)
+            for particle, position in zip(np.array(subswarm, dtype=object)[changed], repaired[changed]):
+                particle.particle_position = array_to_position(position)
+
+    def _reevaluate_bests(self) -> None:
+        """
+        This method forgets all contributions, since they are outdated after the environment changed. They are rated again during the next iteration.
+        The current combination of best paths is rated again as the global best.
+
+        :return: None
+        """
+        self.context_splines = build_splines(self.context, self.environment) # Start or goal may have changed
+        self._reserve_context()
+        self.context_fitness[:] = float('inf')
+        for subswarm in self.subswarms:
+            for particle in subswarm:
+                particle.best_fitness = float('inf')
+        self.global_best_position = copy_position(self.context)
+        self.global_best_fitness = self.fitness_function(self.context, self.environment)
+        self.global_best_objectives = None
+
+    def _reserve_context(self) -> None:
+        """
+        This method inserts the splines of all best paths into the reservation table, replacing their previous trajectories.
+
+        :return: None
+        """
+        for drone, spline in enumerate(self.context_splines):
+            self.reservations.insert(drone, spline, float(self.radii[drone]))
+
+    def _update_bests(self, removed: np.ndarray, added: np.ndarray) -> None:
+        """
+        This method updates the bests after obstacles changed. Contributions depend on the context, so all of them are rated again (see _reevaluate_bests).
+
+        :param removed: The removed obstacles, shape (obstacles, 3).
+        :param added: The added obstacles, shape (obstacles, 3).
+        :return: None
+        """
+        self._reevaluate_bests()
+
+    def optimize(self):
+        """
+        This method performs the cooperative coevolution (see PSO.optimize).
+
+        :return: A tuple containing the best combination of drone paths found and its corresponding fitness value.
+        """
+        solution = super().optimize()
+        log_info(Source.optimization, 'Cooperative coevolution: %d single paths rated', self.drone_evaluations)
+        return solution
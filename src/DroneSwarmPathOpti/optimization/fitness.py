@@ -1,5 +1,8 @@
+import numpy as np
+
 from .particle import DronePath
 from DroneSwarmPathOpti.simulation import CubicBSpline, Environment
+from DroneSwarmPathOpti.simulation.environment_utils import obstacle_collisions
 from ..config import get_settings
 
 settings = get_settings()
@@ -13,24 +16,78 @@ def calculate_fitness(particle_position: list[DronePath], environment: Environme
     :param environment: The environment in which the particles exist.
     :return: A fitness value of a given particle in a given environment as a float.
     """
+    return weight_objectives(calculate_objectives(particle_position, environment))
+
+def calculate_objectives(particle_position: list[DronePath], environment: Environment) -> tuple[float, float, float, float]:
+    """
+    Calculates the individual objectives of a particle in a given environment.
+
+    :param particle_position: A particle which represents a full approach to a solution to the given environment.
+    :param environment: The environment in which the particles exist.
+    :return: A tuple containing the time usage, the energy usage, the collisions with obstacles and the collisions between drones.
+    """
     energy_usage: float = 0
     time_usage: float = 0
 
-    splines: list[CubicBSpline] = [
-        CubicBSpline(
-            [(environment.start.position[0], environment.start.position[1], 1.0)]
-            + path.control_points
-            + [(environment.goal.position[0], environment.goal.position[1], 1.0)]
-        ) for path in particle_position] # Build splines out of the provided drone paths by adding the environment's start and goal points to each drone's path
-
+    splines: list[CubicBSpline] = build_splines(particle_position, environment)
     for drone, spline in zip(environment.drones, splines): # Assign a path to each drone in the environment. (Link the environment's drones to the provided paths)
         drone.path = spline
         energy_usage += spline.calculate_energy_usage()
         time_usage += spline.calculate_time_usage()
 
-    number_collisions_obstacles: int = len(environment.get_collisions_obstacles())
-    number_collisions_drones: int = len(environment.get_collisions_drones())
+    number_collisions_obstacles: float
+    number_collisions_drones: float
+    if settings.FITNESS_ANALYTIC_COLLISIONS: # Exact collision durations (comparable to the number of collisions sampled with a resolution of 1.0)
+        number_collisions_obstacles = float(np.sum(environment.get_collision_durations_obstacles()[0]))
+        number_collisions_drones = float(np.sum(environment.get_collision_durations_drones()[0]))
+    else:
+        number_collisions_obstacles = len(environment.get_collisions_obstacles())
+        number_collisions_drones = len(environment.get_collisions_drones())
+
+    return time_usage, energy_usage, number_collisions_obstacles, number_collisions_drones
+
+def calculate_obstacle_collisions(particle_position: list[DronePath], environment: Environment, obstacles: np.ndarray) -> float:
+    """
+    Calculates the exact collision duration of a particle with a subset of obstacles, e.g. to update a known fitness after obstacles changed.
+    Since the collision duration is a sum over all obstacles, the weighted result can simply be added to or subtracted from a fitness value.
+
+    :param particle_position: A particle which represents a full approach to a solution to the given environment.
+    :param environment: The environment in which the particles exist.
+    :param obstacles: The obstacles to check, shape (obstacles, 3) with the columns x, y and radius.
+    :return: The total time all drones spend colliding with the given obstacles.
+    """
+    if len(obstacles) == 0:
+        return 0.0
+    _, _, entry, exit_, _ = obstacle_collisions(
+        build_splines(particle_position, environment),
+        np.array([drone.radius for drone in environment.drones], dtype=float),
+        obstacles
+    )
+    return float(np.sum(exit_ - entry))
+
+def build_splines(particle_position: list[DronePath], environment: Environment) -> list[CubicBSpline]:
+    """
+    Builds splines out of the provided drone paths by adding the environment's start and goal points to each drone's path.
+
+    :param particle_position: A particle which represents a full approach to a solution to the given environment.
+    :param environment: The environment in which the particles exist.
+    :return: One spline per drone.
+    """
+    return [
+        CubicBSpline(
+            [(environment.start.position[0], environment.start.position[1], 1.0)]
+            + path.control_points
+            + [(environment.goal.position[0], environment.goal.position[1], 1.0)]
+        ) for path in particle_position]
+
+def weight_objectives(objectives: tuple[float, float, float, float]) -> float:
+    """
+    Combines the individual objectives of a particle into a single fitness value using the weights specified in the config.
 
+    :param objectives: A tuple containing the time usage, the energy usage, the collisions with obstacles and the collisions between drones.
+    :return: The weighted sum of all objectives.
+    """
+    time_usage, energy_usage, number_collisions_obstacles, number_collisions_drones = objectives
     return (
             settings.FITNESS_WEIGHT_TIME * time_usage
             +
@@ -39,4 +96,4 @@ def calculate_fitness(particle_position: list[DronePath], environment: Environme
             settings.FITNESS_WEIGHT_COLLISIONS_OBSTACLES * number_collisions_obstacles
             +
             settings.FITNESS_WEIGHT_COLLISIONS_DRONES * number_collisions_drones
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,217 @@
+"""
+Gradient-based local refinement of particle positions.
+
+The fitness of a particle is piecewise constant in the collisions and therefore unsuitable for gradient-based
+optimization. This module rates positions with a smooth surrogate instead:
+- time and energy usage calculated exactly like `CubicBSpline` does
+- a clearance penalty growing quadratically as soon as a drone comes closer to an obstacle or another drone than its
+  own radius (the penalty density equals the collision weight when two objects touch)
+
+All splines of a batch of positions are built and sampled at once, so the objective of every position needed for a
+central difference gradient is calculated in a single vectorized pass. The position is then refined with L-BFGS-B,
+bounded by the map and the drone speeds.
+"""
+
+import numpy as np
+from scipy.optimize import minimize
+
+from DroneSwarmPathOpti.simulation import Environment
+
+from .particle import DronePath, position_to_array, array_to_position
+from ..config import get_settings
+
+settings = get_settings()
+
+_ENERGY_SAMPLES: int = 50 # Same resolution as CubicBSpline.calculate_energy_usage
+_CLEARANCE_SAMPLES: int = 64 # Samples per drone (or pair of drones) to integrate the clearance penalty
+_STEP: float = 1e-4 # Relative step of the central differences
+
+
+def batch_spline_knots(points: np.ndarray) -> np.ndarray:
+    """
+    Calculates the knots (times) of many splines like CubicBSpline does: distance between two points divided by their average velocity.
+
+    :param points: Points of every spline including start and goal, shape (splines, points, 3) with x, y and velocity.
+    :return: The knots of every spline, shape (splines, points), starting at 0.
+    """
+    distance = np.hypot(*np.diff(points[..., :2], axis=1).transpose(2, 0, 1))
+    delta_time = distance / ((points[:, :-1, 2] + points[:, 1:, 2]) / 2)
+    delta_time = np.where(delta_time <= 0, delta_time + 1e-6, delta_time)
+    return np.concatenate([np.zeros((len(points), 1)), np.cumsum(delta_time, axis=1)], axis=1)
+
+def batch_spline_coefficients(t: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Calculates the coefficients of many cubic splines with not-a-knot boundary conditions (like scipy's CubicSpline) at once.
+
+    :param t: Knots of every spline, shape (splines, points), strictly increasing.
+    :param y: Values at the knots, shape (splines, points).
+    :return: Coefficients of every segment, shape (splines, points - 1, 4), highest degree first, in the local time of the segment.
+    """
+    splines, n = t.shape
+    h = np.diff(t, axis=1)
+    slope = np.diff(y, axis=1) / h
+
+    if n == 3: # Not-a-knot on three points -> the parabola through all of them
+        curvature = (slope[:, 1] - slope[:, 0]) / (t[:, 2] - t[:, 0])
+        s = np.stack([
+            slope[:, 0] - curvature * h[:, 0],
+            slope[:, 0] + curvature * h[:, 0],
+            slope[:, 1] + curvature * h[:, 1]
+        ], axis=1)
+    else:
+        a = np.zeros((splines, n, n))
+        b = np.zeros((splines, n))
+        rows = np.arange(1, n - 1)
+        a[:, rows, rows - 1] = h[:, 1:]
+        a[:, rows, rows] = 2 * (h[:, :-1] + h[:, 1:])
+        a[:, rows, rows + 1] = h[:, :-1]
+        b[:, 1:-1] = 3 * (h[:, 1:] * slope[:, :-1] + h[:, :-1] * slope[:, 1:])
+
+        a[:, 0, 0] = h[:, 1]
+        a[:, 0, 1] = h[:, 0] + h[:, 1]
+        b[:, 0] = ((h[:, 0] + 2 * a[:, 0, 1]) * h[:, 1] * slope[:, 0] + h[:, 0] ** 2 * slope[:, 1]) / a[:, 0, 1]
+        a[:, -1, -2] = h[:, -1] + h[:, -2]
+        a[:, -1, -1] = h[:, -2]
+        b[:, -1] = (h[:, -1] ** 2 * slope[:, -2] + (2 * a[:, -1, -2] + h[:, -1]) * h[:, -2] * slope[:, -1]) / a[:, -1, -2]
+        s = np.linalg.solve(a, b[..., None])[..., 0] # First derivative at every knot
+
+    return np.stack([
+        (s[:, :-1] + s[:, 1:] - 2 * slope) / h ** 2,
+        (3 * slope - 2 * s[:, :-1] - s[:, 1:]) / h,
+        s[:, :-1],
+        y[:, :-1]
+    ], axis=2)
+
+def batch_spline_evaluate(t: np.ndarray, coefficients: np.ndarray, times: np.ndarray, derivative: int = 0) -> np.ndarray:
+    """
+    Evaluates many splines (or one of their derivatives) at given times.
+
+    :param t: Knots of every spline, shape (splines, points).
+    :param coefficients: Coefficients as returned by batch_spline_coefficients, shape (splines, points - 1, 4).
+    :param times: Times to evaluate every spline at, shape (splines, samples).
+    :param derivative: 0 for the value, 1 for the first and 2 for the second derivative.
+    :return: The values, shape (splines, samples).
+    """
+    segment = np.clip(np.sum(times[:, :, None] >= t[:, None, 1:-1], axis=2), 0, t.shape[1] - 2)
+    dt = times - np.take_along_axis(t, segment, axis=1)
+    c = np.take_along_axis(coefficients, segment[..., None], axis=1) # (splines, samples, 4)
+    if derivative == 0:
+        return ((c[..., 0] * dt + c[..., 1]) * dt + c[..., 2]) * dt + c[..., 3]
+    if derivative == 1:
+        return (3 * c[..., 0] * dt + 2 * c[..., 1]) * dt + c[..., 2]
+    return 6 * c[..., 0] * dt + 2 * c[..., 1]
+
+
+class SmoothFitness:
+    """
+    This class rates batches of positions with the smooth surrogate of the fitness described in the module documentation.
+    """
+
+    start: np.ndarray # Start of the environment, shape (2,)
+    goal: np.ndarray # Goal of the environment, shape (2,)
+    obstacles: np.ndarray # Obstacles, shape (obstacles, 3)
+    radii: np.ndarray # Radius of every drone, shape (drones,)
+
+    def __init__(self, environment: Environment):
+        """
+        :param environment: The environment the positions are rated in.
+        """
+        self.start = np.array(environment.start.position, dtype=float)
+        self.goal = np.array(environment.goal.position, dtype=float)
+        self.obstacles = environment.get_obstacle_array()
+        self.radii = np.array([drone.radius for drone in environment.drones], dtype=float)
+
+    def __call__(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Rates a batch of positions.
+
+        :param positions: The positions, shape (batch, drones, control points, 3).
+        :return: The smooth fitness of every position, shape (batch,).
+        """
+        batch, drones, _, _ = positions.shape
+        points = np.concatenate([
+            np.broadcast_to(np.array([*self.start, 1.0]), (batch, drones, 1, 3)),
+            positions,
+            np.broadcast_to(np.array([*self.goal, 1.0]), (batch, drones, 1, 3))
+        ], axis=2).reshape(batch * drones, -1, 3) # One spline per drone, start and goal like CubicBSpline
+
+        t = batch_spline_knots(points)
+        cx = batch_spline_coefficients(t, points[..., 0])
+        cy = batch_spline_coefficients(t, points[..., 1])
+
+        # Time and energy
+        duration = t[:, -1]
+        ts = np.linspace(0.0, 1.0, _ENERGY_SAMPLES)[None, :] * duration[:, None]
+        speed = np.hypot(batch_spline_evaluate(t, cx, ts, 1), batch_spline_evaluate(t, cy, ts, 1))
+        acceleration = batch_spline_evaluate(t, cx, ts, 2) ** 2 + batch_spline_evaluate(t, cy, ts, 2) ** 2
+        energy = np.trapezoid(speed + 0.1 * acceleration, ts, axis=1)
+        fitness = (settings.FITNESS_WEIGHT_TIME * duration + settings.FITNESS_WEIGHT_ENERGY * energy).reshape(batch, drones).sum(axis=1)
+
+        # Clearance to obstacles along the whole path
+        radii = np.tile(self.radii, batch)
+        if len(self.obstacles) > 0:
+            ts = np.linspace(0.0, 1.0, _CLEARANCE_SAMPLES)[None, :] * duration[:, None]
+            x, y = batch_spline_evaluate(t, cx, ts), batch_spline_evaluate(t, cy, ts)
+            gap = np.hypot(x[..., None] - self.obstacles[:, 0], y[..., None] - self.obstacles[:, 1]) - self.obstacles[:, 2] - radii[:, None, None]
+            density = (np.maximum(0.0, radii[:, None, None] - gap) / radii[:, None, None]) ** 2
+            penalty = density.sum(axis=(1, 2)) * duration / _CLEARANCE_SAMPLES
+            fitness += settings.FITNESS_WEIGHT_COLLISIONS_OBSTACLES * penalty.reshape(batch, drones).sum(axis=1)
+
+        # Clearance between drones while both are between their first and last control point
+        if drones > 1:
+            first, second = np.triu_indices(drones, k=1)
+            a = (np.arange(batch)[:, None] * drones + first).ravel()
+            b = (np.arange(batch)[:, None] * drones + second).ravel()
+            begin = np.maximum(t[a, 1], t[b, 1])
+            end = np.minimum(t[a, -2], t[b, -2])
+            length = np.maximum(0.0, end - begin)
+            ts = begin[:, None] + np.linspace(0.0, 1.0, _CLEARANCE_SAMPLES)[None, :] * length[:, None]
+            gap = np.hypot(
+                batch_spline_evaluate(t[a], cx[a], ts) - batch_spline_evaluate(t[b], cx[b], ts),
+                batch_spline_evaluate(t[a], cy[a], ts) - batch_spline_evaluate(t[b], cy[b], ts)
+            ) - radii[a, None] - radii[b, None]
+            margin = (radii[a] + radii[b])[:, None] / 2
+            density = (np.maximum(0.0, margin - gap) / margin) ** 2
+            penalty = density.sum(axis=1) * length / _CLEARANCE_SAMPLES
+            fitness += settings.FITNESS_WEIGHT_COLLISIONS_DRONES * penalty.reshape(batch, -1).sum(axis=1)
+        return fitness
+
+
+def refine_position(position: list[DronePath], environment: Environment, max_iterations: int | None = None) -> tuple[list[DronePath], int]:
+    """
+    Refines a position with L-BFGS-B on the smooth surrogate of the fitness.
+    The gradient is calculated by central differences of all coordinates, evaluated together in one batch.
+
+    :param position: The position to refine.
+    :param environment: The environment the position is rated in.
+    :param max_iterations: Maximum number of iterations of L-BFGS-B. Defaults to PSO_LOCAL_SEARCH_MAX_ITERATIONS of the config.
+    :return: A tuple of the refined position and the number of smooth fitness evaluations (positions rated) it took.
+    """
+    max_iterations = max_iterations if max_iterations is not None else settings.PSO_LOCAL_SEARCH_MAX_ITERATIONS
+    smooth_fitness = SmoothFitness(environment)
+    initial: np.ndarray = position_to_array(position)
+    shape = initial.shape
+    dimension = initial.size
+
+    lower = np.broadcast_to(np.array([0.0, 0.0, 0.1]), shape).ravel()
+    upper = np.broadcast_to(np.array([environment.bounds[0], environment.bounds[1], settings.DRONE_MAX_SPEED]), shape).ravel()
+    step = _STEP * np.maximum(upper - lower, 1.0)
+    offsets = np.concatenate([np.zeros((1, dimension)), np.diag(step), -np.diag(step)])
+    evaluations: int = 0
+
+    def objective(x: np.ndarray) -> tuple[float, np.ndarray]:
+        nonlocal evaluations
+        values = smooth_fitness((x + offsets).reshape(-1, *shape))
+        evaluations += len(offsets)
+        gradient = (values[1:dimension + 1] - values[dimension + 1:]) / (2 * step)
+        return float(values[0]), gradient
+
+    result = minimize(
+        objective,
+        np.clip(initial.ravel(), lower, upper),
+        jac=True,
+        method='L-BFGS-B',
+        bounds=list(zip(lower, upper)),
+        options={'maxiter': max_iterations}
+    )
+    return array_to_position(result.x.reshape(shape)), evaluations
@@ -0,0 +1,128 @@
+import numpy as np
+
+from .particle import DronePath, copy_position
+
+
+def dominates(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Checks whether objective vectors dominate others (every objective is at most as large and at least one is smaller). All objectives are minimized.
+    The arrays are broadcast against each other, so one vector can be compared to many in a single call.
+
+    :param a: Objective vectors, shape (..., objectives).
+    :param b: Objective vectors, shape (..., objectives).
+    :return: Boolean array, True where a dominates b.
+    """
+    return np.all(a <= b, axis=-1) & np.any(a < b, axis=-1)
+
+def crowding_distance(objectives: np.ndarray) -> np.ndarray:
+    """
+    Calculates the crowding distance of every member of a front: the normalized size of the box spanned by its neighbors in every objective.
+    Members at the boundary of any objective have an infinite distance, so they are never removed when pruning.
+
+    :param objectives: Objective vectors of the front, shape (members, objectives).
+    :return: The crowding distance of every member, shape (members,).
+    """
+    n, m = objectives.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    for k in range(m):
+        order = np.argsort(objectives[:, k], kind='stable')
+        values = objectives[order, k]
+        span = values[-1] - values[0]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / span
+    return distance
+
+
+class ParetoArchive:
+    """
+    This class represents a bounded archive of non-dominated solutions.
+
+    Every solution is stored together with its objective vector. Adding a solution costs one vectorized dominance check against the archive:
+    dominated solutions are rejected, solutions dominated by the new one are removed.
+    If the archive exceeds its capacity, the member with the smallest crowding distance is removed, which keeps the front evenly spread.
+    Any weighting of the objectives can be selected from the archive afterwards.
+    """
+
+    capacity: int # Maximum number of solutions
+    objectives: np.ndarray # Objective vectors of all members, shape (members, objectives)
+    positions: list[list[DronePath]] # Solutions of all members
+    _crowding: np.ndarray | None # Crowding distances of all members, None if outdated
+
+    def __init__(self, capacity: int, num_objectives: int = 4):
+        """
+        :param capacity: Maximum number of solutions.
+        :param num_objectives: Number of objectives of a solution.
+        """
+        self.capacity = capacity
+        self.objectives = np.empty((0, num_objectives))
+        self.positions = []
+        self._crowding = None
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(self, objectives: tuple[float, ...] | np.ndarray, position: list[DronePath]) -> bool:
+        """
+        This method offers a solution to the archive.
+
+        :param objectives: Objective vector of the solution.
+        :param position: The solution. It is copied when accepted.
+        :return: True if the solution was accepted, False if it is dominated by (or equal to) a member.
+        """
+        vector = np.asarray(objectives, dtype=float)
+        if len(self.positions) > 0:
+            if np.any(dominates(self.objectives, vector) | np.all(self.objectives == vector, axis=1)):
+                return False
+            keep = ~dominates(vector, self.objectives)
+            if not np.all(keep):
+                self.objectives = self.objectives[keep]
+                self.positions = [position for position, kept in zip(self.positions, keep) if kept]
+
+        self.objectives = np.vstack([self.objectives, vector])
+        self.positions.append(copy_position(position))
+        self._crowding = None
+        if len(self.positions) > self.capacity:
+            self._remove(int(np.argmin(crowding_distance(self.objectives))))
+        return True
+
+    def select(self, weights: tuple[float, ...] | np.ndarray) -> tuple[list[DronePath], np.ndarray, float]:
+        """
+        This method selects the member minimizing a weighted sum of the objectives.
+
+        :param weights: Weight of every objective.
+        :return: A tuple of the selected solution, its objective vector and its weighted sum.
+        """
+        if len(self.positions) == 0:
+            raise ValueError('The archive is empty')
+        values = self.objectives @ np.asarray(weights, dtype=float)
+        best = int(np.argmin(values))
+        return self.positions[best], self.objectives[best], float(values[best])
+
+    def leader(self, rng: np.random.Generator) -> list[DronePath]:
+        """
+        This method selects a member to guide a particle: the less crowded of two random members (binary tournament), which drives the swarm towards sparse regions of the front.
+        The crowding distances are only calculated again after the archive changed.
+
+        :param rng: The randomizer.
+        :return: The selected solution.
+        """
+        if len(self.positions) == 0:
+            raise ValueError('The archive is empty')
+        a, b = rng.integers(0, len(self.positions), size=2)
+        if self._crowding is None:
+            self._crowding = crowding_distance(self.objectives)
+        distance = self._crowding
+        return self.positions[a if distance[a] >= distance[b] else b]
+
+    def _remove(self, index: int) -> None:
+        """
+        This method removes a member.
+
+        :param index: Index of the member.
+        """
+        self.objectives = np.delete(self.objectives, index, axis=0)
+        del self.positions[index]
+        self._crowding = None
@@ -1,11 +1,10 @@
 import math
 import numpy as np
+from scipy.stats import qmc
 
-from DroneSwarmPathOpti.config import get_settings
-from copy import deepcopy
+from DroneSwarmPathOpti.config import get_settings, random_stream, STREAM_PARTICLE, STREAM_SWARM
 
 settings = get_settings()
-rng = np.random.default_rng(None if settings.SEED_PARTICLE == -1 else settings.SEED_PARTICLE)
 
 
 
@@ -42,15 +41,90 @@ class DronePath:
         return [v for _, _, v in self.control_points]
 
 
+def copy_position(position: list[DronePath]) -> list[DronePath]:
+    """
+    Copies a particle's position (or velocity). Control points are immutable tuples, so copying the lists is sufficient and much cheaper than a deepcopy.
+
+    :param position: List of drone paths to copy.
+    :return: An independent copy of the drone paths.
+    """
+    return [DronePath(list(path.control_points)) for path in position]
+
+def position_to_array(position: list[DronePath]) -> np.ndarray:
+    """
+    Converts a particle's position (or velocity) into an array.
+
+    :param position: List of drone paths.
+    :return: An array of shape (drones, control points, 3).
+    """
+    return np.array([path.control_points for path in position], dtype=float)
+
+def array_to_position(array: np.ndarray) -> list[DronePath]:
+    """
+    Converts an array into a particle's position (or velocity).
+
+    :param array: An array of shape (drones, control points, 3).
+    :return: List of drone paths.
+    """
+    return _nested_to_position(np.asarray(array).tolist())
+
+def _nested_to_position(nested: list[list[list[float]]]) -> list[DronePath]:
+    """
+    Converts nested lists (as returned by ndarray.tolist) into a particle's position (or velocity).
+
+    :param nested: Nested lists of shape (drones, control points, 3).
+    :return: List of drone paths.
+    """
+    return [DronePath(list(map(tuple, drone))) for drone in nested]
+
+def resample_path(path: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Resamples a polyline into n points evenly spaced by arc length, excluding both of its ends.
+
+    :param path: The polyline, shape (points, 2).
+    :param n: Number of points.
+    :return: A tuple of the points and the normalized normals of the polyline at these points, each of shape (n, 2).
+    """
+    path = np.asarray(path, dtype=float)
+    arc_length: np.ndarray = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(path, axis=0).T))])
+    fractions: np.ndarray = arc_length[-1] * np.arange(1, n + 1) / (n + 1)
+
+    points: np.ndarray = np.stack([np.interp(fractions, arc_length, path[:, 0]), np.interp(fractions, arc_length, path[:, 1])], axis=1)
+
+    # Direction of the polyline at every point, smoothed over the distance between two points (grid paths only know 8 directions)
+    spacing: float = arc_length[-1] / (n + 1)
+    ahead: np.ndarray = np.minimum(fractions + spacing / 2, arc_length[-1])
+    behind: np.ndarray = np.maximum(fractions - spacing / 2, 0.0)
+    tangents: np.ndarray = np.stack([
+        np.interp(ahead, arc_length, path[:, 0]) - np.interp(behind, arc_length, path[:, 0]),
+        np.interp(ahead, arc_length, path[:, 1]) - np.interp(behind, arc_length, path[:, 1])
+    ], axis=1)
+    tangents /= np.maximum(np.linalg.norm(tangents, axis=1, keepdims=True), 1e-12)
+    normals: np.ndarray = np.stack([tangents[:, 1], -tangents[:, 0]], axis=1) # Same orientation as the anchor pattern
+
+    return points, normals
+
+def _initial_velocity_limits() -> np.ndarray:
+    """
+    Returns the current bounds of an initial particle velocity. The bounds are read on every call since they are adapted during the optimization.
+
+    :return: An array containing the bounds for dx, dy and dv.
+    """
+    return np.array([
+        settings.PSO_MAX_INITIAL_VELOCITY_X,
+        settings.PSO_MAX_INITIAL_VELOCITY_Y,
+        settings.PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY
+    ])
+
+
 class Particle:
     """
     This class represents a particle and bundles a fix amount of DronePaths (specified in the config file).
     """
 
+    num_drones: int # Number of drone paths in a particle
     num_control_points: int # Number of points in a drone's path
     map_bounds: tuple[float, float] # Size of the environment
-    map_start: tuple[float, float] # Position of the start
-    map_goal: tuple[float, float] # Position of the goal
     max_drone_speed: float # Physical cap on a drone's velocity
 
     particle_position: list[DronePath] # NOTE: this represents the particle's current position, NOT any drone's position (The current solution inside the solution space)
@@ -58,118 +132,46 @@ class Particle:
 
     best_position: list[DronePath] # 'best position' this particle has found (so far)
     best_fitness: float # best fitness value this particle has found (so far)
+    best_objectives: np.ndarray | None # objectives of the 'best position', only tracked in multi-objective mode
     current_fitness: float # fitness value of the current position
 
     velocity_damping: float # damping value of the particles velocity after 'violating the boundaries'
+    rng: np.random.Generator # Random stream of this particle, independent of all other particles
 
-    def __init__(self):
-        self.num_drones = settings.NUMBER_DRONES
-        self.num_control_points = settings.INITIAL_CONTROL_POINTS
+    def __init__(self,
+                 position: list[DronePath] | None = None,
+                 velocity: list[DronePath] | None = None,
+                 rng: np.random.Generator | None = None,
+                 key: tuple[int, ...] | None = None):
+        """
+        :param position: Initial position of the particle. If None, a position is sampled around the anchor points between start and goal.
+        :param velocity: Initial velocity of the particle. If None, a velocity is sampled inside the bounds specified by the config.
+        :param rng: Random stream of the particle (particles of a swarm get their streams from the SwarmInitializer).
+        :param key: Address of the particle's stream derived from SEED_PARTICLE, only used if no rng is given. Particles created in the same run need different keys.
+        """
+        if rng is None and key is None:
+            raise ValueError('A particle needs a random stream or the key of one')
+        self.rng = rng if rng is not None else random_stream(settings.SEED_PARTICLE, STREAM_PARTICLE, 1, *key)
+        if position is None or velocity is None: # Single particle -> sample it on its own (use a SwarmInitializer for whole swarms)
+            initializer = SwarmInitializer(rng=self.rng)
+            position = position if position is not None else array_to_position(initializer.sample_positions(1)[0])
+            velocity = velocity if velocity is not None else array_to_position(initializer.sample_velocities(1)[0])
+
+        self.num_drones = len(position)
+        self.num_control_points = len(position[0].control_points)
         self.map_bounds = (settings.ENVIRONMENT_SIZE_X, settings.ENVIRONMENT_SIZE_Y)  # (x_max, y_max)
-        self.map_start = (settings.START_X, settings.START_Y)
-        self.map_goal = (settings.GOAL_X, settings.GOAL_Y)
         self.max_drone_speed = settings.DRONE_MAX_SPEED
 
-        self.initial_position_bounds = settings.PSO_INITIAL_POSITION_BOUNDS
-        self.initial_distance_paths = settings.PSO_INITIAL_DISTANCE_PATHS
-
         self.velocity_damping = settings.PSO_VELOCITY_DAMPING
 
-        self.particle_position = self._initialize_position()
-        self.particle_velocity = self._initialize_velocity()
+        self.particle_position = position
+        self.particle_velocity = velocity
 
-        self.best_position = deepcopy(self.particle_position)
+        self.best_position = copy_position(self.particle_position)
         self.best_fitness = float('inf')
+        self.best_objectives = None
         self.current_fitness = float('inf')
 
-    def _initialize_position(self): # TODO a lot of this can be done just once instead of every time a particle is initialized
-        """
-        This method initializes the first position of a particle.
-
-        :return: A randomized position inside the solution space represented by a fix amount of drone paths.
-        """
-        # Vector start -> goal
-        vec_start_goal: np.array = np.array([
-            self.map_goal[0] - self.map_start[0],
-            self.map_goal[1] - self.map_start[1]
-        ])
-        # Vector perpendicular to vector start -> goal
-        vec_perpendicular_start_goal: np.array = np.array([
-            vec_start_goal[1],
-            -vec_start_goal[0]
-        ])
-
-        # Perpendicular distance between two most outer drone paths
-        distance_perpendicular: float = (self.num_drones - 1) * self.initial_distance_paths
-
-        # Distance start -> goal
-        distance_start_goal: float = math.sqrt((self.map_goal[0] - self.map_start[0])**2 + (self.map_goal[1] - self.map_start[1])**2)
-
-        # Point in the middle of vector start -> goal
-        point_center_start_goal: np.array = np.array ([
-            self.map_start[0] + vec_start_goal[0] * 0.5,
-            self.map_start[1] + vec_start_goal[1] * 0.5
-        ])
-
-        # Normalized vector perpendicular to vector start -> goal
-        vec_normalized_perpendicular_start_goal: np.array = vec_perpendicular_start_goal / np.linalg.norm(vec_perpendicular_start_goal)
-
-        # Normalized vector start -> goal
-        vec_normalized_start_goal: np.array = vec_start_goal / np.linalg.norm(vec_start_goal)
-
-        # Point in the middle of the most outer drone path
-        point_anchor_path: np.array = point_center_start_goal + distance_perpendicular * 0.5 * vec_normalized_perpendicular_start_goal
-
-        # Portion of the distance start -> goal each drone path has
-        peak_profile: list[float] = self._generate_peak_profile(self.num_drones)
-
-        # Point on the lower end of the most outer drone path
-        point_anchor_control_point: np.array = point_anchor_path + distance_start_goal * 0.5 * peak_profile[0] * -vec_normalized_start_goal
-
-        # Distance between each control_point on the path
-        distance_control_points: float = distance_start_goal * peak_profile[0] / (self.num_drones + 1)
-
-        initial_position: list[DronePath] = []
-        for i in range(self.num_drones):
-            distance_control_points = distance_start_goal * peak_profile[i] / (self.num_control_points + 1)  # Distance between each control_point on the path
-
-            control_points: list[tuple[float, float, float]] = []
-            for _ in range(self.num_control_points): # Initialize every point of a drone path inside its bounds
-                point_anchor_control_point = point_anchor_control_point + distance_control_points * vec_normalized_start_goal # Progress to next control point
-                control_points.append((
-                    rng.uniform(
-                        float(point_anchor_control_point[0] - self.initial_position_bounds / 2),
-                        float(point_anchor_control_point[0] + self.initial_position_bounds / 2)),  # X-coordinate
-                    rng.uniform(
-                        float(point_anchor_control_point[1] - self.initial_position_bounds / 2),
-                        float(point_anchor_control_point[1] + self.initial_position_bounds / 2)),  # Y-coordinate
-                    rng.uniform(0.0, float(self.max_drone_speed))  # Drone velocity
-                ))
-            initial_position.append(DronePath(control_points))
-
-            point_anchor_path = point_anchor_path + self.initial_distance_paths * -vec_normalized_perpendicular_start_goal # Move to the next drone path
-            point_anchor_control_point = point_anchor_path + distance_start_goal * 0.5 * peak_profile[i+1] * -vec_normalized_start_goal # Reset the anchor of the control points
-
-        return initial_position
-
-    def _initialize_velocity(self):
-        """
-        This method initializes the initial velocity inside the by the config specified bounds.
-
-        :return: A randomized velocity for the bounds specified by the config represented by a fix amount of drone paths.
-        """
-        return [
-            DronePath([
-                (
-                    rng.uniform(-settings.PSO_MAX_INITIAL_VELOCITY_X, settings.PSO_MAX_INITIAL_VELOCITY_X),  # dx
-                    rng.uniform(-settings.PSO_MAX_INITIAL_VELOCITY_Y, settings.PSO_MAX_INITIAL_VELOCITY_Y),  # dy
-                    rng.uniform(-settings.PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY, settings.PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY)   # dv
-                )
-                for _ in range(self.num_control_points)
-            ])
-            for _ in range(self.num_drones)
-        ]
-
     def update_velocity(self, global_best_position: list[DronePath]) -> None:
         """
         This method updates the particles velocity by taking current velocity, current personal best and the current global best into consideration.
@@ -184,7 +186,7 @@ class Particle:
                 personal_best_x, personal_best_y, personal_best_v = self.best_position[drone].control_points[control_point]
                 global_best_x, global_best_y, global_best_v = global_best_position[drone].control_points[control_point]
 
-                random_factor_personal_best, random_factor_global_best = rng.uniform(0, 1), rng.uniform(0, 1)
+                random_factor_personal_best, random_factor_global_best = self.rng.uniform(0, 1), self.rng.uniform(0, 1)
 
                 new_vx = (
                         settings.PSO_WEIGHT_PERSONAL_POSITION * velocity_x
@@ -243,17 +245,10 @@ class Particle:
 
         :return: None
         """
-        self.particle_velocity = [
-            DronePath([
-                (
-                    rng.uniform(-settings.PSO_MAX_INITIAL_VELOCITY_X, settings.PSO_MAX_INITIAL_VELOCITY_X),  # dx
-                    rng.uniform(-settings.PSO_MAX_INITIAL_VELOCITY_Y, settings.PSO_MAX_INITIAL_VELOCITY_Y),  # dy
-                    rng.uniform(-settings.PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY, settings.PSO_MAX_INITIAL_VELOCITY_DRONE_VELOCITY)  # dv
-                )
-                for _ in range(self.num_control_points)
-            ])
-            for _ in range(self.num_drones)
-        ]
+        limits = _initial_velocity_limits()
+        self.particle_velocity = array_to_position(
+            self.rng.uniform(-limits, limits, size=(self.num_drones, self.num_control_points, 3))
+        )
 
     @staticmethod
     def clip(value: float, lower: float, upper: float) -> float:
@@ -272,6 +267,205 @@ class Particle:
         """
         return max(min(value, upper), lower)
 
+
+class SwarmInitializer:
+    """
+    This class initializes the positions and velocities of whole swarms.
+
+    A pattern of anchor points is calculated once between start and goal using the number of drones and their respective control points.
+    The positions of all particles are then drawn around their corresponding anchor points in a single vectorized call.
+    Besides uniform random sampling, quasi-random sampling (Sobol or Latin hypercube) is available for a better coverage of the initial search space.
+    The swarm is sampled from its own random stream and every particle receives an own stream for its movement, so that the optimization does not depend on the order in which particles are processed.
+    """
+
+    SAMPLING_METHODS = ('uniform', 'sobol', 'latin_hypercube')
+
+    num_drones: int # Number of drone paths in a particle
+    num_control_points: int # Number of points in a drone's path
+    max_drone_speed: float # Physical cap on a drone's velocity
+    initial_position_bounds: float # Area around an anchor point in which a control point is generated
+    sampling: str # Sampling method
+
+    anchors: np.ndarray # Anchor point of every control point, shape (drones, control points, 2)
+    seed_path: np.ndarray | None # Feasible path from start to goal to seed particles with, shape (points, 2)
+    seed_path_share: float # Portion of particles initialized along the seed path
+    key: tuple[int, ...] # Address of the swarm's random streams (e.g. the index of a window or an island)
+    rng: np.random.Generator # Random stream the swarm is sampled from
+
+    def __init__(self,
+                 num_drones: int | None = None,
+                 num_control_points: int | None = None,
+                 start: tuple[float, float] | None = None,
+                 goal: tuple[float, float] | None = None,
+                 sampling: str | None = None,
+                 seed_path: list[tuple[float, float]] | None = None,
+                 seed_path_share: float | None = None,
+                 key: tuple[int, ...] = (),
+                 rng: np.random.Generator | None = None):
+        """
+        :param num_drones: Number of drone paths in a particle. Defaults to the config.
+        :param num_control_points: Number of points in a drone's path. Defaults to the config.
+        :param start: Position of the start. Defaults to the config.
+        :param goal: Position of the goal. Defaults to the config.
+        :param sampling: Sampling method, one of SAMPLING_METHODS. Defaults to the config.
+        :param seed_path: Feasible path from start to goal (e.g. the environment's validation path). None or an empty path disables seeding.
+        :param seed_path_share: Portion of particles initialized along the seed path. Defaults to the config.
+        :param key: Address of the swarm's random streams. Swarms optimized in the same run (e.g. windows or islands) need different keys.
+        :param rng: Random stream to sample from. Defaults to the stream of the swarm derived from SEED_PARTICLE and the key.
+        """
+        self.num_drones = num_drones if num_drones is not None else settings.NUMBER_DRONES
+        self.num_control_points = num_control_points if num_control_points is not None else settings.INITIAL_CONTROL_POINTS
+        self.max_drone_speed = settings.DRONE_MAX_SPEED
+        self.initial_position_bounds = settings.PSO_INITIAL_POSITION_BOUNDS
+        self.sampling = sampling if sampling is not None else settings.PSO_INITIAL_SAMPLING
+        if self.sampling not in self.SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling method '{self.sampling}', expected one of {self.SAMPLING_METHODS}")
+
+        self.anchors = self._calculate_anchors(
+            np.array(start if start is not None else (settings.START_X, settings.START_Y), dtype=float),
+            np.array(goal if goal is not None else (settings.GOAL_X, settings.GOAL_Y), dtype=float)
+        )
+
+        self.seed_path = np.array(seed_path, dtype=float).reshape(-1, 2) if seed_path is not None and len(seed_path) > 1 else None
+        self.seed_path_share = seed_path_share if seed_path_share is not None else settings.PSO_INITIAL_PATH_SHARE
+        self.key = tuple(key)
+        self.rng = rng if rng is not None else random_stream(settings.SEED_PARTICLE, STREAM_SWARM, *self.key)
+
+    def create_particles(self, n: int) -> list[Particle]:
+        """
+        This method creates a swarm of particles.
+
+        :param n: Number of particles.
+        :return: A list of n particles with sampled positions and velocities.
+        """
+        positions = self.create_positions(n).tolist() # Convert all particles at once, a conversion per particle is much slower
+        velocities = self.sample_velocities(n).tolist()
+        return [
+            Particle(_nested_to_position(position), _nested_to_position(velocity), random_stream(settings.SEED_PARTICLE, STREAM_PARTICLE, 0, *self.key, i))
+            for i, (position, velocity) in enumerate(zip(positions, velocities))
+        ]
+
+    def create_positions(self, n: int) -> np.ndarray:
+        """
+        This method samples the initial positions of a swarm: a share along the seed path (if any), the rest around the anchor points.
+
+        :param n: Number of particles.
+        :return: An array of shape (n, drones, control points, 3).
+        """
+        seeded: int = round(n * self.seed_path_share) if self.seed_path is not None else 0
+        return np.concatenate([
+            self.sample_path_positions(seeded),
+            self.sample_positions(n - seeded)
+        ])
+
+    def sample_positions(self, n: int) -> np.ndarray:
+        """
+        This method samples the initial positions of n particles around the anchor points.
+
+        :param n: Number of particles.
+        :return: An array of shape (n, drones, control points, 3).
+        """
+        unit = self._sample_unit(n).reshape(n, self.num_drones, self.num_control_points, 3)
+        positions = np.empty_like(unit)
+        positions[..., :2] = self.anchors + (unit[..., :2] - 0.5) * self.initial_position_bounds # X- and Y-coordinate
+        positions[..., 2] = unit[..., 2] * self.max_drone_speed # Drone velocity
+        return positions
+
+    def sample_path_positions(self, n: int) -> np.ndarray:
+        """
+        This method samples the initial positions of n particles along the seed path.
+
+        The seed path is resampled into evenly spaced control points. Every drone path is offset perpendicular to the seed path
+        (using the same spacing as the anchor points) and every control point is jittered slightly, so that seeded particles differ from each other.
+
+        :param n: Number of particles.
+        :return: An array of shape (n, drones, control points, 3).
+        """
+        if n == 0 or self.seed_path is None:
+            return np.empty((0, self.num_drones, self.num_control_points, 3))
+
+        points, normals = resample_path(self.seed_path, self.num_control_points)
+        lanes: np.ndarray = points + self._lane_offsets()[:, None, None] * normals # (drones, control points, 2)
+
+        jitter: float = settings.PSO_INITIAL_DISTANCE_PATHS / 2 # Drone paths must not be jittered into each other's lane
+        positions = np.empty((n, self.num_drones, self.num_control_points, 3))
+        positions[..., :2] = lanes + self.rng.uniform(-jitter, jitter, size=(n, self.num_drones, self.num_control_points, 2))
+        positions[..., 2] = self.rng.uniform(0.0, self.max_drone_speed, size=(n, self.num_drones, self.num_control_points))
+        return positions
+
+    def sample_velocities(self, n: int) -> np.ndarray:
+        """
+        This method samples the initial velocities of n particles inside the bounds specified by the config.
+
+        :param n: Number of particles.
+        :return: An array of shape (n, drones, control points, 3).
+        """
+        limits = _initial_velocity_limits()
+        if self.sampling == 'uniform':
+            return self.rng.uniform(-limits, limits, size=(n, self.num_drones, self.num_control_points, 3))
+        unit = self._sample_unit(n).reshape(n, self.num_drones, self.num_control_points, 3)
+        return (2 * unit - 1) * limits
+
+    def _sample_unit(self, n: int) -> np.ndarray:
+        """
+        This method samples n points inside the unit hypercube of the solution space using the configured sampling method.
+
+        :param n: Number of points.
+        :return: An array of shape (n, drones * control points * 3).
+        """
+        dimension = self.num_drones * self.num_control_points * 3
+        if n == 0:
+            return np.empty((0, dimension))
+        if self.sampling == 'sobol':
+            engine = qmc.Sobol(dimension, scramble=True, rng=self.rng)
+            return engine.random_base2(max(0, math.ceil(math.log2(n))))[:n] # Sobol points are balanced for powers of two only
+        if self.sampling == 'latin_hypercube':
+            return qmc.LatinHypercube(dimension, rng=self.rng).random(n)
+        return self.rng.uniform(0.0, 1.0, size=(n, dimension))
+
+    def _calculate_anchors(self, start: np.ndarray, goal: np.ndarray) -> np.ndarray:
+        """
+        This method calculates the anchor point of every control point of every drone path.
+
+        The drone paths are placed parallel to the vector start -> goal with a distance of PSO_INITIAL_DISTANCE_PATHS between each other.
+        Their length follows a peak profile, so that the paths in the middle are the longest.
+
+        :param start: Position of the start.
+        :param goal: Position of the goal.
+        :return: An array of shape (drones, control points, 2).
+        """
+        vec_start_goal: np.ndarray = goal - start # Vector start -> goal
+        distance_start_goal: float = float(np.linalg.norm(vec_start_goal)) # Distance start -> goal
+        vec_normalized_start_goal: np.ndarray = vec_start_goal / distance_start_goal # Normalized vector start -> goal
+        vec_normalized_perpendicular_start_goal: np.ndarray = np.array([vec_normalized_start_goal[1], -vec_normalized_start_goal[0]]) # Normalized vector perpendicular to vector start -> goal
+        point_center_start_goal: np.ndarray = start + vec_start_goal * 0.5 # Point in the middle of vector start -> goal
+
+        # Portion of the distance start -> goal each drone path has
+        peak_profile: np.ndarray = np.array(self._generate_peak_profile(self.num_drones)[:self.num_drones])[:, None]
+
+        # Perpendicular offset of each drone path, beginning with the most outer one
+        offset_paths: np.ndarray = self._lane_offsets()[:, None]
+
+        # Offset of each control point along its drone path, evenly distributed around the center of the path
+        offset_control_points: np.ndarray = distance_start_goal * peak_profile * (
+                (np.arange(self.num_control_points)[None, :] + 1) / (self.num_control_points + 1) - 0.5
+        )
+
+        return (
+                point_center_start_goal
+                + offset_paths[..., None] * vec_normalized_perpendicular_start_goal
+                + offset_control_points[..., None] * vec_normalized_start_goal
+        )
+
+    def _lane_offsets(self) -> np.ndarray:
+        """
+        This method calculates the perpendicular offset of every drone path to the center line, beginning with the most outer one.
+
+        :return: An array of shape (drones,).
+        """
+        distance_perpendicular: float = (self.num_drones - 1) * settings.PSO_INITIAL_DISTANCE_PATHS # Perpendicular distance between two most outer drone paths
+        return distance_perpendicular * 0.5 - np.arange(self.num_drones) * settings.PSO_INITIAL_DISTANCE_PATHS
+
     @staticmethod
     def _generate_peak_profile(n: int, step: float = 0.2) -> list[float]:
         """
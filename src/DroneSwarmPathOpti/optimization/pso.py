@@ -1,14 +1,32 @@
+import time
 from copy import deepcopy
 from typing import Callable
 
+import numpy as np
+
 from DroneSwarmPathOpti.simulation import Environment
 
-from .particle import Particle, DronePath
-from ..config import get_settings
-from ..project_logger import log_info, Source, log_debug
+from .fitness import calculate_fitness, calculate_objectives, calculate_obstacle_collisions, weight_objectives
+from .local_search import refine_position
+from .pareto import ParetoArchive, dominates
+from .particle import Particle, DronePath, SwarmInitializer, position_to_array, array_to_position, copy_position
+from .refinement import refinement_schedule, subdivide_positions, subdivide_velocities
+from .replanning import diff_obstacles, repair_positions
+from .surrogate import SurrogateModel
+from ..config import get_settings, random_stream, STREAM_OPTIMIZER
+from ..project_logger import log_info, Source, log_debug, start_telemetry, flush_telemetry, telemetry_enabled, log_telemetry, start_trace, flush_trace, trace_enabled, log_trace
 
 settings = get_settings()
 
+_SCHEDULED_PARAMETERS: tuple[str, ...] = ( # Settings adapted by the schedule during an optimization
+    'PSO_MAX_VELOCITY_X',
+    'PSO_MAX_VELOCITY_Y',
+    'PSO_MAX_INITIAL_VELOCITY_X',
+    'PSO_MAX_INITIAL_VELOCITY_Y',
+    'PSO_WEIGHT_GLOBAL_BEST',
+    'PSO_WEIGHT_PERSONAL_POSITION',
+)
+
 class PSO:
     """
     This class contains the logical component of the particle swarm optimization and controls the evolutionary process.
@@ -18,17 +36,44 @@ class PSO:
     environment: Environment
     num_particles: int
     max_iterations: int
+    num_control_points: int # Current number of points in a drone's path
+    refinements: dict[int, int] # Iterations at which points are inserted into all drone paths, mapped to the number of points afterwards
 
     particles: list[Particle]
 
     global_best_position: list[DronePath]
     global_best_fitness: float
+    global_best_objectives: tuple[float, float, float, float] | None # Only calculated for telemetry, None if outdated
+
+    key: tuple[int, ...] # Address of the random streams of this optimization
+    rng: np.random.Generator # Random stream of decisions affecting the whole swarm
+
+    local_search_evaluations: int # Number of positions rated by the smooth fitness of the local search so far
+
+    surrogate: SurrogateModel | None # Predicts the fitness of particles to skip unpromising evaluations, None if disabled
+    true_evaluations: int # Number of particles rated by the fitness function so far
+    skipped_evaluations: int # Number of particles only rated by the surrogate so far
+
+    archive: ParetoArchive | None # Non-dominated solutions of all evaluated positions, None if not in multi-objective mode
+
+    final_parameters: dict[str, float] | None # Values of the scheduled settings at the end of the last optimization, None if not optimized yet
+
+    planned_obstacles: np.ndarray # Obstacles of the environment the swarm was last optimized for
+    planned_endpoints: tuple[tuple[int, int], tuple[int, int]] # Start and goal of the environment the swarm was last optimized for
 
-    def __init__(self, fitness_function, environment: Environment):
+    def __init__(self, fitness_function, environment: Environment, max_iterations: int | None = None, key: tuple[int, ...] = ()):
+        """
+        :param fitness_function: Function rating the position of a particle in an environment (lower is better).
+        :param environment: The environment to optimize the drone paths for.
+        :param max_iterations: Number of iterations to perform. Defaults to the config.
+        :param key: Address of the random streams of this optimization. Optimizations in the same run (e.g. windows or islands) need different keys to be independent.
+        """
         self.fitness_function = fitness_function
         self.environment = environment
         self.num_particles = settings.PSO_PARTICLES
-        self.max_iterations = settings.PSO_ITERATIONS
+        self.max_iterations = max_iterations if max_iterations is not None else settings.PSO_ITERATIONS
+        self.key = tuple(key)
+        self.rng = random_stream(settings.SEED_PARTICLE, STREAM_OPTIMIZER, *self.key)
 
         self.step_decrease_max_velocity_x = (settings.PSO_MAX_VELOCITY_X - settings.PSO_DECREASE_MAX_VELOCITY_GOAL) / (self.max_iterations - (self.max_iterations * settings.PSO_DECREASE_MAX_VELOCITY_WHEN))
         self.step_decrease_max_velocity_y = (settings.PSO_MAX_VELOCITY_Y - settings.PSO_DECREASE_MAX_VELOCITY_GOAL) / (self.max_iterations - (self.max_iterations * settings.PSO_DECREASE_MAX_VELOCITY_WHEN))
@@ -38,73 +83,550 @@ class PSO:
         self.step_increase_weight_global = (settings.PSO_WEIGHT_GLOBAL_BEST - settings.PSO_INCREASE_WEIGHT_GLOBAL_GOAL) / (self.max_iterations - (self.max_iterations * settings.PSO_INCREASE_WEIGHT_GLOBAL_WHEN))
         self.step_decrease_weight_personal = (settings.PSO_WEIGHT_PERSONAL_POSITION - settings.PSO_DECREASE_WEIGHT_PERSONAL_GOAL) / (self.max_iterations - (self.max_iterations * settings.PSO_DECREASE_WEIGHT_PERSONAL_WHEN))
 
-        self.particles = [Particle() for _ in range(self.num_particles)]
+        self.num_control_points = settings.PSO_REFINE_START_CONTROL_POINTS or settings.INITIAL_CONTROL_POINTS
+        self.refinements = refinement_schedule(self.max_iterations, self.num_control_points, settings.INITIAL_CONTROL_POINTS, settings.PSO_REFINE_STEPS, settings.PSO_REFINE_WHEN)
+
+        self._initialize_swarm(SwarmInitializer(
+            num_control_points=self.num_control_points,
+            start=environment.start.position,
+            goal=environment.goal.position,
+            seed_path=self._seed_path(),
+            key=self.key
+        ))
 
-        self.global_best_position = deepcopy(self.particles[0].particle_position)
         self.global_best_fitness = float("inf")
+        self.global_best_objectives = None
+        self.archive = ParetoArchive(settings.PSO_ARCHIVE_SIZE) if settings.PSO_MULTI_OBJECTIVE else None
+        self.local_search_evaluations = 0
+        self.surrogate = self._create_surrogate()
+        self.true_evaluations = 0
+        self.skipped_evaluations = 0
+        self.final_parameters = None
+        self._particle_indices: dict[int, int] = {id(particle): i for i, particle in enumerate(self.particles)} # Stable index of every particle in the trace, the swarm is sorted every iteration
+        self._snapshot_environment()
+
+    def _initialize_swarm(self, initializer: SwarmInitializer) -> None:
+        """
+        This method creates the particles of the swarm. The position of the first particle is the global best until the first evaluation.
+
+        :param initializer: The initializer sampling the swarm.
+        :return: None
+        """
+        self.particles = initializer.create_particles(self.num_particles)
+        self.global_best_position = deepcopy(self.particles[0].particle_position)
+
+    def _seed_path(self) -> list[tuple[float, float]] | None:
+        """
+        This method selects the collision free path particles are seeded with according to the config (see seed_path).
+
+        :return: The path, None if no path is available.
+        """
+        return seed_path(self.environment)
 
     def optimize(self):
         """
         This method regulates the process of evolution and implements the logic of the particle swarm optimization.
 
         The config specifies the number of iterations.
+        The settings adapted by the schedule are restored afterwards, so that further optimizations in the same process start from the configured values.
 
         :return: A tuple containing the best solution found after the optimization process has been completed and its corresponding fitness value.
         """
-        for iteration in range(self.max_iterations):
+        start_telemetry() # Only starts if a telemetry file is configured
+        self._start_trace()
+        initial_parameters: dict[str, float] = _get_parameters()
+        try:
+            for iteration in range(self.max_iterations):
+                if iteration in self.refinements:
+                    self._refine_control_points(self.refinements[iteration])
+                self._adjust_parameters(iteration)
+                self._iterate(iteration)
+                log_info(Source.optimization, '[Iteration %d/%d] Global best fitness: %.4f', iteration + 1, self.max_iterations, self.global_best_fitness)
+        finally:
+            self.final_parameters = _get_parameters()
+            _set_parameters(initial_parameters)
+            flush_telemetry() # Telemetry and trace can be read right after the optimization, both continue with the next one
+            flush_trace()
 
-            # ADJUST PARAMETERS WHILE PROGRESSING
-            if iteration > self.max_iterations * settings.PSO_DECREASE_MAX_VELOCITY_WHEN:
-                log_debug(Source.optimization, 'PSO_DECREASE_MAX_VELOCITY_WHEN -> true')
-                settings.PSO_MAX_VELOCITY_X -= self.step_decrease_max_velocity_x
-                settings.PSO_MAX_VELOCITY_Y -= self.step_decrease_max_velocity_y
+        if self.surrogate is not None:
+            log_info(Source.optimization, 'Surrogate: %d of %d evaluations saved (%.1f%%), mean absolute error: %.4f',
+                     self.skipped_evaluations, self.true_evaluations + self.skipped_evaluations,
+                     100 * self.skipped_evaluations / max(1, self.true_evaluations + self.skipped_evaluations), self.surrogate.mean_error())
+        self._snapshot_environment()
+        return self.global_best_position, self.global_best_fitness
 
-            if iteration > self.max_iterations * settings.PSO_DECREASE_INITIAL_VELOCITY_WHEN:
-                log_debug(Source.optimization, 'PSO_DECREASE_INITIAL_VELOCITY_WHEN -> true')
-                settings.PSO_MAX_INITIAL_VELOCITY_X -= self.step_decrease_initial_velocity_x
-                settings.PSO_MAX_INITIAL_VELOCITY_Y -= self.step_decrease_initial_velocity_y
+    def replan(self, iterations: int | None = None):
+        """
+        This method continues the optimization after the environment changed (e.g. obstacles appeared, moved or vanished, or start or goal shifted) instead of starting from scratch.
 
-            if iteration > self.max_iterations * settings.PSO_INCREASE_WEIGHT_GLOBAL_WHEN:
-                log_debug(Source.optimization, 'PSO_INCREASE_WEIGHT_GLOBAL_WHEN -> true')
-                settings.PSO_WEIGHT_GLOBAL_BEST -= self.step_increase_weight_global
+        The swarm keeps its positions, velocities and bests:
+            - Control points inside added obstacles are pushed out of them
+            - Personal bests are rated again. If only obstacles changed and the default fitness with analytic collisions is used, only the collisions with the changed obstacles are calculated and the known fitness is updated accordingly
+            - The optimization continues for a short number of iterations using the final parameters of the schedule
 
-            if iteration > self.max_iterations * settings.PSO_DECREASE_WEIGHT_PERSONAL_WHEN:
-                log_debug(Source.optimization, 'PSO_DECREASE_WEIGHT_PERSONAL_WHEN -> true')
-                settings.PSO_WEIGHT_PERSONAL_POSITION -= self.step_decrease_weight_personal
+        :param iterations: Number of iterations to continue for. Defaults to PSO_REPLAN_ITERATIONS of the config.
+        :return: A tuple containing the best solution found after re-planning and its corresponding fitness value.
+        """
+        iterations = iterations if iterations is not None else settings.PSO_REPLAN_ITERATIONS
+        start_telemetry()
+        self._start_trace()
+        self._warm_start()
 
-            fitness_list: list[float] = []
-            for particle in self.particles:
-                fitness = self.fitness_function(particle.particle_position, self.environment) # Calculate fitness for current particle
+        initial_parameters: dict[str, float] = _get_parameters()
+        if self.final_parameters is not None:
+            _set_parameters(self.final_parameters) # Continue after the schedule, all parameters keep their final values
+        try:
+            for i in range(iterations):
+                self._iterate(self.max_iterations + i)
+                log_info(Source.optimization, '[Re-planning %d/%d] Global best fitness: %.4f', i + 1, iterations, self.global_best_fitness)
+        finally:
+            _set_parameters(initial_parameters)
+            flush_telemetry()
+            flush_trace()
 
-                particle.current_fitness = fitness
-                fitness_list.append(fitness)
+        self._snapshot_environment()
+        return self.global_best_position, self.global_best_fitness
 
+    def _start_trace(self) -> None:
+        """
+        This method starts recording the evaluations of the swarm. Only starts if a trace file is configured (see start_trace).
 
-                # Update personal best
-                if fitness < particle.best_fitness:
-                    particle.best_fitness = fitness
-                    particle.best_position = deepcopy(particle.particle_position)
+        :return: None
+        """
+        start_trace(len(self.environment.drones), max(self.num_control_points, settings.INITIAL_CONTROL_POINTS))
 
-                # Update global best
-                if fitness < self.global_best_fitness:
-                    self.global_best_fitness = fitness
-                    self.global_best_position = deepcopy(particle.particle_position)
+    def _warm_start(self) -> None:
+        """
+        This method adapts the swarm to the changes of the environment since the last optimization: particles are repaired and personal bests are rated again.
 
-            self.particles.sort(key=lambda p: p.current_fitness)
-            if iteration > self.max_iterations * settings.PSO_FLUSH_WHEN:
-                log_debug(Source.optimization, 'PSO_FLUSH_WHEN -> true')
-                for i in range((self.num_particles - 1), int(self.num_particles - self.num_particles * settings.PSO_FLUSH_SHARE), -1):
-                    self.particles[i].particle_position = deepcopy(self.global_best_position)
-                    self.particles[i].best_position = deepcopy(self.global_best_position)
-                    self.particles[i].reset_velocity()
+        :return: None
+        """
+        removed, added = diff_obstacles(self.planned_obstacles, self.environment.get_obstacle_array())
+        endpoints_changed: bool = self.planned_endpoints != self._endpoints()
+        log_info(Source.optimization, 'Re-planning: %d obstacles removed, %d added, start/goal changed: %s', len(removed), len(added), endpoints_changed)
 
-            # Update Velocity und Position
-            log_debug(Source.optimization, 'Updating velocities and positions')
-            for particle in self.particles:
-                particle.update_velocity(self.global_best_position)
-                particle.update_position()
+        self._repair_particles(added)
+        self.surrogate = self._create_surrogate() # All known fitness values are outdated
+        if self.archive is not None and (endpoints_changed or len(removed) > 0 or len(added) > 0):
+            self.archive = ParetoArchive(self.archive.capacity) # All objectives are outdated
+        if endpoints_changed or self.fitness_function is not calculate_fitness or not settings.FITNESS_ANALYTIC_COLLISIONS:
+            self._reevaluate_bests() # Every spline changed or the fitness can't be updated partially
+        elif len(removed) > 0 or len(added) > 0:
+            self._update_bests(removed, added)
 
-            log_debug(Source.optimization, f'FitnessList: {fitness_list}')
-            log_info(Source.optimization, f'[Iteration {iteration+1}/{self.max_iterations}] Global best fitness: {self.global_best_fitness:.4f}')
+    def _iterate(self, iteration: int) -> None:
+        """
+        This method performs a single iteration of the optimization: evaluating, flushing and moving all particles.
 
-        return self.global_best_position, self.global_best_fitness
+        :param iteration: The current iteration.
+        :return: None
+        """
+        evaluation_start: float = time.perf_counter()
+        evaluations: int = self.true_evaluations
+        fitness_list: list[float] = self._evaluate_particles(iteration)
+        evaluation_time: float = time.perf_counter() - evaluation_start
+        evaluations = self.true_evaluations - evaluations
+
+        self.particles.sort(key=lambda p: p.current_fitness)
+        self._flush(iteration)
+        if settings.PSO_LOCAL_SEARCH_EVERY > 0 and (iteration + 1) % settings.PSO_LOCAL_SEARCH_EVERY == 0:
+            self._refine_global_best()
+
+        # Update Velocity und Position
+        log_debug(Source.optimization, 'Updating velocities and positions')
+        for particle in self.particles:
+            particle.update_velocity(self.global_best_position if self.archive is None else self.archive.leader(self.rng))
+            particle.update_position()
+
+        log_debug(Source.optimization, 'FitnessList: %s', fitness_list) # Formatted lazily -> free if debug output is disabled
+        if telemetry_enabled():
+            self._log_telemetry(iteration, fitness_list, evaluation_time, evaluations)
+
+    def _repair_particles(self, obstacles: np.ndarray) -> None:
+        """
+        This method pushes the control points of all particles out of the given obstacles. Velocities and bests are kept.
+
+        :param obstacles: The obstacles, shape (obstacles, 3).
+        :return: None
+        """
+        if len(obstacles) == 0:
+            return
+        positions: np.ndarray = np.array([position_to_array(particle.particle_position) for particle in self.particles])
+        clearance: float = max(drone.radius for drone in self.environment.drones)
+        repaired, changed = repair_positions(positions, obstacles, clearance, self.environment.bounds)
+        for particle, position in zip(np.array(self.particles, dtype=object)[changed], repaired[changed]):
+            particle.particle_position = array_to_position(position)
+        log_debug(Source.optimization, 'Repaired %d particles', int(np.count_nonzero(changed)))
+
+    def _reevaluate_bests(self) -> None:
+        """
+        This method evaluates the personal best of every particle again and selects the global best among them.
+        In multi-objective mode the objectives of every personal best are calculated again, so the dominance test never compares against an outdated environment.
+
+        :return: None
+        """
+        for particle in self.particles:
+            if self.archive is None:
+                particle.best_fitness = self.fitness_function(particle.best_position, self.environment)
+            else:
+                particle.best_objectives = np.array(calculate_objectives(particle.best_position, self.environment))
+                particle.best_fitness = weight_objectives(particle.best_objectives)
+        self._select_global_best()
+
+    def _update_bests(self, removed: np.ndarray, added: np.ndarray) -> None:
+        """
+        This method updates the fitness of every personal best by only calculating the collisions with the changed obstacles.
+        The collisions with removed obstacles are subtracted from the known fitness and the collisions with added obstacles are added to it.
+        In multi-objective mode the objectives of every personal best are calculated again instead.
+
+        :param removed: The removed obstacles, shape (obstacles, 3).
+        :param added: The added obstacles, shape (obstacles, 3).
+        :return: None
+        """
+        for particle in self.particles:
+            if not np.isfinite(particle.best_fitness):
+                continue # Never evaluated
+            if self.archive is not None:
+                particle.best_objectives = np.array(calculate_objectives(particle.best_position, self.environment))
+                particle.best_fitness = weight_objectives(particle.best_objectives)
+                continue
+            delta = (calculate_obstacle_collisions(particle.best_position, self.environment, added)
+                     - calculate_obstacle_collisions(particle.best_position, self.environment, removed))
+            particle.best_fitness += settings.FITNESS_WEIGHT_COLLISIONS_OBSTACLES * delta
+        self._select_global_best()
+
+    def _select_global_best(self) -> None:
+        """
+        This method selects the best personal best of all particles as the global best.
+
+        :return: None
+        """
+        best: Particle = min(self.particles, key=lambda p: p.best_fitness)
+        self.global_best_fitness = best.best_fitness
+        self.global_best_position = deepcopy(best.best_position)
+        self.global_best_objectives = None
+
+    def _snapshot_environment(self) -> None:
+        """
+        This method stores the obstacles, start and goal of the environment, so that later changes can be detected when re-planning.
+
+        :return: None
+        """
+        self.planned_obstacles = self.environment.get_obstacle_array()
+        self.planned_endpoints = self._endpoints()
+
+    def _endpoints(self) -> tuple[tuple[int, int], tuple[int, int]]:
+        """
+        This method returns the current start and goal of the environment.
+
+        :return: A tuple of the start and the goal position.
+        """
+        return tuple(self.environment.start.position), tuple(self.environment.goal.position)
+
+    def _adjust_parameters(self, iteration: int) -> None:
+        """
+        This method adapts the parameters of the optimization according to the schedules specified in the config.
+
+        :param iteration: The current iteration.
+        :return: None
+        """
+        if iteration > self.max_iterations * settings.PSO_DECREASE_MAX_VELOCITY_WHEN:
+            log_debug(Source.optimization, 'PSO_DECREASE_MAX_VELOCITY_WHEN -> true')
+            settings.PSO_MAX_VELOCITY_X -= self.step_decrease_max_velocity_x
+            settings.PSO_MAX_VELOCITY_Y -= self.step_decrease_max_velocity_y
+
+        if iteration > self.max_iterations * settings.PSO_DECREASE_INITIAL_VELOCITY_WHEN:
+            log_debug(Source.optimization, 'PSO_DECREASE_INITIAL_VELOCITY_WHEN -> true')
+            settings.PSO_MAX_INITIAL_VELOCITY_X -= self.step_decrease_initial_velocity_x
+            settings.PSO_MAX_INITIAL_VELOCITY_Y -= self.step_decrease_initial_velocity_y
+
+        if iteration > self.max_iterations * settings.PSO_INCREASE_WEIGHT_GLOBAL_WHEN:
+            log_debug(Source.optimization, 'PSO_INCREASE_WEIGHT_GLOBAL_WHEN -> true')
+            settings.PSO_WEIGHT_GLOBAL_BEST -= self.step_increase_weight_global
+
+        if iteration > self.max_iterations * settings.PSO_DECREASE_WEIGHT_PERSONAL_WHEN:
+            log_debug(Source.optimization, 'PSO_DECREASE_WEIGHT_PERSONAL_WHEN -> true')
+            settings.PSO_WEIGHT_PERSONAL_POSITION -= self.step_decrease_weight_personal
+
+    def _evaluate_particles(self, iteration: int) -> list[float]:
+        """
+        This method calculates the fitness of every particle and updates the personal and global bests.
+
+        In multi-objective mode the objectives of every particle are calculated (calculate_objectives) and offered to the archive.
+        The fitness is their weighted sum using the config, and a personal best is only replaced by a position dominating it (or by chance, if neither dominates the other).
+
+        Otherwise, if the surrogate is enabled and knows enough positions, the fitness of every particle is predicted first.
+        Only particles which might improve their personal best (predicted fitness minus PSO_SURROGATE_CONFIDENCE times its uncertainty below the personal best) are rated by the fitness function.
+        The others keep the predicted fitness as their current fitness, which never updates any best.
+
+        If evaluations are traced, the default fitness function is replaced by its objectives and their weighted sum (the same value), so that the objectives are recorded without calculating them twice.
+
+        :param iteration: The current iteration.
+        :return: The fitness values of all particles.
+        """
+        fitness_list: list[float] = []
+        archive_candidates: list[tuple[float, np.ndarray, Particle]] = []
+        tracing: bool = trace_enabled()
+        traced_objectives: np.ndarray | None = np.full((len(self.particles), 4), np.nan) if tracing else None
+
+        vectors: np.ndarray | None = None
+        predicted: np.ndarray | None = None
+        evaluate: np.ndarray = np.ones(len(self.particles), dtype=bool)
+        if self.surrogate is not None and self.archive is None:
+            vectors = np.array([position_to_array(particle.particle_position).ravel() for particle in self.particles])
+            if len(self.surrogate) >= self.num_particles:
+                predicted, uncertainty = self.surrogate.predict(vectors)
+                evaluate = predicted - settings.PSO_SURROGATE_CONFIDENCE * uncertainty < np.array([particle.best_fitness for particle in self.particles])
+
+        for i, particle in enumerate(self.particles):
+            if not evaluate[i]:
+                fitness = float(predicted[i])
+                improved: bool = False
+                self.skipped_evaluations += 1
+            elif self.archive is None:
+                if tracing and self.fitness_function is calculate_fitness:
+                    traced_objectives[i] = calculate_objectives(particle.particle_position, self.environment)
+                    fitness = weight_objectives(tuple(traced_objectives[i]))
+                else:
+                    fitness = self.fitness_function(particle.particle_position, self.environment) # Calculate fitness for current particle
+                improved = fitness < particle.best_fitness
+                self.true_evaluations += 1
+                if vectors is not None:
+                    self.surrogate.add(vectors[i], fitness, float(predicted[i]) if predicted is not None else None)
+            else:
+                objectives = np.array(calculate_objectives(particle.particle_position, self.environment))
+                fitness = weight_objectives(objectives)
+                self.true_evaluations += 1
+                archive_candidates.append((fitness, objectives, particle))
+                if tracing:
+                    traced_objectives[i] = objectives
+                improved = (
+                        particle.best_objectives is None
+                        or dominates(objectives, particle.best_objectives)
+                        or (not dominates(particle.best_objectives, objectives) and particle.rng.uniform(0, 1) < 0.5)
+                )
+                if improved:
+                    particle.best_objectives = objectives
+
+            particle.current_fitness = fitness
+            fitness_list.append(fitness)
+
+            # Update personal best
+            if improved:
+                particle.best_fitness = fitness
+                particle.best_position = deepcopy(particle.particle_position)
+
+            # Update global best
+            if evaluate[i] and fitness < self.global_best_fitness:
+                self.global_best_fitness = fitness
+                self.global_best_position = deepcopy(particle.particle_position)
+                self.global_best_objectives = None # Outdated, recalculated on demand
+
+        if tracing:
+            self._trace_particles(iteration, np.array(fitness_list), evaluate, traced_objectives)
+
+        # Offer the positions in a fixed order, so that the archive does not depend on the order of evaluation
+        for _, objectives, particle in sorted(archive_candidates, key=lambda candidate: (candidate[0], *candidate[1])):
+            self.archive.add(objectives, particle.particle_position)
+        return fitness_list
+
+    def _trace_particles(self, iteration: int, fitness: np.ndarray, evaluated: np.ndarray, objectives: np.ndarray) -> None:
+        """
+        This method records the evaluated positions of all particles, ordered by their stable index instead of the current order of the swarm.
+
+        :param iteration: The current iteration.
+        :param fitness: The fitness of every particle in the current order, shape (particles,).
+        :param evaluated: Whether the fitness of every particle was calculated (instead of predicted), shape (particles,).
+        :param objectives: The objectives of every particle, NaN if not calculated, shape (particles, 4).
+        :return: None
+        """
+        order: np.ndarray = np.argsort([self._particle_indices[id(particle)] for particle in self.particles])
+        particles: list[Particle] = [self.particles[i] for i in order]
+        log_trace(
+            iteration, fitness[order], evaluated[order], objectives[order],
+            np.array([position_to_array(particle.particle_position) for particle in particles]),
+            np.array([position_to_array(particle.particle_velocity) for particle in particles])
+        )
+
+    def _flush(self, iteration: int) -> None:
+        """
+        This method replaces the worst particles (the swarm has to be sorted by fitness) with the global best and a new random velocity.
+        In multi-objective mode the flushed particles also take over the objectives of the global best.
+
+        :param iteration: The current iteration.
+        :return: None
+        """
+        if iteration > self.max_iterations * settings.PSO_FLUSH_WHEN:
+            log_debug(Source.optimization, 'PSO_FLUSH_WHEN -> true')
+            if self.archive is not None and self.global_best_objectives is None:
+                self.global_best_objectives = calculate_objectives(self.global_best_position, self.environment)
+            for i in range((self.num_particles - 1), int(self.num_particles - self.num_particles * settings.PSO_FLUSH_SHARE), -1):
+                self.particles[i].particle_position = deepcopy(self.global_best_position)
+                self.particles[i].best_position = deepcopy(self.global_best_position)
+                self.particles[i].reset_velocity()
+                if self.archive is not None:
+                    self.particles[i].best_objectives = np.array(self.global_best_objectives)
+                    self.particles[i].best_fitness = weight_objectives(self.particles[i].best_objectives)
+
+    def _create_surrogate(self) -> SurrogateModel | None:
+        """
+        This method creates an empty surrogate for the current number of points in a drone's path according to the config.
+
+        :return: The surrogate, None if disabled.
+        """
+        if not settings.PSO_SURROGATE_ENABLED:
+            return None
+        scale = np.array([self.environment.bounds[0], self.environment.bounds[1], settings.DRONE_MAX_SPEED], dtype=float)
+        return SurrogateModel(
+            settings.PSO_SURROGATE_CAPACITY,
+            settings.PSO_SURROGATE_NEIGHBORS,
+            np.tile(scale, len(self.environment.drones) * self.num_control_points)
+        )
+
+    def _refine_control_points(self, num_control_points: int) -> None:
+        """
+        This method inserts points into the drone paths of all particles (see refinement), so that the search continues in a higher resolution.
+        Positions, velocities, personal bests, the global best and the archive are subdivided the same way. The bests are rated again, since inserting points changes their fitness slightly.
+
+        :param num_control_points: Number of points in a drone's path afterwards.
+        :return: None
+        """
+        start, goal = self.environment.start.position, self.environment.goal.position
+        n: int = len(self.particles)
+        positions: np.ndarray = subdivide_positions(np.array(
+            [position_to_array(particle.particle_position) for particle in self.particles]
+            + [position_to_array(particle.best_position) for particle in self.particles]
+            + [position_to_array(self.global_best_position)]
+        ), start, goal, num_control_points)
+        velocities: np.ndarray = subdivide_velocities(np.array([position_to_array(particle.particle_velocity) for particle in self.particles]), num_control_points)
+
+        for particle, position, best_position, velocity in zip(self.particles, positions[:n], positions[n:2 * n], velocities):
+            particle.particle_position = array_to_position(position)
+            particle.best_position = array_to_position(best_position)
+            particle.particle_velocity = array_to_position(velocity)
+            particle.num_control_points = num_control_points
+            if self.archive is None:
+                particle.best_fitness = self.fitness_function(particle.best_position, self.environment)
+            else:
+                particle.best_objectives = np.array(calculate_objectives(particle.best_position, self.environment))
+                particle.best_fitness = weight_objectives(particle.best_objectives)
+
+        if self.archive is not None and len(self.archive) > 0: # Objectives are kept, the shape of the paths does not change
+            self.archive.positions = [array_to_position(position) for position in subdivide_positions(
+                np.array([position_to_array(position) for position in self.archive.positions]), start, goal, num_control_points
+            )]
+
+        previous: float = self.global_best_fitness
+        self.global_best_position = array_to_position(positions[-1])
+        self.global_best_fitness = self.fitness_function(self.global_best_position, self.environment) if np.isfinite(previous) else previous
+        self.global_best_objectives = None
+        best: Particle = min(self.particles, key=lambda p: p.best_fitness)
+        if best.best_fitness < self.global_best_fitness:
+            self._select_global_best()
+
+        log_info(Source.optimization, 'Refined drone paths from %d to %d points, global best fitness: %.4f -> %.4f',
+                 self.num_control_points, num_control_points, previous, self.global_best_fitness)
+        self.num_control_points = num_control_points
+        self.surrogate = self._create_surrogate() # Positions of a different dimension
+
+    def _refine_global_best(self) -> None:
+        """
+        This method refines the global best with a gradient-based local search (see local_search).
+        If the refined position has a better fitness, it becomes the new global best and replaces the worst particle (the swarm has to be sorted by fitness).
+
+        :return: None
+        """
+        refined, evaluations = refine_position(self.global_best_position, self.environment)
+        self.local_search_evaluations += evaluations
+        fitness: float = self.fitness_function(refined, self.environment)
+        log_debug(Source.optimization, 'Local search: %.4f -> %.4f (%d smooth evaluations)', self.global_best_fitness, fitness, evaluations)
+        if fitness >= self.global_best_fitness:
+            return # The smooth fitness is only an approximation, never accept a worse position
+
+        self.global_best_fitness = fitness
+        self.global_best_position = refined
+        self.global_best_objectives = None
+
+        worst: Particle = self.particles[-1]
+        worst.particle_position = copy_position(refined)
+        worst.best_position = copy_position(refined)
+        worst.best_fitness = fitness
+        worst.current_fitness = fitness
+        if self.archive is not None:
+            worst.best_objectives = np.array(calculate_objectives(refined, self.environment))
+            self.archive.add(worst.best_objectives, refined)
+
+    def _log_telemetry(self, iteration: int, fitness_list: list[float], evaluation_time: float, evaluations: int) -> None:
+        """
+        This method collects the metrics of an iteration and hands them to the telemetry stream.
+
+        :param iteration: The current iteration.
+        :param fitness_list: The fitness values of all particles in this iteration.
+        :param evaluation_time: Time in seconds spent on evaluating the fitness of all particles.
+        :param evaluations: Number of particles rated by the fitness function (instead of the surrogate) in this iteration.
+        :return: None
+        """
+        if self.global_best_objectives is None:
+            self.global_best_objectives = calculate_objectives(self.global_best_position, self.environment)
+
+        fitness: np.ndarray = np.array(fitness_list)
+        positions: np.ndarray = np.array([position_to_array(particle.particle_position).ravel() for particle in self.particles])
+        diversity: float = float(np.mean(np.linalg.norm(positions - positions.mean(axis=0), axis=1))) # Mean distance to the center of the swarm
+
+        log_telemetry({
+            'iteration': iteration + 1,
+            'global_best_fitness': float(self.global_best_fitness),
+            'best_fitness': float(fitness.min()),
+            'mean_fitness': float(fitness.mean()),
+            'std_fitness': float(fitness.std()),
+            'diversity': diversity,
+            'collisions_obstacles': float(self.global_best_objectives[2]),
+            'collisions_drones': float(self.global_best_objectives[3]),
+            'evaluations_per_second': evaluations / evaluation_time if evaluation_time > 0 else float('inf'),
+            'max_velocity_x': settings.PSO_MAX_VELOCITY_X,
+            'max_velocity_y': settings.PSO_MAX_VELOCITY_Y,
+            'max_initial_velocity_x': settings.PSO_MAX_INITIAL_VELOCITY_X,
+            'max_initial_velocity_y': settings.PSO_MAX_INITIAL_VELOCITY_Y,
+            'weight_personal_position': settings.PSO_WEIGHT_PERSONAL_POSITION,
+            'weight_global_best': settings.PSO_WEIGHT_GLOBAL_BEST,
+            'archive_size': len(self.archive) if self.archive is not None else 0,
+            'local_search_evaluations': self.local_search_evaluations,
+            'true_evaluations': self.true_evaluations,
+            'skipped_evaluations': self.skipped_evaluations,
+            'surrogate_error': self.surrogate.mean_error() if self.surrogate is not None else float('nan'),
+        })
+
+def seed_path(environment: Environment) -> list[tuple[float, float]] | None:
+    """
+    Selects the collision free path initial positions are seeded with according to the config.
+
+    :param environment: The environment to optimize the drone paths for.
+    :return: The path, None if no path is available.
+    """
+    if settings.PSO_INITIAL_PATH_SHARE <= 0:
+        return None # Nothing to seed, never build a roadmap for it
+    if settings.PSO_INITIAL_PATH_SOURCE == 'roadmap':
+        if environment.start is None or environment.goal is None:
+            return None
+        return environment.query_roadmap()
+    if settings.PSO_INITIAL_PATH_SOURCE == 'validation':
+        return environment.validation_path
+    raise ValueError(f"Unknown path source '{settings.PSO_INITIAL_PATH_SOURCE}', expected 'validation' or 'roadmap'")
+
+def _get_parameters() -> dict[str, float]:
+    """
+    Returns the current values of all settings adapted by the schedule.
+
+    :return: Mapping of setting names to their values.
+    """
+    return {name: getattr(settings, name) for name in _SCHEDULED_PARAMETERS}
+
+def _set_parameters(parameters: dict[str, float]) -> None:
+    """
+    Sets the values of settings adapted by the schedule.
+
+    :param parameters: Mapping of setting names to their values.
+    :return: None
+    """
+    for name, value in parameters.items():
+        setattr(settings, name, value)
@@ -0,0 +1,124 @@
+from typing import Callable
+
+import numpy as np
+
+from DroneSwarmPathOpti.simulation import Environment
+
+from .particle import DronePath
+from .pso import PSO
+from ..config import get_settings
+from ..project_logger import log_info, Source
+
+settings = get_settings()
+
+
+class RecedingHorizonPlanner:
+    """
+    This class optimizes long paths window by window instead of as one problem (receding horizon).
+
+    A guide path from start to goal (the shortest path through the environment's roadmap, or the straight line if there is none) is followed window by window:
+        - A window spans a fixed length of the guide path starting at the current frontier
+        - The paths of all drones are optimized inside the window using a PSO which only knows the obstacles near the window
+        - The first control points of every drone are committed and the frontier moves to the end of the committed part
+    Since every window has the same number of control points and only a local set of obstacles, the cost of a window does not depend on the size of the map.
+    """
+
+    fitness_function: Callable[[list[DronePath], Environment], float]
+    environment: Environment
+    window_length: float # Length of the guide path covered by a window
+    commit: int # Number of control points per drone committed after every window
+    iterations: int # Number of iterations of the optimization of a window
+
+    guide: np.ndarray # Guide path from start to goal, shape (points, 2)
+    guide_length: np.ndarray # Arc length of the guide path at every point, shape (points,)
+
+    def __init__(self,
+                 fitness_function: Callable[[list[DronePath], Environment], float],
+                 environment: Environment,
+                 window_length: float | None = None,
+                 commit: int | None = None,
+                 iterations: int | None = None):
+        """
+        :param fitness_function: Function rating the position of a particle in an environment (lower is better).
+        :param environment: The environment to optimize the drone paths for.
+        :param window_length: Length of the guide path covered by a window. Defaults to the config.
+        :param commit: Number of control points per drone committed after every window. Defaults to the config.
+        :param iterations: Number of iterations of the optimization of a window. Defaults to the config.
+        """
+        self.fitness_function = fitness_function
+        self.environment = environment
+        self.window_length = window_length if window_length is not None else settings.PSO_HORIZON_WINDOW_LENGTH
+        self.commit = commit if commit is not None else settings.PSO_HORIZON_COMMIT
+        self.iterations = iterations if iterations is not None else settings.PSO_HORIZON_ITERATIONS
+        if self.window_length <= 0:
+            raise ValueError(f'Window length must be positive, got {self.window_length}')
+        if not 0 < self.commit <= settings.INITIAL_CONTROL_POINTS:
+            raise ValueError(f'Committed control points must be between 1 and INITIAL_CONTROL_POINTS, got {self.commit}')
+
+        guide: list[tuple[float, float]] = environment.query_roadmap() or [environment.start.position, environment.goal.position]
+        self.guide = np.array(guide, dtype=float)
+        self.guide_length = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(self.guide, axis=0).T))])
+
+    def plan(self) -> tuple[list[DronePath], float]:
+        """
+        This method optimizes the paths of all drones window by window.
+
+        :return: A tuple containing the committed paths of all drones from start to goal and their fitness in the whole environment.
+        """
+        committed: list[list[tuple[float, float, float]]] = [[] for _ in self.environment.drones]
+        frontier: np.ndarray = np.array(self.environment.start.position, dtype=float)
+        frontier_length: float = 0.0
+        total_length: float = float(self.guide_length[-1])
+        window_radius: float = self.window_length / 2 + settings.PSO_INITIAL_POSITION_BOUNDS # Particles are sampled around the window's anchor points
+
+        window_index: int = 0
+        while True:
+            window_index += 1
+            final: bool = frontier_length + self.window_length >= total_length
+            window_goal = np.array(self.environment.goal.position, dtype=float) if final else self._guide_point(frontier_length + self.window_length)
+
+            window: Environment = self.environment.window(frontier, window_goal, window_radius)
+            position, fitness = PSO(self.fitness_function, window, self.iterations, key=(window_index,)).optimize()
+            log_info(Source.optimization, '[Window %d] %.1f/%.1f of the guide path, %d obstacles, fitness: %.4f',
+                     window_index, frontier_length, total_length, len(window.obstacles), fitness)
+
+            taken: int = len(position[0].control_points) if final else self.commit
+            for drone, path in enumerate(position):
+                committed[drone] += path.control_points[:taken]
+            if final:
+                break
+
+            end = np.mean([path.control_points[taken - 1][:2] for path in position], axis=0)
+            minimum_progress: float = self.window_length * taken / (len(position[0].control_points) + 1) / 2
+            frontier_length = max(self._project(end), frontier_length + minimum_progress) # Always move forward, even if the drones were pushed back
+            frontier = self._guide_point(frontier_length)
+
+        solution: list[DronePath] = [DronePath(control_points) for control_points in committed]
+        return solution, self.fitness_function(solution, self.environment)
+
+    def _guide_point(self, length: float) -> np.ndarray:
+        """
+        This method returns the point of the guide path at a given arc length.
+
+        :param length: Arc length from the start.
+        :return: The point, shape (2,).
+        """
+        return np.array([
+            np.interp(length, self.guide_length, self.guide[:, 0]),
+            np.interp(length, self.guide_length, self.guide[:, 1])
+        ])
+
+    def _project(self, point: np.ndarray) -> float:
+        """
+        This method projects a point onto the guide path.
+
+        :param point: The point, shape (2,).
+        :return: Arc length of the closest point of the guide path.
+        """
+        a, b = self.guide[:-1], self.guide[1:]
+        direction = b - a
+        segment_length = np.hypot(direction[:, 0], direction[:, 1])
+        t = np.clip(np.sum((point - a) * direction, axis=1) / np.maximum(segment_length ** 2, 1e-12), 0.0, 1.0)
+        distance = np.hypot(*(a + t[:, None] * direction - point).T)
+        closest = int(np.argmin(distance))
+        return float(self.guide_length[closest] + t[closest] * segment_length[closest])
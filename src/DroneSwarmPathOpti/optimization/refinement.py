@@ -0,0 +1,156 @@
+"""
+Progressive refinement of the control points of particles (coarse-to-fine optimization).
+
+An optimization may start with few control points per drone path and insert more of them later on. New control points
+are placed on the existing splines (at the middle of the time between two neighbouring points), so that the shape of
+every path is preserved and only its resolution grows. The same indices are inserted for every particle and drone, so
+that a control point keeps its meaning across the swarm and the velocity update stays consistent.
+"""
+
+import numpy as np
+
+from .local_search import batch_spline_knots, batch_spline_coefficients, batch_spline_evaluate
+from ..config import get_settings
+
+settings = get_settings()
+
+
+def refinement_schedule(max_iterations: int, start: int, target: int, steps: int, when: float) -> dict[int, int]:
+    """
+    Calculates at which iterations the control points are refined and how many of them the paths have afterwards.
+
+    :param max_iterations: Number of iterations of the optimization.
+    :param start: Number of control points per drone path at the start.
+    :param target: Number of control points per drone path after the last refinement.
+    :param steps: Number of refinements, evenly spread until the last one.
+    :param when: After how many iterations the last refinement takes place (depending on the max number of iterations).
+    :return: Mapping of iterations to the number of control points per drone path from this iteration on.
+    """
+    if not 0 < start <= target:
+        raise ValueError(f'Control points at the start must be between 1 and {target}, got {start}')
+    if start == target or steps <= 0:
+        return {}
+
+    counts: np.ndarray = np.round(np.linspace(start, target, steps + 1)[1:]).astype(int)
+    iterations: np.ndarray = np.round(max_iterations * when * np.arange(1, steps + 1) / steps).astype(int)
+    schedule: dict[int, int] = {}
+    for iteration, count in zip(iterations, counts):
+        schedule[max(1, int(iteration))] = int(count) # Never before the first evaluation, later steps overwrite earlier ones
+    return schedule
+
+def subdivide_positions(positions: np.ndarray, start: tuple[float, float], goal: tuple[float, float], num_control_points: int) -> np.ndarray:
+    """
+    Inserts control points into positions by sampling their splines (x and y) and fitting the drone velocities, so that the timing of the paths is kept.
+    Existing control points are kept unchanged.
+
+    :param positions: The positions, shape (positions, drones, control points, 3).
+    :param start: Start of the environment (first point of every spline).
+    :param goal: Goal of the environment (last point of every spline).
+    :param num_control_points: Number of control points per drone path afterwards.
+    :return: The subdivided positions, shape (positions, drones, num_control_points, 3).
+    """
+    count, drones, current, _ = positions.shape
+    indices, original = _subdivision_indices(current, num_control_points)
+    if len(positions) == 0 or current == num_control_points:
+        return positions.copy()
+
+    points = np.concatenate([
+        np.broadcast_to(np.array([*start, 1.0]), (count, drones, 1, 3)),
+        positions,
+        np.broadcast_to(np.array([*goal, 1.0]), (count, drones, 1, 3))
+    ], axis=2).reshape(count * drones, -1, 3) # One spline per drone, start and goal like CubicBSpline
+    t = batch_spline_knots(points)
+    times = _interpolate(t, indices)
+
+    subdivided = np.empty((count * drones, num_control_points, 3))
+    subdivided[..., 0] = batch_spline_evaluate(t, batch_spline_coefficients(t, points[..., 0]), times)
+    subdivided[..., 1] = batch_spline_evaluate(t, batch_spline_coefficients(t, points[..., 1]), times)
+    subdivided[:, original] = points[:, 1:-1] # Exactly the old control points (instead of their evaluation)
+    subdivided[..., 2] = _timed_velocities(points, subdivided, indices, t)
+    return subdivided.reshape(count, drones, num_control_points, 3)
+
+def subdivide_velocities(velocities: np.ndarray, num_control_points: int) -> np.ndarray:
+    """
+    Inserts the velocities of new control points (see subdivide_positions) by interpolating the velocities of their neighbours.
+    Start and goal never move, so their velocity is zero.
+
+    :param velocities: The particle velocities, shape (particles, drones, control points, 3).
+    :param num_control_points: Number of control points per drone path afterwards.
+    :return: The subdivided velocities, shape (particles, drones, num_control_points, 3).
+    """
+    count, drones, current, _ = velocities.shape
+    indices, original = _subdivision_indices(current, num_control_points)
+    padded = np.pad(velocities, ((0, 0), (0, 0), (1, 1), (0, 0))).reshape(count * drones, current + 2, 3)
+
+    subdivided = np.stack([_interpolate(padded[..., axis], indices) for axis in range(3)], axis=2)
+    subdivided[:, original] = padded[:, 1:-1]
+    return subdivided.reshape(count, drones, num_control_points, 3)
+
+def _timed_velocities(points: np.ndarray, subdivided: np.ndarray, indices: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """
+    Calculates the drone velocities of subdivided paths, so that every gap between two old points keeps its duration.
+
+    The time between two points is their distance divided by their average velocity. Since the new points lie on the curve, the distances
+    inside a gap add up to more than the distance of the gap itself, and interpolated velocities would make the drones slower on every curve.
+    Instead, the velocities of the new points of a gap are fitted (least squares) to pass every part of the gap in the same time as the spline before.
+
+    :param points: The points before, including start and goal, shape (splines, current + 2, 3).
+    :param subdivided: The control points afterwards (x and y are used, old velocities are kept), shape (splines, target, 3).
+    :param indices: Fractional indices of the control points afterwards, shape (target,).
+    :param t: Knots of the splines before, shape (splines, current + 2).
+    :return: The drone velocities of all control points afterwards, shape (splines, target).
+    """
+    velocities = _interpolate(points[..., 2], indices)
+    full = np.concatenate([points[:, :1], subdivided, points[:, -1:]], axis=1)
+    full_indices = np.concatenate([[0.0], indices, [points.shape[1] - 1.0]])
+    times = _interpolate(t, full_indices)
+    chords = np.hypot(*np.diff(full[..., :2], axis=1).transpose(2, 0, 1))
+    required = 2 * chords / np.maximum(np.diff(times, axis=1), 1e-12) # Sum of the velocities of both ends of every part
+
+    boundaries = np.flatnonzero(full_indices == np.round(full_indices)) # Old points (including start and goal) in the full path
+    for left, right in zip(boundaries[:-1], boundaries[1:]):
+        n = right - left - 1 # New points in this gap
+        if n == 0:
+            continue
+        a = np.zeros((n + 1, n)) # Part j connects the points left + j and left + j + 1
+        a[np.arange(n), np.arange(n)] = 1
+        a[np.arange(1, n + 1), np.arange(n)] = 1
+        b = required[:, left:right].copy()
+        b[:, 0] -= full[:, left, 2]
+        b[:, -1] -= full[:, right, 2]
+        velocities[:, left:right - 1] = np.linalg.lstsq(a, b.T, rcond=None)[0].T
+    return np.clip(velocities, 0.1, settings.DRONE_MAX_SPEED) # Same bounds as a particle's position
+
+def _subdivision_indices(current: int, target: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates where the control points lie after a subdivision, as fractional indices of the points before it (0 is the start, current + 1 the goal).
+    The new control points are distributed evenly over all gaps between two points and split their gap evenly.
+
+    :param current: Number of control points per drone path before.
+    :param target: Number of control points per drone path afterwards.
+    :return: A tuple of the fractional indices, shape (target,), and a mask of the old control points among them.
+    """
+    if target < current:
+        raise ValueError(f'Control points can only be inserted, got {target} < {current}')
+    inserted: np.ndarray = np.diff(np.round(np.linspace(0, target - current, current + 2)).astype(int)) # New points per gap
+    indices: list[float] = []
+    original: list[bool] = []
+    for gap, n in enumerate(inserted):
+        if gap > 0:
+            indices.append(float(gap))
+            original.append(True)
+        indices += [gap + (i + 1) / (n + 1) for i in range(n)]
+        original += [False] * n
+    return np.array(indices), np.array(original)
+
+def _interpolate(values: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Interpolates every row of values linearly at fractional indices.
+
+    :param values: The values, shape (rows, points).
+    :param indices: Fractional indices between 0 and points - 1, shape (samples,).
+    :return: The interpolated values, shape (rows, samples).
+    """
+    lower = np.minimum(np.floor(indices).astype(int), values.shape[1] - 2)
+    fraction = indices - lower
+    return values[:, lower] * (1 - fraction) + values[:, lower + 1] * fraction
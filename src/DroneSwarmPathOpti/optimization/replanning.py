@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def diff_obstacles(previous: np.ndarray, current: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compares two sets of obstacles. A moved or resized obstacle is reported as removed and added.
+
+    :param previous: The obstacles before the change, shape (obstacles, 3) with the columns x, y and radius.
+    :param current: The obstacles after the change, shape (obstacles, 3).
+    :return: A tuple of the removed and the added obstacles, each of shape (obstacles, 3).
+    """
+    previous = np.asarray(previous, dtype=float).reshape(-1, 3)
+    current = np.asarray(current, dtype=float).reshape(-1, 3)
+    equal = np.all(previous[:, None, :] == current[None, :, :], axis=2) # (previous, current)
+
+    # Match identical obstacles pairwise, so that duplicates are counted correctly
+    matched_previous = np.zeros(len(previous), dtype=bool)
+    matched_current = np.zeros(len(current), dtype=bool)
+    for i, j in zip(*np.nonzero(equal)):
+        if not (matched_previous[i] or matched_current[j]):
+            matched_previous[i] = matched_current[j] = True
+    return previous[~matched_previous], current[~matched_current]
+
+def repair_positions(
+        positions: np.ndarray,
+        obstacles: np.ndarray,
+        clearance: float,
+        bounds: tuple[int, int],
+        margin: float = 1e-3
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pushes every control point lying inside an obstacle radially onto the obstacle's boundary (inflated by the clearance).
+    Obstacles are processed one after another, so a point may still end up inside of an obstacle overlapping with a later one.
+
+    :param positions: Positions of the particles, shape (particles, drones, control points, 3).
+    :param obstacles: The obstacles to repair against, shape (obstacles, 3) with the columns x, y and radius.
+    :param clearance: Distance every control point must keep to an obstacle (e.g. the radius of a drone).
+    :param bounds: Size of the environment. Repaired points are clipped to it.
+    :param margin: Relative distance the points are pushed beyond the boundary.
+    :return: A tuple of the repaired positions and a boolean array of shape (particles,) which is True for every changed particle.
+    """
+    repaired = np.array(positions, dtype=float, copy=True)
+    changed = np.zeros(len(repaired), dtype=bool)
+    points = repaired[..., :2] # View, modified in place
+    for x, y, radius in np.asarray(obstacles, dtype=float).reshape(-1, 3):
+        limit = (radius + clearance) * (1 + margin)
+        offset = points - (x, y)
+        distance = np.hypot(offset[..., 0], offset[..., 1])
+        inside = distance < limit
+        if not inside.any():
+            continue
+        direction = offset[inside] / np.maximum(distance[inside], 1e-12)[:, None]
+        direction[distance[inside] < 1e-12] = (1.0, 0.0) # Points exactly at the center are pushed in an arbitrary direction
+        points[inside] = np.clip((x, y) + direction * limit, 0, bounds)
+        changed |= inside.reshape(len(repaired), -1).any(axis=1)
+    return repaired, changed
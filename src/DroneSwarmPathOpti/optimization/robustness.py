@@ -0,0 +1,263 @@
+"""
+Monte-Carlo evaluation of solutions in perturbed environments.
+
+The exact environment is only an estimate: obstacles may be slightly off and drones may start late or early. A solution
+is therefore rated against many scenarios at once, each with jittered obstacle centres and radii and a time offset per
+drone. The splines of all drones are sampled once at a fixed rate and shared by all scenarios:
+- Obstacles don't move, so every scenario compares the same samples to its own obstacles
+- A time offset only shifts a drone's samples along the time grid (offsets are rounded to whole samples)
+All scenarios are compared in a few large array operations (chunks of scenarios bound the memory), never by calling the
+fitness function once per scenario.
+"""
+
+import numpy as np
+
+from DroneSwarmPathOpti.simulation import CubicBSpline, Environment
+
+from .fitness import build_splines, weight_objectives
+from .particle import DronePath
+from ..config import get_settings, random_stream, STREAM_ROBUSTNESS
+
+settings = get_settings()
+
+_CHUNK_ELEMENTS: int = 1 << 22 # Number of distances calculated at once
+
+
+class RobustnessReport:
+    """
+    This class holds the results of a solution in all perturbed scenarios.
+    A clearance is the smallest distance between the surfaces of two objects (negative while they overlap), durations are the time spent colliding summed over all collisions.
+    """
+
+    obstacle_clearances: np.ndarray # Smallest clearance between any drone and any obstacle in every scenario, shape (scenarios,)
+    drone_clearances: np.ndarray # Smallest clearance between any two drones in every scenario, shape (scenarios,)
+    obstacle_durations: np.ndarray # Time drones spend inside of obstacles in every scenario, shape (scenarios,)
+    drone_durations: np.ndarray # Time drones spend overlapping with each other in every scenario, shape (scenarios,)
+
+    def __init__(self, obstacle_clearances: np.ndarray, drone_clearances: np.ndarray, obstacle_durations: np.ndarray, drone_durations: np.ndarray):
+        self.obstacle_clearances = obstacle_clearances
+        self.drone_clearances = drone_clearances
+        self.obstacle_durations = obstacle_durations
+        self.drone_durations = drone_durations
+
+    @property
+    def clearances(self) -> np.ndarray:
+        """
+        The smallest clearance to any obstacle or drone in every scenario, shape (scenarios,).
+        """
+        return np.minimum(self.obstacle_clearances, self.drone_clearances)
+
+    @property
+    def collision_probability(self) -> float:
+        """
+        The share of scenarios with at least one collision.
+        """
+        return float(np.mean(self.clearances < 0)) if len(self.clearances) > 0 else 0.0
+
+    def summary(self, quantiles: tuple[float, ...] = (0.05, 0.5, 0.95)) -> dict[str, float]:
+        """
+        This method summarizes the report.
+
+        :param quantiles: Quantiles of the clearance distribution to include.
+        :return: Mapping of the collision probabilities, the mean collision durations and the clearance quantiles.
+        """
+        summary: dict[str, float] = {
+            'collision_probability': self.collision_probability,
+            'obstacle_collision_probability': float(np.mean(self.obstacle_clearances < 0)),
+            'drone_collision_probability': float(np.mean(self.drone_clearances < 0)),
+            'mean_obstacle_duration': float(np.mean(self.obstacle_durations)),
+            'mean_drone_duration': float(np.mean(self.drone_durations)),
+        }
+        for q in quantiles:
+            summary[f'clearance_q{round(q * 100):02d}'] = float(np.quantile(self.clearances, q))
+        return summary
+
+
+class RobustnessEvaluator:
+    """
+    This class rates solutions against perturbed versions of their environment (see module documentation).
+
+    The perturbations are drawn once per number of obstacles and drones and reused for every solution, so that all solutions
+    (e.g. all particles of a swarm) are compared under the same scenarios. An instance can be used as the fitness function of
+    an optimization (robust fitness mode): collisions are then rated by their mean duration over all scenarios.
+    """
+
+    samples: int # Number of perturbed scenarios
+    obstacle_jitter: float # Standard deviation of the obstacle centres
+    radius_jitter: float # Standard deviation of the obstacle radii
+    time_jitter: float # Standard deviation of the time offset of every drone
+    rate: float # Samples per time unit of the shared trajectories
+    rng: np.random.Generator
+
+    def __init__(self,
+                 samples: int,
+                 obstacle_jitter: float | None = None,
+                 radius_jitter: float | None = None,
+                 time_jitter: float | None = None,
+                 rate: float | None = None,
+                 rng: np.random.Generator | None = None):
+        """
+        :param samples: Number of perturbed scenarios.
+        :param obstacle_jitter: Standard deviation of the obstacle centres. Defaults to ROBUSTNESS_OBSTACLE_JITTER of the config.
+        :param radius_jitter: Standard deviation of the obstacle radii. Defaults to ROBUSTNESS_RADIUS_JITTER of the config.
+        :param time_jitter: Standard deviation of the time offset of every drone. Defaults to ROBUSTNESS_TIME_JITTER of the config.
+        :param rate: Samples per time unit of the shared trajectories. Defaults to ROBUSTNESS_RATE of the config.
+        :param rng: Random stream of the perturbations. Defaults to a stream derived from SEED_ENVIRONMENT.
+        """
+        self.samples = samples
+        self.obstacle_jitter = obstacle_jitter if obstacle_jitter is not None else settings.ROBUSTNESS_OBSTACLE_JITTER
+        self.radius_jitter = radius_jitter if radius_jitter is not None else settings.ROBUSTNESS_RADIUS_JITTER
+        self.time_jitter = time_jitter if time_jitter is not None else settings.ROBUSTNESS_TIME_JITTER
+        self.rate = rate if rate is not None else settings.ROBUSTNESS_RATE
+        if self.samples <= 0 or self.rate <= 0:
+            raise ValueError(f'Number of scenarios and sampling rate must be positive, got {self.samples} and {self.rate}')
+        self.rng = rng if rng is not None else random_stream(settings.SEED_ENVIRONMENT, STREAM_ROBUSTNESS)
+        self._obstacle_offsets: dict[int, np.ndarray] = {} # Number of obstacles -> offsets of x, y and radius, shape (samples, obstacles, 3)
+        self._time_offsets: dict[int, np.ndarray] = {} # Number of drones -> offsets in whole samples, shape (samples, drones)
+
+    def __call__(self, particle_position: list[DronePath], environment: Environment) -> float:
+        """
+        This method rates a solution by its time and energy usage and its mean collision durations over all scenarios, weighted like calculate_fitness.
+
+        :param particle_position: A particle which represents a full approach to a solution to the given environment.
+        :param environment: The environment in which the particles exist.
+        :return: The robust fitness value.
+        """
+        splines: list[CubicBSpline] = build_splines(particle_position, environment)
+        report: RobustnessReport = self.evaluate_splines(splines, environment)
+        return weight_objectives((
+            sum(spline.calculate_time_usage() for spline in splines),
+            sum(spline.calculate_energy_usage() for spline in splines),
+            float(np.mean(report.obstacle_durations)),
+            float(np.mean(report.drone_durations))
+        ))
+
+    def evaluate(self, particle_position: list[DronePath], environment: Environment) -> RobustnessReport:
+        """
+        This method rates a solution in all perturbed scenarios.
+
+        :param particle_position: A particle which represents a full approach to a solution to the given environment.
+        :param environment: The environment in which the particles exist.
+        :return: The report of all scenarios.
+        """
+        return self.evaluate_splines(build_splines(particle_position, environment), environment)
+
+    def evaluate_splines(self, splines: list[CubicBSpline], environment: Environment) -> RobustnessReport:
+        """
+        This method rates the splines of all drones in all perturbed scenarios.
+
+        :param splines: The spline of every drone.
+        :param environment: The environment the perturbations are applied to.
+        :return: The report of all scenarios.
+        """
+        radii: np.ndarray = np.array([drone.radius for drone in environment.drones], dtype=float)
+        positions, active, flying = self._sample(splines)
+        obstacle_clearances, obstacle_durations = self._obstacle_collisions(positions[flying], np.repeat(radii, np.count_nonzero(flying, axis=1)), environment.get_obstacle_array())
+        drone_clearances, drone_durations = self._drone_collisions(positions, active, radii)
+        return RobustnessReport(obstacle_clearances, drone_clearances, obstacle_durations, drone_durations)
+
+    def _sample(self, splines: list[CubicBSpline]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        This method samples all splines on a shared time grid. Drones which already arrived stay at the goal.
+
+        :param splines: The spline of every drone.
+        :return: A tuple of three arrays: the positions, shape (drones, samples, 2), whether every drone is between its first and last control point at every sample,
+                 shape (drones, samples), and whether every drone has not arrived yet at every sample, shape (drones, samples).
+        """
+        count: int = int(np.floor(max(float(spline.t[-1]) for spline in splines) * self.rate)) + 1
+        t = np.arange(count) / self.rate
+        positions = np.empty((len(splines), count, 2))
+        active = np.empty((len(splines), count), dtype=bool)
+        flying = np.empty((len(splines), count), dtype=bool)
+        for i, spline in enumerate(splines):
+            clamped = np.minimum(t, float(spline.t[-1]))
+            positions[i, :, 0] = spline.x(clamped)
+            positions[i, :, 1] = spline.y(clamped)
+            active[i] = (t >= spline.t[1]) & (t <= spline.t[-2])
+            flying[i] = t <= spline.t[-1]
+        return positions, active, flying
+
+    def _obstacle_collisions(self, positions: np.ndarray, radii: np.ndarray, obstacles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method compares the samples of all drones to the perturbed obstacles of every scenario.
+        Like the fitness, only samples before a drone arrived are compared, a drone waiting at the goal never collides.
+
+        :param positions: The sampled positions of all drones before they arrived, shape (points, 2).
+        :param radii: The radius of the drone of every sample, shape (points,).
+        :param obstacles: The exact obstacles, shape (obstacles, 3).
+        :return: A tuple of the smallest clearance and the collision duration of every scenario, each of shape (scenarios,).
+        """
+        if len(obstacles) == 0 or len(positions) == 0:
+            return np.full(self.samples, np.inf), np.zeros(self.samples)
+        perturbed = obstacles[None] + self._perturb_obstacles(len(obstacles)) # (scenarios, obstacles, 3)
+        perturbed[..., 2] = np.maximum(perturbed[..., 2], 0.0)
+
+        clearances = np.empty(self.samples)
+        durations = np.empty(self.samples)
+        chunk: int = max(1, _CHUNK_ELEMENTS // (len(positions) * len(obstacles)))
+        for begin in range(0, self.samples, chunk):
+            centres = perturbed[begin:begin + chunk, None, :, :2] # (chunk, 1, obstacles, 2)
+            reach = radii[None, :, None] + perturbed[begin:begin + chunk, None, :, 2] # (chunk, points, obstacles)
+            distance = np.hypot(positions[None, :, None, 0] - centres[..., 0], positions[None, :, None, 1] - centres[..., 1])
+            clearance = distance - reach
+            clearances[begin:begin + chunk] = clearance.min(axis=(1, 2))
+            durations[begin:begin + chunk] = np.count_nonzero(clearance < 0, axis=(1, 2)) / self.rate
+        return clearances, durations
+
+    def _drone_collisions(self, positions: np.ndarray, active: np.ndarray, radii: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method compares all pairs of drones in every scenario after shifting their samples by the time offsets of the scenario.
+        Like Environment.get_collisions_drones, two drones are only compared while both are between their first and last control point.
+
+        :param positions: The sampled positions, shape (drones, samples, 2).
+        :param active: Whether every drone is between its first and last control point at every sample, shape (drones, samples).
+        :param radii: The radius of every drone, shape (drones,).
+        :return: A tuple of the smallest clearance and the collision duration of every scenario, each of shape (scenarios,).
+        """
+        drones, count, _ = positions.shape
+        if drones < 2:
+            return np.full(self.samples, np.inf), np.zeros(self.samples)
+        offsets: np.ndarray = self._perturb_times(drones)
+        margin: int = int(np.max(np.abs(offsets)))
+        grid = np.arange(count + 2 * margin) - margin # Shared time grid covering all shifted samples
+        a, b = np.triu_indices(drones, k=1)
+        reach = (radii[a] + radii[b])[None, :, None]
+
+        clearances = np.empty(self.samples)
+        durations = np.empty(self.samples)
+        chunk: int = max(1, _CHUNK_ELEMENTS // (len(a) * len(grid)))
+        for begin in range(0, self.samples, chunk):
+            own = grid[None, None, :] - offsets[begin:begin + chunk, :, None] # Index into the own samples of every drone, (chunk, drones, grid)
+            inside = (own >= 0) & (own < count)
+            own = np.clip(own, 0, count - 1)
+            shifted = positions[np.arange(drones)[None, :, None], own] # (chunk, drones, grid, 2)
+            compared = (inside & active[np.arange(drones)[None, :, None], own]) # (chunk, drones, grid)
+
+            x, y = shifted[..., 0], shifted[..., 1]
+            distance = np.hypot(x[:, a] - x[:, b], y[:, a] - y[:, b]) # (chunk, pairs, grid)
+            clearance = np.where(compared[:, a] & compared[:, b], distance - reach, np.inf)
+            clearances[begin:begin + chunk] = clearance.min(axis=(1, 2))
+            durations[begin:begin + chunk] = np.count_nonzero(clearance < 0, axis=(1, 2)) / self.rate
+        return clearances, durations
+
+    def _perturb_obstacles(self, count: int) -> np.ndarray:
+        """
+        This method returns the perturbations of a number of obstacles, drawing them on first use.
+
+        :param count: Number of obstacles.
+        :return: Offsets of x, y and radius, shape (scenarios, obstacles, 3).
+        """
+        if count not in self._obstacle_offsets:
+            self._obstacle_offsets[count] = self.rng.normal(0.0, 1.0, (self.samples, count, 3)) * np.array([self.obstacle_jitter, self.obstacle_jitter, self.radius_jitter])
+        return self._obstacle_offsets[count]
+
+    def _perturb_times(self, count: int) -> np.ndarray:
+        """
+        This method returns the time offsets of a number of drones, drawing them on first use.
+
+        :param count: Number of drones.
+        :return: Offsets in whole samples, shape (scenarios, drones).
+        """
+        if count not in self._time_offsets:
+            self._time_offsets[count] = np.round(self.rng.normal(0.0, self.time_jitter, (self.samples, count)) * self.rate).astype(int)
+        return self._time_offsets[count]
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class SurrogateModel:
+    """
+    This class predicts the fitness of positions from positions evaluated before (k-nearest-neighbour regression).
+
+    The model is trained online: every truly evaluated position is added together with its fitness, and only the most recent positions are kept.
+    A prediction is the inverse-distance weighted mean of the fitness of the nearest neighbours, its uncertainty is their weighted standard deviation.
+    Positions are compared in a normalized space (every coordinate divided by its scale), so that coordinates and drone velocities count alike.
+    """
+
+    capacity: int # Maximum number of stored positions
+    neighbors: int # Number of neighbours a prediction is based on
+    scale: np.ndarray # Scale of every coordinate of a flattened position
+
+    positions: np.ndarray # Stored normalized positions, shape (stored, dimension)
+    fitness: np.ndarray # Fitness of the stored positions, shape (stored,)
+
+    predictions: int # Number of predictions checked against the true fitness
+    absolute_error: float # Sum of the absolute errors of these predictions
+
+    def __init__(self, capacity: int, neighbors: int, scale: np.ndarray):
+        """
+        :param capacity: Maximum number of stored positions, the oldest ones are replaced first.
+        :param neighbors: Number of neighbours a prediction is based on.
+        :param scale: Scale of every coordinate of a flattened position, shape (dimension,).
+        """
+        self.capacity = capacity
+        self.neighbors = neighbors
+        self.scale = np.asarray(scale, dtype=float)
+        self.positions = np.empty((0, len(self.scale)))
+        self.fitness = np.empty(0)
+        self.predictions = 0
+        self.absolute_error = 0.0
+        self._next: int = 0 # Slot replaced next once the capacity is reached
+
+    def __len__(self) -> int:
+        return len(self.fitness)
+
+    def add(self, position: np.ndarray, fitness: float, predicted: float | None = None) -> None:
+        """
+        This method adds a truly evaluated position to the model.
+
+        :param position: The flattened position, shape (dimension,).
+        :param fitness: Its true fitness.
+        :param predicted: The fitness predicted for it before, if any. Used to track the error of the model.
+        :return: None
+        """
+        if not np.isfinite(fitness):
+            return
+        if predicted is not None:
+            self.predictions += 1
+            self.absolute_error += abs(predicted - fitness)
+
+        normalized = np.asarray(position, dtype=float) / self.scale
+        if len(self) < self.capacity:
+            self.positions = np.vstack([self.positions, normalized])
+            self.fitness = np.append(self.fitness, fitness)
+        else:
+            self.positions[self._next] = normalized
+            self.fitness[self._next] = fitness
+            self._next = (self._next + 1) % self.capacity
+
+    def predict(self, positions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method predicts the fitness of positions.
+
+        :param positions: The flattened positions, shape (positions, dimension).
+        :return: A tuple of the predicted fitness and its uncertainty, each of shape (positions,).
+        """
+        normalized = np.asarray(positions, dtype=float) / self.scale
+        distance = np.sqrt(np.maximum(
+            np.sum(normalized ** 2, axis=1)[:, None] - 2 * normalized @ self.positions.T + np.sum(self.positions ** 2, axis=1)[None, :], 0.0
+        ))
+        k: int = min(self.neighbors, len(self))
+        nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+        weights = 1.0 / (np.take_along_axis(distance, nearest, axis=1) + 1e-9)
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        values = self.fitness[nearest]
+        mean = np.sum(weights * values, axis=1)
+        spread = np.sqrt(np.sum(weights * (values - mean[:, None]) ** 2, axis=1))
+        return mean, spread
+
+    def mean_error(self) -> float:
+        """
+        This method returns the mean absolute error of all predictions checked against the true fitness so far.
+
+        :return: The mean absolute error, NaN if no prediction was checked yet.
+        """
+        return self.absolute_error / self.predictions if self.predictions > 0 else float('nan')
@@ -0,0 +1,324 @@
+"""
+Tuning of the PSO settings by successive halving and Hyperband.
+
+A configuration assigns a value to every tuned setting (SEARCH_SPACE). Configurations are rated by their mean global best
+fitness on a fixed set of seeded environments, all with the same particle seed, so two configurations only differ in their
+settings. Successive halving rates many configurations with few iterations, keeps the best 1/eta of them and rates those
+again with eta times the iterations, until the remaining ones run for the full number of iterations. Hyperband runs several
+of these brackets, from many configurations with few iterations to few configurations with all iterations, so that settings
+which only pay off late are not always discarded early. All runs of a rung are distributed across worker processes.
+"""
+
+import csv
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from DroneSwarmPathOpti.simulation import Environment, Drone
+
+from .fitness import calculate_fitness
+from .pso import PSO
+from ..config import get_settings, random_stream, STREAM_TUNING
+from ..project_logger import log_info, Source
+
+settings = get_settings()
+
+# Tuned settings and the range their values are sampled from. The fitness weights are not tuned, they define what is optimized.
+SEARCH_SPACE: dict[str, tuple[float, float]] = {
+    'PSO_MAX_INITIAL_VELOCITY_X': (0.2, 5.0),
+    'PSO_MAX_INITIAL_VELOCITY_Y': (0.2, 5.0),
+    'PSO_INITIAL_POSITION_BOUNDS': (5.0, 50.0),
+    'PSO_MAX_VELOCITY_X': (1.0, 10.0),
+    'PSO_MAX_VELOCITY_Y': (1.0, 10.0),
+    'PSO_VELOCITY_DAMPING': (0.0, 1.0),
+    'PSO_FLUSH_SHARE': (0.0, 0.2),
+    'PSO_FLUSH_WHEN': (0.2, 0.9),
+    'PSO_WEIGHT_PERSONAL_POSITION': (0.3, 1.2),
+    'PSO_WEIGHT_PERSONAL_BEST': (0.3, 2.5),
+    'PSO_WEIGHT_GLOBAL_BEST': (0.3, 2.5),
+    'PSO_DECREASE_WEIGHT_PERSONAL_GOAL': (0.1, 0.8),
+    'PSO_INCREASE_WEIGHT_GLOBAL_GOAL': (0.3, 2.5),
+}
+
+_worker_environments: dict[int, Environment] = {} # Environments of a worker process by seed
+
+
+class TuningTrial:
+    """
+    This class holds a configuration and its rating at the largest number of iterations it reached.
+    """
+
+    index: int # Index of the configuration in sampling order
+    bracket: int # Hyperband bracket the configuration was sampled for (0 for plain successive halving)
+    parameters: dict[str, float] # Value of every tuned setting
+    iterations: int # Largest number of iterations the configuration ran for
+    scores: np.ndarray # Global best fitness on every environment after these iterations, shape (environments,)
+
+    def __init__(self, index: int, bracket: int, parameters: dict[str, float]):
+        self.index = index
+        self.bracket = bracket
+        self.parameters = parameters
+        self.iterations = 0
+        self.scores = np.empty(0)
+
+    @property
+    def score(self) -> float:
+        """
+        The mean global best fitness on all environments (lower is better).
+        """
+        return float(self.scores.mean()) if len(self.scores) > 0 else float('inf')
+
+
+class Tuner:
+    """
+    This class samples configurations and rates them by successive halving or Hyperband (see module documentation).
+    """
+
+    min_iterations: int # Iterations of the first rung
+    max_iterations: int # Iterations of the last rung
+    eta: int # Factor by which the configurations are reduced and the iterations increased from one rung to the next
+    seeds: list[int] # Seeds (or scenario indices) of the environments every configuration is rated on
+    workers: int # Number of worker processes
+
+    trials: list[TuningTrial]
+    iterations_spent: int # Iterations run so far, summed over all configurations and environments
+
+    def __init__(self,
+                 min_iterations: int | None = None,
+                 max_iterations: int | None = None,
+                 eta: int | None = None,
+                 environments: int | None = None,
+                 workers: int | None = None):
+        """
+        :param min_iterations: Iterations of the first rung. Defaults to TUNING_MIN_ITERATIONS of the config.
+        :param max_iterations: Iterations of the last rung. Defaults to PSO_ITERATIONS of the config.
+        :param eta: Reduction factor between rungs. Defaults to TUNING_ETA of the config.
+        :param environments: Number of seeded environments, their seeds follow SEED_ENVIRONMENT (or 0 if unseeded). With a scenario bank (SCENARIO_BANK_FILE), the scenarios following SCENARIO_BANK_INDEX are used instead. Defaults to TUNING_ENVIRONMENTS of the config.
+        :param workers: Number of worker processes, 0 for one per CPU. Defaults to TUNING_WORKERS of the config.
+        """
+        self.min_iterations = min_iterations if min_iterations is not None else settings.TUNING_MIN_ITERATIONS
+        self.max_iterations = max_iterations if max_iterations is not None else settings.PSO_ITERATIONS
+        self.eta = eta if eta is not None else settings.TUNING_ETA
+        if self.eta < 2:
+            raise ValueError(f'The reduction factor must be at least 2, got {self.eta}')
+        if not 0 < self.min_iterations <= self.max_iterations:
+            raise ValueError(f'Iterations must satisfy 0 < min <= max, got {self.min_iterations} and {self.max_iterations}')
+        first_seed: int = settings.SCENARIO_BANK_INDEX if settings.SCENARIO_BANK_FILE else max(settings.SEED_ENVIRONMENT, 0)
+        self.seeds = list(range(first_seed, first_seed + (environments if environments is not None else settings.TUNING_ENVIRONMENTS)))
+        self.workers = (workers if workers is not None else settings.TUNING_WORKERS) or os.cpu_count() or 1
+        self.rng = random_stream(settings.SEED_PARTICLE, STREAM_TUNING)
+        self.trials = []
+        self.iterations_spent = 0
+
+    def successive_halving(self, n: int | None = None) -> list[TuningTrial]:
+        """
+        This method rates n sampled configurations by successive halving from min_iterations to max_iterations.
+
+        :param n: Number of configurations. Defaults to TUNING_CONFIGURATIONS of the config.
+        :return: All trials, ranked (see ranked).
+        """
+        n = n if n is not None else settings.TUNING_CONFIGURATIONS
+        rungs: int = self._rungs()
+        with self._pool() as pool:
+            self._halve(pool, self._sample(n, 0), rungs)
+        self._log_summary()
+        return self.ranked()
+
+    def hyperband(self) -> list[TuningTrial]:
+        """
+        This method rates sampled configurations by Hyperband: one successive halving bracket per possible first rung.
+
+        :return: All trials, ranked (see ranked).
+        """
+        rungs: int = self._rungs()
+        with self._pool() as pool:
+            for bracket in range(rungs):
+                halvings: int = rungs - 1 - bracket # The first bracket starts at the lowest rung with the most configurations
+                n: int = math.ceil(rungs / (halvings + 1) * self.eta ** halvings)
+                log_info(Source.optimization, 'Hyperband bracket %d/%d: %d configurations starting at %d iterations',
+                         bracket + 1, rungs, n, self._iterations(rungs - 1 - halvings, rungs))
+                self._halve(pool, self._sample(n, bracket), halvings + 1)
+        self._log_summary()
+        return self.ranked()
+
+    def ranked(self) -> list[TuningTrial]:
+        """
+        This method ranks all trials: configurations reaching more iterations first, equal iterations by their score.
+
+        :return: The ranked trials.
+        """
+        return sorted(self.trials, key=lambda trial: (-trial.iterations, trial.score, trial.index))
+
+    def write_results(self, path: str) -> None:
+        """
+        This method writes the ranked trials as a table (CSV).
+
+        :param path: File to write to.
+        :return: None
+        """
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['rank', 'configuration', 'bracket', 'iterations', 'score', *(f'score_{seed}' for seed in self.seeds), *SEARCH_SPACE])
+            for rank, trial in enumerate(self.ranked(), start=1):
+                scores = list(trial.scores) + [float('nan')] * (len(self.seeds) - len(trial.scores))
+                writer.writerow([rank, trial.index, trial.bracket, trial.iterations, trial.score, *scores, *(trial.parameters[name] for name in SEARCH_SPACE)])
+
+    def _halve(self, pool: ProcessPoolExecutor, trials: list[TuningTrial], rungs: int) -> None:
+        """
+        This method runs successive halving on trials for the given number of rungs, ending at max_iterations.
+
+        :param pool: The worker processes.
+        :param trials: The trials to rate.
+        :param rungs: Number of rungs to run.
+        :return: None
+        """
+        total_rungs: int = self._rungs()
+        for rung in range(total_rungs - rungs, total_rungs):
+            iterations: int = self._iterations(rung, total_rungs)
+            tasks = [(trial.parameters, seed, iterations) for trial in trials for seed in self.seeds]
+            scores = np.array(list(pool.map(_run, tasks))).reshape(len(trials), len(self.seeds))
+            self.iterations_spent += iterations * len(tasks)
+            for trial, trial_scores in zip(trials, scores):
+                trial.iterations = iterations
+                trial.scores = trial_scores
+            trials = sorted(trials, key=lambda trial: (trial.score, trial.index))
+            log_info(Source.optimization, 'Rung with %d iterations: %d configurations, best score %.4f', iterations, len(trials), trials[0].score)
+            trials = trials[:max(1, len(trials) // self.eta)]
+
+    def _sample(self, n: int, bracket: int) -> list[TuningTrial]:
+        """
+        This method samples configurations uniformly from the search space. The very first configuration is the current config, so it is always compared.
+
+        :param n: Number of configurations.
+        :param bracket: The bracket the configurations are sampled for.
+        :return: The new trials.
+        """
+        trials: list[TuningTrial] = []
+        for _ in range(n):
+            if not self.trials:
+                parameters = {name: float(getattr(settings, name)) for name in SEARCH_SPACE}
+            else:
+                parameters = {name: float(self.rng.uniform(low, high)) for name, (low, high) in SEARCH_SPACE.items()}
+            trial = TuningTrial(len(self.trials), bracket, parameters)
+            self.trials.append(trial)
+            trials.append(trial)
+        return trials
+
+    def _rungs(self) -> int:
+        """
+        This method calculates the number of rungs from min_iterations to max_iterations.
+
+        :return: The number of rungs.
+        """
+        return int(math.floor(math.log(self.max_iterations / self.min_iterations, self.eta) + 1e-9)) + 1
+
+    def _iterations(self, rung: int, rungs: int) -> int:
+        """
+        This method calculates the iterations of a rung. The last rung always runs max_iterations.
+
+        :param rung: Index of the rung.
+        :param rungs: Number of rungs.
+        :return: The number of iterations.
+        """
+        return round(self.max_iterations / self.eta ** (rungs - 1 - rung))
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """
+        This method starts the worker processes, which receive all settings of the main process.
+
+        :return: The pool.
+        """
+        return ProcessPoolExecutor(self.workers, initializer=_initialize_worker, initargs=(settings.model_dump(),))
+
+    def _log_summary(self) -> None:
+        """
+        This method logs the best configuration and the iterations spent compared to running all configurations for max_iterations.
+
+        :return: None
+        """
+        best: TuningTrial = self.ranked()[0]
+        exhaustive: int = len(self.trials) * self.max_iterations * len(self.seeds)
+        log_info(Source.optimization, 'Tuning: %d configurations, %d iterations spent (%.1f%% of running all for %d iterations)',
+                 len(self.trials), self.iterations_spent, 100 * self.iterations_spent / exhaustive, self.max_iterations)
+        log_info(Source.optimization, 'Best configuration (score %.4f): %s', best.score, best.parameters)
+
+
+def tune() -> list[TuningTrial]:
+    """
+    Tunes the settings of SEARCH_SPACE according to the config (TUNING_METHOD) and writes the ranked results to TUNING_RESULTS_FILE.
+
+    :return: All trials, ranked.
+    """
+    tuner = Tuner()
+    if settings.TUNING_METHOD == 'hyperband':
+        trials = tuner.hyperband()
+    elif settings.TUNING_METHOD == 'successive_halving':
+        trials = tuner.successive_halving()
+    else:
+        raise ValueError(f"Unknown tuning method '{settings.TUNING_METHOD}', expected 'hyperband' or 'successive_halving'")
+    if settings.TUNING_RESULTS_FILE:
+        tuner.write_results(settings.TUNING_RESULTS_FILE)
+    return trials
+
+def _initialize_worker(configuration: dict) -> None:
+    """
+    Prepares a worker process: applies the settings of the main process and silences the log of every single run.
+    Every run uses the same particle seed (0 if unseeded), so configurations are not ranked on seed noise.
+    Telemetry, trace and environment cache are disabled, the workers would write the same files at the same time.
+
+    :param configuration: All settings of the main process.
+    """
+    for name, value in configuration.items():
+        setattr(settings, name, value)
+    settings.SEED_PARTICLE = max(settings.SEED_PARTICLE, 0)
+    settings.TELEMETRY_FILE = ''
+    settings.TRACE_FILE = ''
+    settings.ENVIRONMENT_CACHE_DIR = ''
+    logging.getLogger('AppLogger').setLevel(logging.WARNING)
+
+def _run(task: tuple[dict[str, float], int, int]) -> float:
+    """
+    Runs the PSO with a configuration on a seeded environment in a worker process.
+
+    :param task: The values of the tuned settings, the seed of the environment and the number of iterations.
+    :return: The global best fitness.
+    """
+    parameters, seed, iterations = task
+    environment: Environment = _environment(seed)
+    defaults: dict[str, float] = {name: getattr(settings, name) for name in parameters}
+    try:
+        for name, value in parameters.items():
+            setattr(settings, name, type(defaults[name])(value))
+        return float(PSO(calculate_fitness, environment, iterations).optimize()[1])
+    finally:
+        for name, value in defaults.items():
+            setattr(settings, name, value)
+
+def _environment(seed: int) -> Environment:
+    """
+    Creates the seeded environment of a worker process once and reuses it for all later runs.
+
+    :param seed: Seed of the obstacle generation, or index of the scenario if a scenario bank is configured.
+    :return: The environment.
+    """
+    if seed not in _worker_environments:
+        environment: Environment = Environment.__new__(Environment) # Bypass the singleton, a worker holds several environments
+        environment.__init__(
+            (settings.ENVIRONMENT_SIZE_X, settings.ENVIRONMENT_SIZE_Y),
+            [Drone(None, (settings.START_X, settings.START_Y), settings.DRONE_RADIUS) for _ in range(settings.NUMBER_DRONES)],
+            settings.ENVIRONMENT_TRAVERSABLE,
+            (settings.START_X, settings.START_Y),
+            settings.START_RADIUS,
+            (settings.GOAL_X, settings.GOAL_Y),
+            settings.GOAL_RADIUS,
+            seed
+        )
+        if settings.SCENARIO_BANK_FILE:
+            environment.load_scenario(settings.SCENARIO_BANK_FILE, seed)
+        else:
+            environment.load_or_generate_obstacles(settings.NUMBER_OBSTACLES, settings.AVG_SIZE_OBSTACLE)
+        _worker_environments[seed] = environment
+    return _worker_environments[seed]
@@ -2,4 +2,8 @@ from .module_source_enum import Source
 
 from .logger import log_debug, log_info, log_warning, log_error
 
-__all__ = ['Source', 'log_debug', 'log_info', 'log_warning', 'log_error']
\ No newline at end of file
+from .telemetry import start_telemetry, stop_telemetry, flush_telemetry, telemetry_enabled, log_telemetry, read_telemetry
+
+from .trace import start_trace, stop_trace, flush_trace, trace_enabled, log_trace, TraceReader
+
+__all__ = ['Source', 'log_debug', 'log_info', 'log_warning', 'log_error', 'start_telemetry', 'stop_telemetry', 'flush_telemetry', 'telemetry_enabled', 'log_telemetry', 'read_telemetry', 'start_trace', 'stop_trace', 'flush_trace', 'trace_enabled', 'log_trace', 'TraceReader']
\ No newline at end of file
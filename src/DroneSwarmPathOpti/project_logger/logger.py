@@ -6,6 +6,7 @@ This module:
 - Supports per-module logging using a `Source` enum
 - Outputs colored log lines for DEBUG, INFO, WARNING, and ERROR messages
 - Formats logs with timestamp and module source
+- Merges optional arguments into a message (%-style) only if the message is actually emitted, so disabled debug output costs no formatting
 """
 
 import logging
@@ -86,21 +87,21 @@ def get_source_logger(source: Source) -> SourceLoggerAdapter:
     """
     return _source_loggers[source]
 
-def log_debug(source: Source, message: str) -> None:
+def log_debug(source: Source, message: str, *args: Any) -> None:
     """Log a debug message with the given source."""
-    get_source_logger(source).debug(message)
+    get_source_logger(source).debug(message, *args)
 
-def log_info(source: Source, message: str) -> None:
+def log_info(source: Source, message: str, *args: Any) -> None:
     """Log an info message with the given source."""
-    get_source_logger(source).info(message)
+    get_source_logger(source).info(message, *args)
 
-def log_warning(source: Source, message: str) -> None:
+def log_warning(source: Source, message: str, *args: Any) -> None:
     """Log a warning message with the given source."""
-    get_source_logger(source).warning(message)
+    get_source_logger(source).warning(message, *args)
 
-def log_error(source: Source, message: str) -> None:
+def log_error(source: Source, message: str, *args: Any) -> None:
     """Log an error message with the given source."""
-    get_source_logger(source).error(message)
+    get_source_logger(source).error(message, *args)
 
 log_debug(Source.logger, "This is debug!")
 log_info(Source.logger, "This is info!")
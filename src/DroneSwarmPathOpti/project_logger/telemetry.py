@@ -0,0 +1,184 @@
+"""
+Telemetry module for structured, per-iteration metrics of optimization runs.
+
+This module:
+- Accepts metrics as plain dictionaries and never formats them on the calling thread
+- Hands records to a background writer through a `QueueHandler`/`QueueListener` pair
+- Writes records either as JSON lines or as a compact binary file of float64 rows (fields described by a JSON header)
+- Is a no-op unless a telemetry file is configured (TELEMETRY_FILE)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+import numpy as np
+
+from DroneSwarmPathOpti.config import get_settings
+
+settings = get_settings()
+
+TELEMETRY_FORMATS = ('jsonl', 'binary')
+
+telemetry_logger = logging.getLogger("TelemetryLogger") # Dedicated logger, independent of the console output
+telemetry_logger.setLevel(logging.INFO)
+telemetry_logger.propagate = False # Metrics must never reach the console handler
+
+_listener: QueueListener | None = None
+_queue_handler: QueueHandler | None = None
+
+class MetricsQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records untouched. The default implementation formats every record on the calling thread, which is exactly the work we want to move to the writer.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Returns the record without formatting it.
+
+        :param record: Log record carrying a `metrics` dictionary.
+        :return: The unchanged record.
+        """
+        return record
+
+class JsonLinesHandler(logging.FileHandler):
+    """
+    Handler that writes the metrics of every record as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Serializes the metrics of a record.
+
+        :param record: Log record carrying a `metrics` dictionary.
+        :return: The metrics as a JSON string.
+        """
+        return json.dumps(record.metrics)
+
+class BinaryHandler(logging.Handler):
+    """
+    Handler that writes the metrics of every record as a fixed-width row of float64 values.
+    The field names are taken from the first record and stored in a JSON header next to the binary file (<file>.json).
+    """
+
+    def __init__(self, filename: str):
+        super().__init__()
+        self.filename = filename
+        self.stream = open(filename, 'wb')
+        self.fields: list[str] | None = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Writes the metrics of a record as one row.
+
+        :param record: Log record carrying a `metrics` dictionary.
+        """
+        try:
+            if self.fields is None:
+                self.fields = list(record.metrics.keys())
+                with open(f'{self.filename}.json', 'w') as header:
+                    json.dump({'fields': self.fields, 'dtype': 'float64'}, header)
+            row = np.array([record.metrics.get(field, np.nan) for field in self.fields], dtype=np.float64)
+            self.stream.write(row.tobytes())
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """Flushes the underlying file."""
+        if self.stream and not self.stream.closed:
+            self.stream.flush()
+
+    def close(self) -> None:
+        """Closes the underlying file."""
+        self.flush()
+        self.stream.close()
+        super().close()
+
+def start_telemetry(path: str | None = None, file_format: str | None = None) -> None:
+    """
+    Starts the background writer of the telemetry stream. Does nothing if the stream is already running or no file is configured.
+
+    :param path: File to write to. Defaults to TELEMETRY_FILE of the config.
+    :param file_format: One of TELEMETRY_FORMATS. Defaults to TELEMETRY_FORMAT of the config.
+    """
+    global _listener, _queue_handler
+    path = path if path is not None else settings.TELEMETRY_FILE
+    file_format = file_format if file_format is not None else settings.TELEMETRY_FORMAT
+    if _listener is not None or not path:
+        return
+    if file_format not in TELEMETRY_FORMATS:
+        raise ValueError(f"Unknown telemetry format '{file_format}', expected one of {TELEMETRY_FORMATS}")
+
+    if file_format == 'jsonl' and os.path.isfile(f'{path}.json'):
+        os.remove(f'{path}.json') # A header left by an earlier binary stream would make the reader treat the file as binary
+    handler = JsonLinesHandler(path, mode='w') if file_format == 'jsonl' else BinaryHandler(path)
+    record_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = MetricsQueueHandler(record_queue)
+    telemetry_logger.addHandler(_queue_handler)
+    _listener = QueueListener(record_queue, handler)
+    _listener.start()
+
+def stop_telemetry() -> None:
+    """
+    Stops the background writer after all pending records have been written and closes the telemetry file.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop() # Processes all remaining records before returning
+    for handler in _listener.handlers:
+        handler.close()
+    telemetry_logger.removeHandler(_queue_handler)
+    _listener, _queue_handler = None, None
+
+def flush_telemetry() -> None:
+    """
+    Waits until all pending records have been written and flushes the telemetry file, so it can be read (read_telemetry) while the stream continues.
+    """
+    if _listener is None:
+        return
+    _listener.stop() # Processes all remaining records before returning
+    for handler in _listener.handlers:
+        handler.flush()
+    _listener.start()
+
+def telemetry_enabled() -> bool:
+    """
+    Checks whether the telemetry stream is running. Callers should skip collecting metrics entirely otherwise.
+
+    :return: True if records are written, False otherwise.
+    """
+    return _listener is not None
+
+def log_telemetry(metrics: dict[str, float]) -> None:
+    """
+    Enqueues a telemetry record. The dictionary is serialized by the background writer, so it must not be modified afterwards.
+
+    :param metrics: Mapping of metric names to numeric values.
+    """
+    if _listener is not None:
+        telemetry_logger.info('', extra={'metrics': metrics})
+
+def read_telemetry(path: str) -> dict[str, np.ndarray]:
+    """
+    Reads a telemetry file written in any of the supported formats.
+
+    :param path: The telemetry file.
+    :return: Mapping of metric names to one array of values per metric.
+    """
+    try:
+        with open(f'{path}.json') as header_file:
+            header = json.load(header_file)
+    except FileNotFoundError: # No header -> JSON lines
+        with open(path) as file:
+            records = [json.loads(line) for line in file if line.strip()]
+        fields = list(records[0].keys()) if records else []
+        return {field: np.array([record.get(field, np.nan) for record in records], dtype=float) for field in fields}
+
+    rows = np.fromfile(path, dtype=header['dtype']).reshape(-1, len(header['fields']))
+    return {field: rows[:, i] for i, field in enumerate(header['fields'])}
+
+atexit.register(stop_telemetry) # Never lose buffered records when the application exits
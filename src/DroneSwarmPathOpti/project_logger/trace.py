@@ -0,0 +1,250 @@
+"""
+Trace module recording every evaluated candidate of optimization runs for offline analysis.
+
+This module:
+- Records one fixed-width float32 row per particle and iteration: TRACE_FIELDS followed by the position and the velocity of the particle
+- Collects rows in a preallocated buffer and appends it to the trace file in large chunks, so recording costs little more than copying the rows
+- Pads positions with fewer control points (e.g. before a refinement) with NaN, so every row has the same width
+- Describes the layout and the rows of every iteration in a JSON header next to the trace file (<file>.json), rewritten with every chunk
+- Is a no-op unless a trace file is configured (TRACE_FILE)
+"""
+
+import atexit
+import json
+from typing import Iterator
+
+import numpy as np
+
+from DroneSwarmPathOpti.config import get_settings
+
+settings = get_settings()
+
+TRACE_FIELDS: tuple[str, ...] = (
+    'iteration', 'particle', 'evaluated', 'fitness', 'time', 'energy', 'collisions_obstacles', 'collisions_drones', 'control_points'
+)
+
+_recorder: 'TraceRecorder | None' = None
+
+
+class TraceRecorder:
+    """
+    This class appends the evaluations of an optimization to a trace file (see module documentation).
+    """
+
+    path: str
+    drones: int # Number of drone paths per position
+    control_points: int # Maximum number of points per drone path
+    width: int # Number of values per row
+
+    iterations: list[list[int]] # Iteration, first row and number of rows of every recorded iteration
+    rows: int # Number of rows recorded so far
+    written: int # Number of rows written to the file so far
+
+    def __init__(self, path: str, drones: int, control_points: int, buffer_rows: int = 65536):
+        """
+        :param path: File to write to.
+        :param drones: Number of drone paths per position.
+        :param control_points: Maximum number of points per drone path.
+        :param buffer_rows: Number of rows collected before they are written at once.
+        """
+        if buffer_rows <= 0:
+            raise ValueError(f'Trace buffer must hold at least one row, got {buffer_rows}')
+        self.path = path
+        self.drones = drones
+        self.control_points = control_points
+        self.width = len(TRACE_FIELDS) + 2 * drones * control_points * 3
+        self.iterations = []
+        self.rows = 0
+        self.written = 0
+
+        self._buffer: np.ndarray = np.empty((buffer_rows, self.width), dtype=np.float32)
+        self._buffered: int = 0 # Rows in the buffer not written yet
+        self._stream = open(path, 'wb')
+
+    def record(self, iteration: int, fitness: np.ndarray, evaluated: np.ndarray, objectives: np.ndarray, positions: np.ndarray, velocities: np.ndarray) -> None:
+        """
+        This method records the evaluations of all particles in an iteration.
+
+        :param iteration: The current iteration.
+        :param fitness: The fitness of every particle, shape (particles,).
+        :param evaluated: Whether the fitness of every particle was calculated (instead of predicted), shape (particles,).
+        :param objectives: Time, energy and collisions of every particle, NaN if not calculated, shape (particles, 4).
+        :param positions: The positions of all particles, shape (particles, drones, control points, 3).
+        :param velocities: The velocities of all particles, same shape as positions.
+        :return: None
+        """
+        count, drones, control_points, _ = positions.shape
+        if drones != self.drones or control_points > self.control_points:
+            raise ValueError(f'Positions of shape {positions.shape} do not fit into a trace of {self.drones} drones with {self.control_points} points')
+        rows = np.full((count, self.width), np.nan, dtype=np.float32)
+        rows[:, 0] = iteration
+        rows[:, 1] = np.arange(count)
+        rows[:, 2] = evaluated
+        rows[:, 3] = fitness
+        rows[:, 4:8] = objectives
+        rows[:, 8] = control_points
+        paths = rows[:, len(TRACE_FIELDS):].reshape(count, 2, self.drones, self.control_points, 3)
+        paths[:, 0, :, :control_points] = positions
+        paths[:, 1, :, :control_points] = velocities
+
+        self.iterations.append([iteration, self.rows, count])
+        self.rows += count
+        begin: int = 0
+        while begin < count: # An iteration may not fit into the rest of the buffer
+            taken: int = min(count - begin, len(self._buffer) - self._buffered)
+            self._buffer[self._buffered:self._buffered + taken] = rows[begin:begin + taken]
+            self._buffered += taken
+            begin += taken
+            if self._buffered == len(self._buffer):
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        This method appends the buffered rows to the trace file and updates the header.
+
+        :return: None
+        """
+        if self._buffered > 0:
+            self._stream.write(self._buffer[:self._buffered].tobytes())
+            self.written += self._buffered
+            self._buffered = 0
+        self._stream.flush()
+        with open(f'{self.path}.json', 'w') as header:
+            json.dump({
+                'fields': list(TRACE_FIELDS),
+                'dtype': 'float32',
+                'drones': self.drones,
+                'control_points': self.control_points,
+                'rows': self.written,
+                'iterations': self.iterations,
+            }, header)
+
+    def close(self) -> None:
+        """
+        This method writes all remaining rows and closes the trace file.
+
+        :return: None
+        """
+        self.flush()
+        self._stream.close()
+
+
+class TraceReader:
+    """
+    This class reads a trace file lazily: the file is memory-mapped and only the rows of the requested iterations are accessed.
+    """
+
+    path: str
+    fields: list[str]
+    drones: int # Number of drone paths per position
+    control_points: int # Maximum number of points per drone path
+    iterations: list[list[int]] # Iteration, first row and number of rows of every recorded iteration
+
+    def __init__(self, path: str):
+        """
+        :param path: File written by a TraceRecorder.
+        """
+        self.path = path
+        with open(f'{path}.json') as header_file:
+            header = json.load(header_file)
+        self.fields = header['fields']
+        self.drones = header['drones']
+        self.control_points = header['control_points']
+        self.iterations = [entry for entry in header['iterations'] if entry[1] + entry[2] <= header['rows']] # Only completely written iterations
+        width: int = len(self.fields) + 2 * self.drones * self.control_points * 3
+        self._rows: np.ndarray = (np.memmap(path, dtype=header['dtype'], mode='r', shape=(header['rows'], width))
+                                  if header['rows'] > 0 else np.empty((0, width), dtype=header['dtype']))
+
+    def __len__(self) -> int:
+        return len(self.iterations)
+
+    def __getitem__(self, index: int) -> dict[str, np.ndarray]:
+        """
+        This method reads the rows of a recorded iteration.
+
+        :param index: Index of the iteration in recording order (iterations of consecutive optimizations may repeat).
+        :return: Mapping of every field to its values, plus 'positions' and 'velocities' of shape (particles, drones, control points, 3). All arrays are read-only views of the memory map.
+        """
+        _, first, count = self.iterations[index]
+        rows = self._rows[first:first + count]
+        record: dict[str, np.ndarray] = {field: rows[:, i] for i, field in enumerate(self.fields)}
+        paths = rows[:, len(self.fields):].reshape(count, 2, self.drones, self.control_points, 3)
+        record['positions'] = paths[:, 0]
+        record['velocities'] = paths[:, 1]
+        return record
+
+    def __iter__(self) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+        """
+        This method iterates over all recorded iterations without reading the others.
+
+        :return: An iterator of the iteration number and its rows (see __getitem__).
+        """
+        for index, (iteration, _, _) in enumerate(self.iterations):
+            yield iteration, self[index]
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        This method reads a single field of all rows.
+
+        :param name: Name of the field, one of TRACE_FIELDS.
+        :return: The values of the field.
+        """
+        return self._rows[:, self.fields.index(name)]
+
+
+def start_trace(drones: int, control_points: int, path: str | None = None, buffer_rows: int | None = None) -> None:
+    """
+    Starts recording evaluations. Does nothing if a recording is already running or no file is configured.
+    All optimizations of a process are recorded into the same file, so their layout (drones and control points) has to match.
+
+    :param drones: Number of drone paths per position.
+    :param control_points: Maximum number of points per drone path.
+    :param path: File to write to. Defaults to TRACE_FILE of the config.
+    :param buffer_rows: Number of rows collected before they are written at once. Defaults to TRACE_BUFFER_ROWS of the config.
+    """
+    global _recorder
+    path = path if path is not None else settings.TRACE_FILE
+    if _recorder is not None or not path:
+        return
+    _recorder = TraceRecorder(path, drones, control_points, buffer_rows if buffer_rows is not None else settings.TRACE_BUFFER_ROWS)
+
+def stop_trace() -> None:
+    """
+    Writes all remaining rows and closes the trace file.
+    """
+    global _recorder
+    if _recorder is None:
+        return
+    _recorder.close()
+    _recorder = None
+
+def flush_trace() -> None:
+    """
+    Writes all buffered rows and the header, so the trace file can be read (TraceReader) while the recording continues.
+    """
+    if _recorder is not None:
+        _recorder.flush()
+
+def trace_enabled() -> bool:
+    """
+    Checks whether evaluations are recorded. Callers should skip collecting them entirely otherwise.
+
+    :return: True if evaluations are recorded, False otherwise.
+    """
+    return _recorder is not None
+
+def log_trace(iteration: int, fitness: np.ndarray, evaluated: np.ndarray, objectives: np.ndarray, positions: np.ndarray, velocities: np.ndarray) -> None:
+    """
+    Records the evaluations of all particles in an iteration (see TraceRecorder.record).
+
+    :param iteration: The current iteration.
+    :param fitness: The fitness of every particle, shape (particles,).
+    :param evaluated: Whether the fitness of every particle was calculated (instead of predicted), shape (particles,).
+    :param objectives: Time, energy and collisions of every particle, NaN if not calculated, shape (particles, 4).
+    :param positions: The positions of all particles, shape (particles, drones, control points, 3).
+    :param velocities: The velocities of all particles, same shape as positions.
+    """
+    if _recorder is not None:
+        _recorder.record(iteration, fitness, evaluated, objectives, positions, velocities)
+
+atexit.register(stop_trace) # Never lose buffered rows when the application exits
@@ -1,15 +1,23 @@
+import os
+
 import numpy as np
 
-from DroneSwarmPathOpti.config import get_settings
+from DroneSwarmPathOpti.config import get_settings, random_stream, STREAM_ENVIRONMENT
 
 from .drone import Drone
 from .map_object import MapObject
 from .map_object import collision_objects
 from ..environment_utils import traverse
+from ..environment_utils import CubicBSpline
+from ..environment_utils import obstacle_collisions, drone_collisions
+from ..environment_utils import cache_key, read_cache, write_cache
+from ..environment_utils import Roadmap
+from ..environment_utils import ScenarioBank
 from ...project_logger import log_info, Source, log_warning
 
 settings = get_settings()
-rng = np.random.default_rng(None if settings.SEED_ENVIRONMENT == -1 else settings.SEED_ENVIRONMENT)
+
+_PAIR_CHUNK: int = 1 << 22 # Pairs of drones compared at once when searching collisions between drones
 
 class Obstacle(MapObject):
     """
@@ -17,9 +25,31 @@ class Obstacle(MapObject):
     The purpose of an obstacle is to make an environment unique and create a set of non-trivial paths from a start to a goal in an environment.
     """
 
-    def __init__(self, position: tuple[int, int], base_radius: float):
+    def __init__(self, position: tuple[int, int], base_radius: float, rng: np.random.Generator | None = None, key: tuple[int, ...] | None = None):
+        """
+        :param position: Position of the obstacle.
+        :param base_radius: Average radius, the radius is drawn between half and one and a half times of it.
+        :param rng: Random stream the radius is drawn from (obstacles of an environment use the stream of the environment).
+        :param key: Address of a stream derived from SEED_ENVIRONMENT, only used if no rng is given. Obstacles created in the same run need different keys.
+        """
+        if rng is None and key is None:
+            raise ValueError('An obstacle needs a random stream or the key of one')
+        rng = rng if rng is not None else random_stream(settings.SEED_ENVIRONMENT, STREAM_ENVIRONMENT, 2, *key)
         super().__init__(position, rng.uniform(base_radius - base_radius*0.5, base_radius*1.5))
 
+    @classmethod
+    def with_radius(cls, position: tuple[int, int], radius: float) -> 'Obstacle':
+        """
+        This method creates an obstacle with an exact radius instead of a randomized one (e.g. when restoring an environment).
+
+        :param position: Position of the obstacle.
+        :param radius: Radius of the obstacle.
+        :return: The obstacle.
+        """
+        obstacle = cls.__new__(cls)
+        MapObject.__init__(obstacle, position, radius)
+        return obstacle
+
 class SingletonMeta(type):
     """
     This metaclass creates a singleton class to prohibit multiple instances of any inheriting classes.
@@ -50,6 +80,11 @@ class Environment(metaclass=SingletonMeta):
 
     traversable:bool # True if there has to be at least one path from start to goal
     validation_path: list[tuple[int, int]] | None # None if not traversable
+    occupancy_grid: np.ndarray | None # Rasterized obstacles (1 = blocked), None if the map was never validated
+    seed: int # Seed of the obstacle generation, -1 for no seed
+    rng: np.random.Generator # Random stream of the obstacle generation
+    roadmap: Roadmap | None # Visibility graph of the current obstacles, built on demand
+    _roadmap_obstacles: np.ndarray | None # Obstacles the roadmap was built for
 
     def __init__(self,
                  bounds: tuple[int, int],
@@ -58,7 +93,8 @@ class Environment(metaclass=SingletonMeta):
                  start: tuple[int, int]=None,
                  start_radius: int=5,
                  goal: tuple[int, int]=None,
-                 goal_radius: int=5
+                 goal_radius: int=5,
+                 seed: int | None=None # Defaults to SEED_ENVIRONMENT of the config
                  ):
 
         self.start = MapObject(start, start_radius) if start is not None else None
@@ -68,6 +104,12 @@ class Environment(metaclass=SingletonMeta):
         self.bounds = bounds
         self.drones = drones
         self.obstacles = []
+        self.validation_path = None
+        self.occupancy_grid = None
+        self.roadmap = None
+        self._roadmap_obstacles = None
+        self.seed = seed if seed is not None else settings.SEED_ENVIRONMENT
+        self.rng = random_stream(self.seed, STREAM_ENVIRONMENT)
 
     def generate_obstacles(self,
                            obstacles: int,
@@ -94,9 +136,9 @@ class Environment(metaclass=SingletonMeta):
                 tries_obstacle: int = 0
 
                 while True:
-                    x = rng.integers(0, x_max + 1)
-                    y = rng.integers(0, y_max + 1)
-                    obstacle = Obstacle((int(x), int(y)), base_radius)
+                    x = self.rng.integers(0, x_max + 1)
+                    y = self.rng.integers(0, y_max + 1)
+                    obstacle = Obstacle((int(x), int(y)), base_radius, self.rng)
                     if (
                             (self.start is None or self.goal is None)
                             or
@@ -128,28 +170,175 @@ class Environment(metaclass=SingletonMeta):
                 break
         return True
 
+    def load_or_generate_obstacles(self,
+                                   obstacles: int,
+                                   base_radius: float
+                                   ) -> bool:
+        """
+        This method restores the obstacles, the validation path and the occupancy grid from the environment cache or generates them if no cache entry exists.
+        An entry is identified by the seed, the bounds, start and goal, the obstacle settings and the map validation settings, so runs sharing the same map never generate it twice.
+        Caching is skipped if no cache directory is configured or the environment is not seeded.
+
+        :param obstacles: Number of obstacles to generate
+        :param base_radius: Average radius of the obstacles to generate
+        :return: Return true if obstacles were successfully restored or generated, false otherwise
+        """
+        seed: int = self.seed
+        directory: str = settings.ENVIRONMENT_CACHE_DIR
+        if not directory or seed == -1: # Unseeded environments are never reproduced -> nothing to cache
+            return self.generate_obstacles(obstacles, base_radius)
+
+        key: str = cache_key(
+            seed=seed,
+            bounds=list(self.bounds),
+            start=None if self.start is None else [*self.start.position, self.start.radius],
+            goal=None if self.goal is None else [*self.goal.position, self.goal.radius],
+            traversable=self.traversable,
+            connectivity=settings.ENVIRONMENT_GRID_CONNECTIVITY, # The validation path depends on the search
+            hierarchical=settings.ENVIRONMENT_GRID_HIERARCHICAL,
+            obstacles=obstacles,
+            base_radius=base_radius
+        )
+
+        entry = read_cache(directory, key)
+        if entry is not None:
+            cached, metadata = entry
+            self.obstacles = [Obstacle.with_radius((int(x), int(y)), float(r)) for x, y, r in cached['obstacles']]
+            self.validation_path = [(int(x), int(y)) for x, y in cached['validation_path']] if metadata['has_validation_path'] else None
+            self.occupancy_grid = cached.get('occupancy_grid')
+            log_info(Source.environment, 'restored environment %s from cache', key)
+            return True
+
+        if not self.generate_obstacles(obstacles, base_radius):
+            return False # Failed generations are not cached
+
+        arrays: dict[str, np.ndarray] = {
+            'obstacles': self.get_obstacle_array(),
+            'validation_path': np.array(self.validation_path or [], dtype=np.int32).reshape(-1, 2)
+        }
+        if self.occupancy_grid is not None:
+            arrays['occupancy_grid'] = self.occupancy_grid
+        os.makedirs(directory, exist_ok=True)
+        write_cache(directory, key, arrays, {'has_validation_path': self.validation_path is not None})
+        log_info(Source.environment, 'stored environment %s in cache', key)
+        return True
+
+    def load_scenario(self, path: str, index: int) -> bool:
+        """
+        This method restores the obstacles of a scenario from a scenario bank (see generate_scenario_bank) instead of generating them.
+        Bounds, start and goal of the bank have to match the environment. If the environment is traversable, the map is validated to restore the validation path.
+
+        :param path: File of the scenario bank.
+        :param index: Index of the scenario.
+        :return: Return true if the scenario was restored (and is traversable if required), false otherwise
+        """
+        bank: ScenarioBank = ScenarioBank(path)
+        if not 0 <= index < len(bank):
+            raise ValueError(f'Scenario {index} does not exist, the bank {path} holds {len(bank)} scenarios')
+        expected = (list(self.bounds),
+                    None if self.start is None else [*self.start.position, self.start.radius],
+                    None if self.goal is None else [*self.goal.position, self.goal.radius])
+        if expected != (bank.header['bounds'], bank.header['start'], bank.header['goal']):
+            raise ValueError(f'The scenario bank {path} was generated for other bounds, start or goal')
+
+        self.obstacles = [Obstacle.with_radius((int(x), int(y)), float(r)) for x, y, r in bank[index]]
+        log_info(Source.environment, 'restored scenario %d of %s', index, path)
+        if self.traversable and self.start is not None and self.goal is not None:
+            self.validation_path = self._validate_map()
+            return len(self.validation_path) > 0
+        self.validation_path = None
+        return True
+
     def _validate_map(self) -> list[tuple[int, int]]:
         """
-        This method checks if the environment is traversable or not by translating it into a gridlike graph and removing all nodes overlapping with an obstacle.
+        This method checks if the environment is traversable or not by rasterizing it into a grid and searching a path through all cells not overlapping with an obstacle.
 
         :return: Return the path found from start to goal if the environment is traversable, an empty path otherwise
         """
+        self.occupancy_grid = self.rasterize_obstacles()
+
+        start = self.start.position
+        goal = self.goal.position
+
+        path = traverse(self.occupancy_grid, start, goal, settings.ENVIRONMENT_GRID_CONNECTIVITY, settings.ENVIRONMENT_GRID_HIERARCHICAL)
+        return path
+
+    def rasterize_obstacles(self) -> np.ndarray:
+        """
+        This method rasterizes all obstacles into a grid with one cell per unit of the environment.
+        Only the bounding box of an obstacle is evaluated, vectorized over all cells inside of it.
+
+        :return: A grid of shape (height, width) in which every cell overlapping with an obstacle is 1 and every other cell is 0.
+        """
         width, height = self.bounds
-        grid_data = [[0 for _ in range(width)] for _ in range(height)]
+        grid = np.zeros((height, width), dtype=np.uint8)
 
         for obstacle in self.obstacles:
             ox, oy = obstacle.position
             r = int(obstacle.radius)
-            for y in range(max(0, oy - r), min(height, oy + r)):
-                for x in range(max(0, ox - r), min(width, ox + r)):
-                    if (x - ox) ** 2 + (y - oy) ** 2 <= r ** 2:
-                        grid_data[y][x] = 1 # Cut link
+            y_min, y_max = max(0, oy - r), min(height, oy + r)
+            x_min, x_max = max(0, ox - r), min(width, ox + r)
+            if y_min >= y_max or x_min >= x_max:
+                continue
+            y, x = np.ogrid[y_min:y_max, x_min:x_max]
+            grid[y_min:y_max, x_min:x_max] |= ((x - ox) ** 2 + (y - oy) ** 2 <= r ** 2).astype(np.uint8) # Cut link
+        return grid
+
+    def get_roadmap(self) -> Roadmap:
+        """
+        This method returns the roadmap of the environment. The roadmap is only built once and rebuilt if the obstacles changed since.
+        Obstacles are inflated by the radius of the largest drone, so every path of the roadmap can be flown by every drone without collisions.
 
-        start = self.start.position
-        goal = self.goal.position
+        :return: The roadmap of the current obstacles.
+        """
+        obstacles: np.ndarray = self.get_obstacle_array()
+        if self.roadmap is None or not np.array_equal(obstacles, self._roadmap_obstacles):
+            clearance: float = max((drone.radius for drone in self.drones), default=0.0)
+            self.roadmap = Roadmap(obstacles, self.bounds, clearance, settings.ENVIRONMENT_ROADMAP_VERTICES)
+            self._roadmap_obstacles = obstacles
+            log_info(Source.environment, 'built roadmap with %d nodes and %d edges', len(self.roadmap.nodes), self.roadmap.graph.number_of_edges())
+        return self.roadmap
+
+    def query_roadmap(self, start: tuple[float, float] | None = None, goal: tuple[float, float] | None = None) -> list[tuple[float, float]]:
+        """
+        This method searches a collision free path through the roadmap of the environment.
 
-        path = traverse(grid_data, start, goal)
-        return path
+        :param start: Starting point. Defaults to the start of the environment.
+        :param goal: Goal point. Defaults to the goal of the environment.
+        :return: A list of points from start to goal. If no path was found an empty list will be returned.
+        """
+        start = start if start is not None else self.start.position
+        goal = goal if goal is not None else self.goal.position
+        return self.get_roadmap().query(start, goal)
+
+    def window(self, start: tuple[float, float], goal: tuple[float, float], radius: float) -> 'Environment':
+        """
+        This method creates an environment for a local section of this environment, e.g. to optimize a long path window by window.
+        The window shares the bounds and drones of this environment, but only contains the obstacles overlapping with a circle around the middle of start and goal.
+        Unlike any other environment, the window is not a singleton, so an arbitrary number of windows can exist next to this environment.
+
+        :param start: Starting point of the window.
+        :param goal: Goal point of the window.
+        :param radius: Radius of the circle around the middle of start and goal which contains the relevant obstacles.
+        :return: The environment of the window.
+        """
+        window: Environment = Environment.__new__(Environment) # Bypass the singleton
+        window.__init__(
+            self.bounds,
+            self.drones,
+            False,
+            (float(start[0]), float(start[1])),
+            self.start.radius if self.start is not None else 5,
+            (float(goal[0]), float(goal[1])),
+            self.goal.radius if self.goal is not None else 5
+        )
+
+        center = (np.asarray(start, dtype=float) + np.asarray(goal, dtype=float)) / 2
+        window.obstacles = [
+            obstacle for obstacle in self.obstacles
+            if np.hypot(obstacle.position[0] - center[0], obstacle.position[1] - center[1]) < radius + obstacle.radius
+        ]
+        return window
 
     def get_collisions_obstacles(self, resolution: float=1.0) -> list[tuple[int, int]]:
         """
@@ -160,16 +349,29 @@ class Environment(metaclass=SingletonMeta):
         :return: A list of all collisions between drones and obstacles.
         """
         collisions_obstacles: list[tuple[int, int]] = []
+        obstacles: np.ndarray = self.get_obstacle_array()
         for drone in self.drones:
-
-            t_samples = np.arange(drone.path.t[0], drone.path.t[-1], resolution) # Create an even distribution along the path of a drone
-            for t in t_samples: # For every evenly distributed point in a drone's path
-                x, y, r = drone.path.x(t), drone.path.y(t), drone.radius # Next step
-                for obstacle in self.obstacles: # Check if a collision occurs at the currently reviewed position of a drone
-                    if _collision_raw(obstacle.position[0], obstacle.position[1], obstacle.radius, x, y, r):
-                        collisions_obstacles.append((x, y))
+            x, y = self.sample_collisions_obstacles(drone.path, drone.radius, obstacles, resolution)
+            collisions_obstacles.extend(zip(x.tolist(), y.tolist()))
         return collisions_obstacles
 
+    @staticmethod
+    def sample_collisions_obstacles(path: CubicBSpline, radius: float, obstacles: np.ndarray, resolution: float=1.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method checks for collisions between a single drone path and obstacles at evenly sampled moments (see get_collisions_obstacles).
+
+        :param path: The path of the drone.
+        :param radius: The radius of the drone.
+        :param obstacles: The obstacles, shape (obstacles, 3) with the columns x, y and radius.
+        :param resolution: The size of the steps in time between two checked moments.
+        :return: A tuple of the x- and y-coordinates of the drone at every collision, ordered by sample, then by obstacle.
+        """
+        t_samples = np.arange(path.t[0], path.t[-1], resolution) # Create an even distribution along the path of a drone
+        x, y = path.x(t_samples), path.y(t_samples) # All steps at once
+        hits = ((x[:, None] - obstacles[:, 0]) ** 2 + (y[:, None] - obstacles[:, 1]) ** 2 < (radius + obstacles[:, 2]) ** 2) # Circles overlap, shape (samples, obstacles)
+        samples, _ = np.nonzero(hits) # Ordered by sample, then by obstacle
+        return x[samples], y[samples]
+
     def get_collisions_drones(self, resolution: float=1.0) -> list[tuple[int, int]]:
         """
         This method checks for collisions between drones and all other drones in the environment.
@@ -183,32 +385,56 @@ class Environment(metaclass=SingletonMeta):
         t_min: float = min(float(drone.path.t[1]) for drone in self.drones) # Moment in time in which the first drone passes its first control point (Start excluded)
         t_samples = np.arange(t_min, t_max, resolution) # Create an even distribution along the time-axis
 
-        for t in t_samples: # For every moment in time
-            positions = [
-                (drone.path.x(float(t)), drone.path.y(float(t)), drone.radius) for drone in self.drones # Get all the drones current position at the currently reviewed moment in time
-            ]
-
-            for i in range(len(positions)):
-                for j in range(i + 1, len(positions)): # Check collisions between drones
-                    x1, y1, r1 = positions[i]
-                    x2, y2, r2 = positions[j]
-                    if _collision_raw(x1, y1, r1, x2, y2, r2):
-                        collisions_drones.append((x1, y1))
+        x = np.array([drone.path.x(t_samples) for drone in self.drones]).T # Get all the drones positions at every reviewed moment in time, shape (samples, drones)
+        y = np.array([drone.path.y(t_samples) for drone in self.drones]).T
+        radii = np.array([drone.radius for drone in self.drones], dtype=float)
+        first, second = np.triu_indices(len(self.drones), 1) # Every pair of drones once, ordered like two nested loops
+        chunk: int = max(1, _PAIR_CHUNK // max(1, len(first))) # Moments in time checked at once
+
+        for begin in range(0, len(t_samples), chunk):
+            xs, ys = x[begin:begin + chunk], y[begin:begin + chunk]
+            hits = (xs[:, second] - xs[:, first]) ** 2 + (ys[:, second] - ys[:, first]) ** 2 < (radii[second] + radii[first]) ** 2 # Circles overlap
+            samples, pairs = np.nonzero(hits) # Ordered by moment in time, then by pair
+            collisions_drones.extend(zip(xs[samples, first[pairs]].tolist(), ys[samples, first[pairs]].tolist()))
         return collisions_drones
 
-def _collision_raw(x1: float, y1: float, r1: float, x2: float, y2: float, r2: float) -> bool:
-    """
-    This method calculates collisions between objects using Euclidean distance.
-
-    :param x1: X-coordinate object 1
-    :param y1: Y-coordinate object 1
-    :param r1: Radius object 1
-    :param x2: X-coordinate object 2
-    :param y2: Y-coordinate object 2
-    :param r2: Radius object 2
-    :return: True if collision detected, False otherwise
-    """
-    dx = x2 - x1
-    dy = y2 - y1
-    dist_sq = dx * dx + dy * dy
-    return dist_sq < (r2 + r1)**2
\ No newline at end of file
+    def get_collision_durations_obstacles(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method calculates the exact time every drone spends colliding with obstacles.
+        Instead of sampling a drone's path, the moments of entering and leaving an obstacle are calculated analytically, which makes the result independent of any resolution.
+
+        :return: A tuple of the total collision duration and the total penetration (time integral of the squared distance deficit) per drone, each of shape (drones,).
+        """
+        drone, _, entry, exit_, penetration = obstacle_collisions(
+            [drone.path for drone in self.drones],
+            np.array([drone.radius for drone in self.drones], dtype=float),
+            self.get_obstacle_array()
+        )
+        durations = np.bincount(drone, weights=exit_ - entry, minlength=len(self.drones))
+        penetrations = np.bincount(drone, weights=penetration, minlength=len(self.drones))
+        return durations, penetrations
+
+    def get_collision_durations_drones(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method calculates the exact time every pair of drones spends colliding with each other.
+        Instead of sampling the time-axis, the moments of two drones starting and stopping to overlap are calculated analytically, which makes the result independent of any resolution.
+
+        :return: A tuple of the total collision duration and the total penetration (time integral of the squared distance deficit) per pair of drones, each of shape (drones, drones). Only the upper triangle is populated.
+        """
+        drone_a, drone_b, entry, exit_, penetration = drone_collisions(
+            [drone.path for drone in self.drones],
+            np.array([drone.radius for drone in self.drones], dtype=float)
+        )
+        durations = np.zeros((len(self.drones), len(self.drones)))
+        penetrations = np.zeros((len(self.drones), len(self.drones)))
+        np.add.at(durations, (drone_a, drone_b), exit_ - entry)
+        np.add.at(penetrations, (drone_a, drone_b), penetration)
+        return durations, penetrations
+
+    def get_obstacle_array(self) -> np.ndarray:
+        """
+        This method returns all obstacles of the environment as an array.
+
+        :return: An array of shape (obstacles, 3) containing the x-coordinate, y-coordinate and radius of every obstacle.
+        """
+        return np.array([(*obstacle.position, obstacle.radius) for obstacle in self.obstacles], dtype=float).reshape(-1, 3)
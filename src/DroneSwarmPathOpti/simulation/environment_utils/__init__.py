@@ -2,4 +2,22 @@ from .graph import traverse
 
 from .spline import CubicBSpline
 
-__all__ = ['traverse', 'CubicBSpline']
\ No newline at end of file
+from .collision import obstacle_collisions
+from .collision import drone_collisions
+
+from .cache import cache_key
+from .cache import read_cache
+from .cache import write_cache
+
+from .roadmap import Roadmap
+
+from .reservation import ReservationTable
+
+from .scenario_bank import ScenarioBank
+from .scenario_bank import generate_scenario_bank
+
+from .trajectory import TrajectoryWriter
+from .trajectory import TrajectoryReader
+from .trajectory import export_trajectories
+
+__all__ = ['traverse', 'CubicBSpline', 'obstacle_collisions', 'drone_collisions', 'cache_key', 'read_cache', 'write_cache', 'Roadmap', 'ReservationTable', 'ScenarioBank', 'generate_scenario_bank', 'TrajectoryWriter', 'TrajectoryReader', 'export_trajectories']
\ No newline at end of file
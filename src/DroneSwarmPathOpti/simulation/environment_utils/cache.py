@@ -0,0 +1,74 @@
+"""
+Persistent cache for precomputed arrays.
+
+Every cache entry is a directory named after a hash of the parameters which produced it. The directory holds one `.npy`
+file per array plus a small JSON file for scalar metadata. Arrays are memory-mapped when loading, so even large rasters
+are available instantly and only the parts actually accessed are read from disk.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_VERSION: int = 2 # Increase whenever the layout or the meaning of cached data changes
+_METADATA_FILE: str = 'metadata.json'
+
+
+def cache_key(**parameters) -> str:
+    """
+    This method calculates the key of a cache entry.
+
+    :param parameters: All parameters which influence the cached data. Values must be JSON serializable.
+    :return: A hexadecimal hash of the parameters.
+    """
+    payload = json.dumps({'version': CACHE_VERSION, **parameters}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def write_cache(directory: str, key: str, arrays: dict[str, np.ndarray], metadata: dict | None = None) -> None:
+    """
+    This method writes a cache entry. The entry is written to a temporary directory first and renamed afterwards, so that concurrent readers never see a partial entry.
+
+    :param directory: The cache directory.
+    :param key: The key of the entry.
+    :param arrays: The arrays to store.
+    :param metadata: Additional JSON serializable values to store.
+    """
+    target = os.path.join(directory, key)
+    if os.path.isdir(target):
+        return # Entries are immutable
+
+    temporary = os.path.join(directory, f'.{key}.{os.getpid()}.tmp')
+    os.makedirs(temporary, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(temporary, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(temporary, _METADATA_FILE), 'w') as file:
+        json.dump({'arrays': list(arrays.keys()), **(metadata or {})}, file)
+
+    try:
+        os.rename(temporary, target)
+    except OSError: # Another process was faster
+        for name in os.listdir(temporary):
+            os.remove(os.path.join(temporary, name))
+        os.rmdir(temporary)
+
+def read_cache(directory: str, key: str) -> tuple[dict[str, np.ndarray], dict] | None:
+    """
+    This method reads a cache entry. Arrays are memory-mapped read-only.
+
+    :param directory: The cache directory.
+    :param key: The key of the entry.
+    :return: A tuple of the arrays and the metadata, or None if the entry does not exist.
+    """
+    target = os.path.join(directory, key)
+    try:
+        with open(os.path.join(target, _METADATA_FILE)) as file:
+            metadata = json.load(file)
+    except FileNotFoundError:
+        return None
+    arrays = {
+        name: np.load(os.path.join(target, f'{name}.npy'), mmap_mode='r')
+        for name in metadata.pop('arrays')
+    }
+    return arrays, metadata
@@ -0,0 +1,342 @@
+"""
+Exact collision detection for piecewise cubic paths.
+
+Every segment of a `CubicBSpline` is a cubic polynomial in time for both coordinates. The squared distance between such a
+segment and a fixed point (an obstacle's centre) or another cubic segment (a second drone on a merged knot interval) is
+therefore a polynomial of degree six. Its roots on the segment are the exact moments in which a drone enters or leaves a
+collision. All polynomials of one check are solved at once using the eigenvalues of their stacked companion matrices.
+"""
+
+import numpy as np
+
+from .spline import CubicBSpline
+
+_DEGREE: int = 6 # Degree of the squared distance polynomial
+_IMAGINARY_TOLERANCE: float = 1e-6 # Roots with a larger imaginary part are discarded (false positives are filtered by the sign test)
+_MERGE_TOLERANCE: float = 1e-9 # Violations closer than this are merged into one interval
+
+
+def obstacle_collisions(
+        splines: list[CubicBSpline],
+        radii: np.ndarray,
+        obstacles: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This method calculates the exact intervals in which drones collide with obstacles.
+
+    :param splines: The paths of all drones.
+    :param radii: The radius of every drone, shape (drones,).
+    :param obstacles: The obstacles, shape (obstacles, 3) with the columns x, y and radius.
+    :return: A tuple (drone, obstacle, entry, exit, penetration) of arrays with one entry per collision. Penetration is the time integral of the squared distance deficit over the collision.
+    """
+    obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 3)
+    if len(splines) == 0 or len(obstacles) == 0:
+        return _empty_result(2)
+
+    coefficients_x, coefficients_y, offsets, lengths, drone_index = [], [], [], [], []
+    for i, spline in enumerate(splines):
+        cx, cy = spline.get_coefficients()
+        coefficients_x.append(cx)
+        coefficients_y.append(cy)
+        offsets.append(spline.t[:-1])
+        lengths.append(np.diff(spline.t))
+        drone_index.append(np.full(len(cx), i))
+
+    cx = np.concatenate(coefficients_x) # (segments, 4)
+    cy = np.concatenate(coefficients_y)
+    offset = np.concatenate(offsets)
+    length = np.concatenate(lengths)
+    drones = np.concatenate(drone_index)
+    segments, count = len(cx), len(obstacles)
+
+    # Relative position of every segment to every obstacle -> only the constant term changes
+    dx = np.repeat(cx, count, axis=0)
+    dy = np.repeat(cy, count, axis=0)
+    dx[:, 3] -= np.tile(obstacles[:, 0], segments)
+    dy[:, 3] -= np.tile(obstacles[:, 1], segments)
+    reach = np.tile(obstacles[:, 2], segments) + np.repeat(np.asarray(radii, dtype=float)[drones], count)
+
+    keys = np.stack([np.repeat(drones, count), np.tile(np.arange(count), segments)], axis=1)
+    entry, exit_, penetration, rows = _violations(dx, dy, reach, np.repeat(offset, count), np.repeat(length, count))
+    keys, entry, exit_, penetration = _merge(keys[rows], entry, exit_, penetration)
+    return keys[:, 0], keys[:, 1], entry, exit_, penetration
+
+def drone_collisions(
+        splines: list[CubicBSpline],
+        radii: np.ndarray,
+        drone: int | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This method calculates the exact intervals in which drones collide with each other.
+
+    Two drones are compared while both of them are between their first and last control point, since all drones share the
+    same start and goal. The knots of both splines are merged, so that both paths are a single cubic on every interval.
+    If only the pairs of a single drone are checked and all splines have the same number of knots (e.g. all paths of a swarm), these pairs are prepared in one vectorized pass.
+
+    :param splines: The paths of all drones.
+    :param radii: The radius of every drone, shape (drones,).
+    :param drone: If given, only the pairs containing this drone are checked (e.g. after only its path changed).
+    :return: A tuple (drone_a, drone_b, entry, exit, penetration) of arrays with one entry per collision. Penetration is the time integral of the squared distance deficit over the collision.
+    """
+    radii = np.asarray(radii, dtype=float)
+    coefficients = [spline.get_coefficients() for spline in splines]
+
+    dx, dy, reach, offset, length, keys = [], [], [], [], [], []
+    if drone is not None and len({len(spline.t) for spline in splines}) == 1:
+        rows = _pairs_of_drone(splines, coefficients, radii, drone)
+        if rows is not None:
+            for collected, row in zip((dx, dy, reach, offset, length, keys), rows):
+                collected.append(row)
+    else:
+        for a in range(len(splines)):
+            for b in range(a + 1, len(splines)):
+                if drone is not None and drone != a and drone != b:
+                    continue
+                t_a, t_b = splines[a].t, splines[b].t
+                lower = max(float(t_a[1]), float(t_b[1])) # Both drones passed their first control point
+                upper = min(float(t_a[-2]), float(t_b[-2])) # Neither drone passed its last control point
+                if upper <= lower:
+                    continue
+
+                knots = np.unique(np.concatenate([t_a, t_b, [lower, upper]]))
+                knots = knots[(knots >= lower) & (knots <= upper)]
+                left = knots[:-1]
+
+                xa, ya = _shift(coefficients[a], t_a, left)
+                xb, yb = _shift(coefficients[b], t_b, left)
+                dx.append(xa - xb)
+                dy.append(ya - yb)
+                reach.append(np.full(len(left), radii[a] + radii[b]))
+                offset.append(left)
+                length.append(np.diff(knots))
+                keys.append(np.tile((a, b), (len(left), 1)))
+
+    if len(dx) == 0:
+        return _empty_result(2)
+
+    keys_all = np.concatenate(keys)
+    entry, exit_, penetration, rows = _violations(
+        np.concatenate(dx), np.concatenate(dy), np.concatenate(reach), np.concatenate(offset), np.concatenate(length)
+    )
+    keys_all, entry, exit_, penetration = _merge(keys_all[rows], entry, exit_, penetration)
+    return keys_all[:, 0], keys_all[:, 1], entry, exit_, penetration
+
+def _pairs_of_drone(
+        splines: list[CubicBSpline],
+        coefficients: list[tuple[np.ndarray, np.ndarray]],
+        radii: np.ndarray,
+        drone: int
+) -> tuple[np.ndarray, ...] | None:
+    """
+    This method prepares the relative movement of a drone to all other drones on their merged knot intervals at once.
+    All splines must have the same number of knots, so that the knots of every pair can be merged by sorting a single array.
+
+    :param splines: The paths of all drones.
+    :param coefficients: The x and y coefficients of every spline.
+    :param radii: The radius of every drone, shape (drones,).
+    :param drone: Index of the drone.
+    :return: A tuple (dx, dy, reach, offset, length, keys) with one row per interval as expected by _violations, or None if no pair overlaps in time.
+    """
+    others = np.array([other for other in range(len(splines)) if other != drone], dtype=int)
+    if len(others) == 0:
+        return None
+    t_drone = splines[drone].t
+    t_others = np.stack([splines[other].t for other in others]) # (others, knots)
+    lower = np.maximum(t_drone[1], t_others[:, 1])[:, None] # Both drones passed their first control point
+    upper = np.minimum(t_drone[-2], t_others[:, -2])[:, None] # Neither drone passed its last control point
+
+    knots = np.sort(np.concatenate([np.broadcast_to(t_drone, t_others.shape), t_others], axis=1), axis=1)
+    left = np.clip(knots[:, :-1], lower, upper)
+    right = np.clip(knots[:, 1:], lower, upper)
+    pair, interval = np.nonzero(right > left) # Intervals outside of the overlap collapse to empty ones
+    left, right = left[pair, interval], right[pair, interval]
+    if len(left) == 0:
+        return None
+
+    xa, ya = _shift(coefficients[drone], t_drone, left)
+    segment = np.clip(np.sum(t_others[pair] <= left[:, None], axis=1) - 1, 0, t_others.shape[1] - 2)
+    offset_in_segment = left - t_others[pair, segment]
+    xb = _taylor_shift(np.stack([coefficients[other][0] for other in others])[pair, segment], offset_in_segment)
+    yb = _taylor_shift(np.stack([coefficients[other][1] for other in others])[pair, segment], offset_in_segment)
+
+    keys = np.stack([np.minimum(drone, others[pair]), np.maximum(drone, others[pair])], axis=1)
+    return xa - xb, ya - yb, radii[drone] + radii[others[pair]], left, right - left, keys
+
+def _shift(
+        coefficients: tuple[np.ndarray, np.ndarray],
+        knots: np.ndarray,
+        origins: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    This method re-expands the cubic segments of a spline around new origins (Taylor shift).
+
+    :param coefficients: The x and y coefficients of the spline, each of shape (segments, 4), highest degree first.
+    :param knots: The knots of the spline.
+    :param origins: The new origins, one per requested interval.
+    :return: The x and y coefficients of the segment containing each origin, expanded around that origin.
+    """
+    segment = np.clip(np.searchsorted(knots, origins, side='right') - 1, 0, len(knots) - 2)
+    d = origins - knots[segment]
+    shifted = [_taylor_shift(c[segment], d) for c in coefficients]
+    return shifted[0], shifted[1]
+
+def _taylor_shift(c: np.ndarray, d: np.ndarray) -> np.ndarray:
+    """
+    This method re-expands cubic segments around origins shifted by d from their own origin.
+
+    :param c: The coefficients of the segments, shape (intervals, 4), highest degree first.
+    :param d: The shift of every origin, shape (intervals,).
+    :return: The shifted coefficients, shape (intervals, 4).
+    """
+    return np.stack([
+        c[:, 0],
+        3 * c[:, 0] * d + c[:, 1],
+        (3 * c[:, 0] * d + 2 * c[:, 1]) * d + c[:, 2],
+        ((c[:, 0] * d + c[:, 1]) * d + c[:, 2]) * d + c[:, 3],
+    ], axis=1)
+
+def _violations(
+        dx: np.ndarray,
+        dy: np.ndarray,
+        reach: np.ndarray,
+        offset: np.ndarray,
+        length: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This method finds all sub-intervals in which the distance polynomial is smaller than the collision distance.
+
+    :param dx: Relative x-coordinate as a cubic per row, shape (rows, 4), highest degree first, local time starting at 0.
+    :param dy: Relative y-coordinate as a cubic per row, shape (rows, 4).
+    :param reach: Collision distance per row (sum of both radii).
+    :param offset: Absolute time at which each row starts.
+    :param length: Duration of each row.
+    :return: A tuple (entry, exit, penetration, row) with one entry per violating sub-interval.
+    """
+    # Substitute s = u * length so that every row is solved on the unit interval (better conditioning)
+    powers = length[:, None] ** np.arange(3, -1, -1)
+    dx = dx * powers
+    dy = dy * powers
+
+    f = _square(dx) + _square(dy) # Squared distance, shape (rows, 7)
+    f[:, -1] -= reach ** 2
+
+    roots = _roots_unit_interval(f)
+    breakpoints = np.sort(np.concatenate([np.zeros((len(f), 1)), roots, np.ones((len(f), 1))], axis=1), axis=1)
+    lower, upper = breakpoints[:, :-1], breakpoints[:, 1:]
+
+    inside = (_polyval(f, (lower + upper) / 2) < 0) & (upper > lower)
+    rows, _ = np.nonzero(inside)
+    lower, upper = lower[inside], upper[inside]
+
+    antiderivative = -f[rows] / np.arange(_DEGREE + 1, 0, -1) # Integral of the deficit -f (without constant)
+    penetration = (upper * _polyval(antiderivative, upper) - lower * _polyval(antiderivative, lower)) * length[rows]
+
+    entry = offset[rows] + lower * length[rows]
+    exit_ = offset[rows] + upper * length[rows]
+    return entry, exit_, penetration, rows
+
+def _square(p: np.ndarray) -> np.ndarray:
+    """
+    This method squares cubic polynomials.
+
+    :param p: Cubic polynomials, shape (rows, 4), highest degree first.
+    :return: The squared polynomials, shape (rows, 7), highest degree first.
+    """
+    result = np.zeros((len(p), _DEGREE + 1))
+    for i in range(4):
+        for j in range(4):
+            result[:, i + j] += p[:, i] * p[:, j]
+    return result
+
+def _polyval(p: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """
+    This method evaluates one polynomial per row at one or several points per row (Horner's method).
+
+    :param p: Polynomials, shape (rows, degree + 1), highest degree first.
+    :param u: Points, shape (rows,) or (rows, points).
+    :return: The values, same shape as u.
+    """
+    u = np.asarray(u)
+    coefficients = p if u.ndim == 1 else p[:, :, None]
+    result = np.zeros_like(u, dtype=float)
+    for k in range(p.shape[1]):
+        result = result * u + coefficients[:, k]
+    return result
+
+def _roots_unit_interval(f: np.ndarray) -> np.ndarray:
+    """
+    This method calculates the real roots of degree six polynomials inside the unit interval.
+
+    Regular polynomials are solved in one batch via the eigenvalues of their companion matrices.
+    Polynomials with a vanishing leading coefficient (straight segments) are solved individually.
+
+    :param f: Polynomials, shape (rows, 7), highest degree first.
+    :return: The roots, shape (rows, 6). Missing roots are represented by 1.0 (the end of the interval).
+    """
+    roots = np.ones((len(f), _DEGREE))
+    scale = np.max(np.abs(f), axis=1)
+    regular = np.abs(f[:, 0]) > 1e-12 * np.where(scale > 0, scale, 1.0)
+
+    if np.any(regular):
+        monic = f[regular, 1:] / f[regular, :1]
+        companion = np.zeros((len(monic), _DEGREE, _DEGREE))
+        companion[:, 0, :] = -monic
+        companion[:, np.arange(1, _DEGREE), np.arange(_DEGREE - 1)] = 1.0
+        roots[regular] = _filter_roots(np.linalg.eigvals(companion))
+
+    for row in np.flatnonzero(~regular):
+        found = _filter_roots(np.roots(f[row])[None, :])[0] if np.any(f[row]) else np.ones(0)
+        roots[row, :len(found)] = found
+    return roots
+
+def _filter_roots(candidates: np.ndarray) -> np.ndarray:
+    """
+    This method replaces all complex roots and all roots outside the unit interval with 1.0.
+
+    :param candidates: Complex roots, shape (rows, n).
+    :return: Real roots inside the unit interval, shape (rows, n).
+    """
+    real = candidates.real
+    valid = (np.abs(candidates.imag) < _IMAGINARY_TOLERANCE) & (real > 0.0) & (real < 1.0)
+    return np.where(valid, real, 1.0)
+
+def _merge(
+        keys: np.ndarray,
+        entry: np.ndarray,
+        exit_: np.ndarray,
+        penetration: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This method merges touching violation pieces of the same objects into one collision.
+
+    :param keys: The colliding objects per piece, shape (pieces, 2).
+    :param entry: Start of every piece.
+    :param exit_: End of every piece.
+    :param penetration: Penetration of every piece.
+    :return: The merged keys, entries, exits and penetrations.
+    """
+    if len(entry) == 0:
+        return keys.reshape(0, 2), entry, exit_, penetration
+
+    order = np.lexsort((entry, keys[:, 1], keys[:, 0]))
+    keys, entry, exit_, penetration = keys[order], entry[order], exit_[order], penetration[order]
+
+    new_key = np.any(keys[1:] != keys[:-1], axis=1)
+    gap = entry[1:] > exit_[:-1] + _MERGE_TOLERANCE # Pieces of the same objects never overlap
+    starts = np.flatnonzero(np.concatenate([[True], new_key | gap]))
+
+    return (
+        keys[starts],
+        entry[starts],
+        exit_[np.concatenate([starts[1:], [len(exit_)]]) - 1],
+        np.add.reduceat(penetration, starts)
+    )
+
+def _empty_result(keys: int) -> tuple[np.ndarray, ...]:
+    """
+    This method creates an empty collision result.
+
+    :param keys: Number of key arrays in the result.
+    :return: A tuple of empty arrays.
+    """
+    return tuple(np.zeros(0, dtype=int) for _ in range(keys)) + tuple(np.zeros(0) for _ in range(3))
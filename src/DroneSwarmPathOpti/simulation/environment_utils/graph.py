@@ -1,58 +1,160 @@
-import networkx as nx
+import heapq
+import math
 
+import numpy as np
 
-def _grid_to_graph(grid: list[list[int]]) -> nx.Graph:
+_SQRT2: float = math.sqrt(2)
+_COARSE_FACTOR: int = 4 # Number of fine cells per side of a coarse cell in hierarchical mode
+_COARSE_MIN_SIZE: int = 64 # Grids with fewer cells per side are searched directly in hierarchical mode
+
+
+def _astar(
+        blocked: np.ndarray,
+        start: tuple[int, int],
+        goal: tuple[int, int],
+        connectivity: int
+) -> list[tuple[int, int]]:
     """
-    This method takes a two-dimensional grid and converts it into a networkx graph.
+    This method searches the shortest path through a grid using A* on flat cell indices.
 
-    :param grid: Two-dimensional grid in which every integer but a '1' represents a node to be connected to all its neighbors. A '1' will be skipped.
-    :return:
+    The grid is padded with a blocked border, so that neighbors never have to be checked against the bounds.
+    Cost and predecessor of a cell are only stored once a cell is reached, so the memory grows with the explored area instead of the grid.
+    Diagonal moves are only allowed if both adjacent orthogonal cells are free (no cutting of corners).
+
+    :param blocked: Boolean grid of shape (height, width), True for every cell that must not be entered.
+    :param start: Starting cell (x, y).
+    :param goal: Goal cell (x, y).
+    :param connectivity: 4 or 8.
+    :return: A list of cells from start to goal, an empty list if there is no path.
     """
-    nx_grid = nx.Graph()
-    height = len(grid)
-    width = len(grid[0])
+    height, width = blocked.shape
+    stride = width + 2
+    free = bytearray((~np.pad(blocked, 1, constant_values=True)).astype(np.uint8).tobytes()) # 1 = free, border is blocked
+
+    def index(x: int, y: int) -> int:
+        return (y + 1) * stride + (x + 1)
+
+    start_index, goal_index = index(*start), index(*goal)
+    if not (free[start_index] and free[goal_index]):
+        return []
+
+    orthogonal = ((1, 0), (-1, 0), (0, 1), (0, -1))
+    moves: list[tuple[int, float, int, int]] = [(dy * stride + dx, 1.0, 0, 0) for dx, dy in orthogonal] # (offset, cost, corner a, corner b)
+    if connectivity == 8:
+        moves += [(dy * stride + dx, _SQRT2, dx, dy * stride) for dx in (1, -1) for dy in (1, -1)]
+        diagonal_saving = _SQRT2 - 2 # Octile distance: dx + dy + (sqrt(2) - 2) * min(dx, dy)
+    elif connectivity == 4:
+        diagonal_saving = 0.0 # Manhattan distance: dx + dy
+    else:
+        raise ValueError(f'Unsupported connectivity {connectivity}, expected 4 or 8')
 
-    for y in range(height):
-        for x in range(width):
-            if grid[y][x] == 1:
-                continue  # skip obstacle
+    goal_y, goal_x = divmod(goal_index, stride)
+    cost: dict[int, float] = {start_index: 0.0}
+    parent: dict[int, int] = {start_index: -1}
+    open_heap: list[tuple[float, float, float, int]] = [(0.0, 0.0, 0.0, start_index)] # (f, h, g, cell)
+    push, pop, cost_get = heapq.heappush, heapq.heappop, cost.get # Local aliases, this loop is the hot path
 
-            nx_grid.add_node((x, y))
+    while open_heap:
+        _, _, g, current = pop(open_heap)
+        if current == goal_index:
+            break
+        if g > cost[current]:
+            continue # Outdated entry
 
-            # connect neighbors
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx_, ny_ = x + dx, y + dy
-                if 0 <= nx_ < width and 0 <= ny_ < height:
-                    if grid[ny_][nx_] == 0:
-                        nx_grid.add_edge((x, y), (nx_, ny_), weight=1)
+        for offset, step, corner_a, corner_b in moves:
+            neighbor = current + offset
+            if not free[neighbor]:
+                continue
+            if corner_a and not (free[current + corner_a] and free[current + corner_b]):
+                continue
+            g_new = g + step
+            if g_new < cost_get(neighbor, math.inf):
+                cost[neighbor] = g_new
+                parent[neighbor] = current
+                y, x = divmod(neighbor, stride)
+                dx = abs(x - goal_x)
+                dy = abs(y - goal_y)
+                h = dx + dy + diagonal_saving * (dx if dx < dy else dy)
+                push(open_heap, (g_new + h, h, g_new, neighbor)) # Ties are broken towards the goal
+    else:
+        return []
 
-    return nx_grid
+    path: list[tuple[int, int]] = []
+    current = goal_index
+    while current != -1:
+        y, x = divmod(current, stride)
+        path.append((x - 1, y - 1))
+        current = parent[current]
+    return path[::-1]
 
-def _heuristic(a, b):
+def _hierarchical(
+        blocked: np.ndarray,
+        start: tuple[int, int],
+        goal: tuple[int, int],
+        connectivity: int
+) -> list[tuple[int, int]]:
     """
-    This method calculates the heuristic between two nodes.
+    This method searches a path coarse-to-fine.
 
-    :param a: Node a
-    :param b: Node b
-    :return: The heuristic as an absolute value.
+    The grid is reduced by _COARSE_FACTOR per side (a coarse cell is blocked if most of its cells are blocked, start and goal are always free)
+    and searched recursively. The search on this grid is then restricted to a corridor of one coarse cell around the coarse path.
+    Since the coarse grid is only an approximation, the whole grid is searched if the corridor does not contain a path.
+
+    :param blocked: Boolean grid of shape (height, width), True for every cell that must not be entered.
+    :param start: Starting cell (x, y).
+    :param goal: Goal cell (x, y).
+    :param connectivity: 4 or 8.
+    :return: A list of cells from start to goal, an empty list if there is no path.
     """
-    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+    height, width = blocked.shape
+    if max(height, width) <= _COARSE_MIN_SIZE:
+        return _astar(blocked, start, goal, connectivity)
+
+    factor = _COARSE_FACTOR
+    coarse_height, coarse_width = math.ceil(height / factor), math.ceil(width / factor)
+    padded = np.zeros((coarse_height * factor, coarse_width * factor), dtype=bool)
+    padded[:height, :width] = blocked
+    coarse = padded.reshape(coarse_height, factor, coarse_width, factor).mean(axis=(1, 3)) > 0.5
+
+    coarse_start = (start[0] // factor, start[1] // factor)
+    coarse_goal = (goal[0] // factor, goal[1] // factor)
+    coarse[coarse_start[1], coarse_start[0]] = False
+    coarse[coarse_goal[1], coarse_goal[0]] = False
+
+    coarse_path = _hierarchical(coarse, coarse_start, coarse_goal, connectivity)
+    if len(coarse_path) > 0:
+        allowed = np.zeros_like(coarse)
+        for x, y in coarse_path: # Widen the coarse path by one cell in every direction
+            allowed[max(0, y - 1):y + 2, max(0, x - 1):x + 2] = True
+        corridor = np.repeat(np.repeat(allowed, factor, axis=0), factor, axis=1)[:height, :width]
+        path = _astar(blocked | ~corridor, start, goal, connectivity)
+        if len(path) > 0:
+            return path
+
+    return _astar(blocked, start, goal, connectivity)
 
 def traverse(
-        grid_data: list[list[int]],
+        grid_data: list[list[int]] | np.ndarray,
         start: tuple[int, int],
-        goal: tuple[int, int]
+        goal: tuple[int, int],
+        connectivity: int = 8,
+        hierarchical: bool = False
 ) -> list[tuple[int, int]]:
     """
     This method traverses a grid of nodes starting from start to goal.
 
-    :param grid_data: The graph to be traversed.
+    :param grid_data: The grid to be traversed, indexed [y][x]. Every cell but a '1' can be entered.
     :param start: Starting node
     :param goal: Goal node
+    :param connectivity: 4 to move horizontally and vertically only, 8 to move diagonally as well.
+    :param hierarchical: Search coarser versions of the grid first and restrict each finer search to a corridor around the coarser path. Much faster on large grids, but the path is not guaranteed to be the shortest one.
     :return: A list of nodes - represented as tuples with their respective x and y coordinates within the grid - containing a possible path from start to goal. If no path was found an empty list will be returned.
     """
-    grid = _grid_to_graph(grid_data)
-    try:
-        return nx.astar_path(grid, start, goal, heuristic=_heuristic)
-    except nx.exception.NetworkXNoPath:
-        return []
\ No newline at end of file
+    blocked = np.asarray(grid_data) == 1
+    height, width = blocked.shape
+    if not (0 <= start[0] < width and 0 <= start[1] < height and 0 <= goal[0] < width and 0 <= goal[1] < height):
+        return []
+
+    if hierarchical:
+        return _hierarchical(blocked, start, goal, connectivity)
+    return _astar(blocked, start, goal, connectivity)
@@ -0,0 +1,144 @@
+import math
+
+import numpy as np
+
+from .spline import CubicBSpline
+
+_CELL_BITS: int = 20 # Bits of a cell coordinate inside of a key
+_CELL_OFFSET: int = 1 << (_CELL_BITS - 1) # Makes negative cell coordinates positive
+
+
+class ReservationTable:
+    """
+    This class stores the sampled positions of drones whose paths are fixed (e.g. the best paths of all other drones) in a hashed space-time table.
+
+    Time is sampled on a grid shared by all drones (multiples of the resolution), and space is divided into square cells. Every sample of a drone
+    reserves the cell it lies in during its time bin. Checking a new path only looks up the cells around each of its samples in the same time bin,
+    instead of comparing it to every other drone at every moment. A drone is only sampled while it is between its first and last control point,
+    and a conflict is a sample at which two drones overlap.
+    The counts differ from Environment.get_collisions_drones: it samples all drones on a grid starting when the first drone passes its first
+    control point and compares them at every sample, even before a drone started or after it passed its last control point.
+
+    Trajectories can be inserted and removed one by one, so the table follows changing paths without being rebuilt.
+    """
+
+    resolution: float # Time between two samples
+    cell_size: float # Edge length of a cell
+    max_radius: float # Largest radius of all drones inserted so far
+
+    def __init__(self, resolution: float, cell_size: float):
+        """
+        :param resolution: Time between two samples.
+        :param cell_size: Edge length of a cell. Twice the largest drone radius keeps every lookup to the 3x3 cells around a sample.
+        """
+        if resolution <= 0 or cell_size <= 0:
+            raise ValueError(f'Resolution and cell size must be positive, got {resolution} and {cell_size}')
+        self.resolution = resolution
+        self.cell_size = cell_size
+        self.max_radius = 0.0
+        self._cells: dict[int, dict[int, tuple[float, float, float]]] = {} # Key of a time bin and cell -> drone -> x, y and radius
+        self._keys: dict[int, list[int]] = {} # Keys reserved by every drone
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, drone: int) -> bool:
+        return drone in self._keys
+
+    def insert(self, drone: int, spline: CubicBSpline, radius: float) -> None:
+        """
+        This method reserves the cells of a drone's trajectory. A trajectory inserted before under the same index is replaced.
+
+        :param drone: Index of the drone.
+        :param spline: The path of the drone.
+        :param radius: The radius of the drone.
+        :return: None
+        """
+        self.remove(drone)
+        x, y, bins = self._sample(spline)
+        keys = self._encode(bins, *self._cell(x, y)).tolist()
+        for key, xi, yi in zip(keys, x.tolist(), y.tolist()):
+            self._cells.setdefault(key, {})[drone] = (xi, yi, radius)
+        self._keys[drone] = keys
+        self.max_radius = max(self.max_radius, radius)
+
+    def remove(self, drone: int) -> None:
+        """
+        This method releases all cells reserved by a drone. Unknown drones are ignored.
+
+        :param drone: Index of the drone.
+        :return: None
+        """
+        for key in self._keys.pop(drone, []):
+            cell = self._cells[key]
+            del cell[drone]
+            if not cell:
+                del self._cells[key]
+
+    def conflicts(self, spline: CubicBSpline, radius: float, exclude: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method finds the samples at which a path overlaps with the reserved trajectories.
+
+        :param spline: The path to check.
+        :param radius: The radius of its drone.
+        :param exclude: Index of a drone whose reservations are ignored (e.g. the previous path of the same drone).
+        :return: A tuple of the other drone and the time of every conflict, each of shape (conflicts,).
+        """
+        x, y, bins = self._sample(spline)
+        if len(bins) == 0 or not self._cells:
+            return np.empty(0, dtype=int), np.empty(0)
+
+        reach: int = math.ceil((radius + self.max_radius) / self.cell_size) # Cells to search in every direction
+        offsets = np.arange(-reach, reach + 1)
+        cx, cy = self._cell(x, y)
+        keys = self._encode(
+            np.repeat(bins, len(offsets) ** 2),
+            (cx[:, None, None] + offsets[None, :, None]).repeat(len(offsets), axis=2).ravel(),
+            (cy[:, None, None] + offsets[None, None, :]).repeat(len(offsets), axis=1).ravel()
+        )
+        hits = self._cells.keys() & set(keys.tolist()) # Hash lookups of all keys at once
+
+        drones: list[int] = []
+        times: list[float] = []
+        for key in hits:
+            sample: int = key // (1 << (2 * _CELL_BITS)) - int(bins[0]) # Samples lie in consecutive bins
+            for other, (xo, yo, ro) in self._cells[key].items():
+                if other != exclude and (x[sample] - xo) ** 2 + (y[sample] - yo) ** 2 < (radius + ro) ** 2:
+                    drones.append(other)
+                    times.append(float(bins[sample]) * self.resolution)
+        return np.array(drones, dtype=int), np.array(times)
+
+    def _sample(self, spline: CubicBSpline) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        This method samples a path on the shared time grid between its first and last control point.
+
+        :param spline: The path.
+        :return: A tuple of the x and y coordinates and the time bin of every sample.
+        """
+        first: int = math.ceil(float(spline.t[1]) / self.resolution)
+        last: int = math.ceil(float(spline.t[-2]) / self.resolution) # Exclusive, like np.arange
+        bins = np.arange(first, max(first, last))
+        t = bins * self.resolution
+        return spline.x(t), spline.y(t), bins
+
+    def _cell(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method calculates the cells containing positions.
+
+        :param x: The x coordinates.
+        :param y: The y coordinates.
+        :return: A tuple of the integer cell coordinates.
+        """
+        return np.floor(x / self.cell_size).astype(np.int64), np.floor(y / self.cell_size).astype(np.int64)
+
+    @staticmethod
+    def _encode(bins: np.ndarray, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """
+        This method packs time bins and cells into single integer keys.
+
+        :param bins: The time bins.
+        :param cx: The x coordinates of the cells.
+        :param cy: The y coordinates of the cells.
+        :return: The keys.
+        """
+        return (bins.astype(np.int64) << (2 * _CELL_BITS)) | ((cx + _CELL_OFFSET) << _CELL_BITS) | (cy + _CELL_OFFSET)
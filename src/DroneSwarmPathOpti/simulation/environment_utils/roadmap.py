@@ -0,0 +1,178 @@
+import math
+
+import networkx as nx
+import numpy as np
+
+_PAIR_CHUNK: int = 65536 # Number of node pairs checked for tangency at once when building the roadmap
+_CHUNK_ELEMENTS: int = 1 << 21 # Number of line-obstacle distances calculated at once
+
+
+class Roadmap:
+    """
+    This class represents a visibility graph over circular obstacles which is built once per map and answers many start/goal queries.
+
+    Every obstacle is inflated by a clearance (e.g. the radius of a drone) and surrounded by a regular polygon whose edges never intersect the inflated obstacle.
+    The vertices of these polygons are the nodes of the roadmap and two nodes are connected if the straight line between them is free of obstacles.
+    Only lines which are tangent to the polygons at both of their ends are considered (reduced visibility graph), since a shortest path never bends anywhere else.
+    A query only has to connect start and goal to the visible nodes before running A* on the prepared graph.
+    """
+
+    obstacles: np.ndarray # Inflated obstacles, shape (obstacles, 3) with the columns x, y and radius
+    bounds: tuple[int, int] # Size of the environment
+    nodes: np.ndarray # Position of every node, shape (nodes, 2)
+    owners: np.ndarray # Index of the obstacle every node surrounds, shape (nodes,)
+    neighbors: np.ndarray # Previous and next vertex of the polygon every node belongs to, shape (nodes, 2, 2)
+    graph: nx.Graph # Visibility graph, nodes are indices into `nodes`, edges are weighted by their length
+
+    def __init__(self,
+                 obstacles: np.ndarray,
+                 bounds: tuple[int, int],
+                 clearance: float,
+                 vertices_per_obstacle: int = 8):
+        """
+        :param obstacles: The obstacles, shape (obstacles, 3) with the columns x, y and radius.
+        :param bounds: Size of the environment. Nodes outside of it are discarded.
+        :param clearance: Distance every path must keep to every obstacle.
+        :param vertices_per_obstacle: Number of polygon vertices surrounding every obstacle.
+        """
+        self.bounds = bounds
+        self.obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 3).copy()
+        self.obstacles[:, 2] += clearance
+
+        # Circumscribe every inflated obstacle, so that the polygon's edges stay outside of it
+        angles = 2 * math.pi * np.arange(vertices_per_obstacle) / vertices_per_obstacle
+        radius = self.obstacles[:, 2:] / math.cos(math.pi / vertices_per_obstacle) * (1 + 1e-6)
+        polygons = np.stack([
+            self.obstacles[:, :1] + radius * np.cos(angles),
+            self.obstacles[:, 1:2] + radius * np.sin(angles)
+        ], axis=2) # (obstacles, vertices, 2)
+        nodes = polygons.reshape(-1, 2)
+        neighbors = np.stack([np.roll(polygons, 1, axis=1), np.roll(polygons, -1, axis=1)], axis=2).reshape(-1, 2, 2)
+
+        inside_bounds = (nodes[:, 0] >= 0) & (nodes[:, 0] <= bounds[0]) & (nodes[:, 1] >= 0) & (nodes[:, 1] <= bounds[1])
+        keep = inside_bounds & ~self._inside_obstacle(nodes)
+        self.nodes = nodes[keep]
+        self.owners = np.repeat(np.arange(len(self.obstacles)), vertices_per_obstacle)[keep]
+        self.neighbors = neighbors[keep]
+
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(len(self.nodes)))
+        first, second = np.triu_indices(len(self.nodes), k=1)
+        for begin in range(0, len(first), _PAIR_CHUNK):
+            a, b = first[begin:begin + _PAIR_CHUNK], second[begin:begin + _PAIR_CHUNK]
+            tangent = self._tangent(a, self.nodes[b]) & self._tangent(b, self.nodes[a])
+            a, b = a[tangent], b[tangent]
+            visible = self._visible(self.nodes[a], self.nodes[b])
+            lengths = np.hypot(*(self.nodes[b[visible]] - self.nodes[a[visible]]).T)
+            self.graph.add_weighted_edges_from(zip(a[visible].tolist(), b[visible].tolist(), lengths.tolist()))
+
+    def query(self, start: tuple[float, float], goal: tuple[float, float]) -> list[tuple[float, float]]:
+        """
+        This method searches the shortest path from start to goal through the roadmap.
+        Obstacles containing start or goal are ignored for the edges connecting them to the roadmap, otherwise such points could never be left or reached.
+        In this case the path may be slightly longer than the shortest one, since the roadmap only contains lines tangent to the obstacles from the outside.
+
+        :param start: Starting point
+        :param goal: Goal point
+        :return: A list of points from start to goal. If no path was found an empty list will be returned.
+        """
+        endpoints = np.array([start, goal], dtype=float)
+        containing = self._containing(endpoints)
+        if self._visible(endpoints[:1], endpoints[1:], ignore=containing)[0]:
+            return [tuple(start), tuple(goal)] # Direct line of sight
+
+        self.graph.add_nodes_from(('start', 'goal'))
+        try:
+            for name, point in (('start', endpoints[0]), ('goal', endpoints[1])):
+                # Points inside an obstacle may leave it through any vertex of its polygon
+                candidates = np.flatnonzero(self._tangent(np.arange(len(self.nodes)), point[None, :]) | containing[self.owners])
+                points = np.repeat(point[None, :], len(candidates), axis=0)
+                visible = candidates[self._visible(points, self.nodes[candidates], ignore=containing)]
+                lengths = np.hypot(*(self.nodes[visible] - point).T)
+                self.graph.add_weighted_edges_from((name, int(node), float(length)) for node, length in zip(visible, lengths))
+
+            def heuristic(a, b) -> float:
+                return float(np.hypot(*(self._position(a, endpoints) - self._position(b, endpoints))))
+
+            path = nx.astar_path(self.graph, 'start', 'goal', heuristic=heuristic, weight='weight')
+        except nx.exception.NetworkXNoPath:
+            return []
+        finally:
+            self.graph.remove_nodes_from(('start', 'goal')) # Keep the roadmap reusable for the next query
+
+        return [tuple(float(c) for c in self._position(node, endpoints)) for node in path]
+
+    def _position(self, node, endpoints: np.ndarray) -> np.ndarray:
+        """
+        This method returns the position of a node of the graph.
+
+        :param node: Index of a roadmap node, 'start' or 'goal'.
+        :param endpoints: Positions of start and goal, shape (2, 2).
+        :return: The position of the node.
+        """
+        if node == 'start':
+            return endpoints[0]
+        if node == 'goal':
+            return endpoints[1]
+        return self.nodes[node]
+
+    def _tangent(self, nodes: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """
+        This method checks which lines touch the polygon of their node from the outside, i.e. both polygon neighbors of the node lie on the same side of the line.
+
+        :param nodes: Indices of the nodes the lines start at, shape (lines,).
+        :param others: Other end of every line, shape (lines, 2) or (1, 2).
+        :return: Boolean array of shape (lines,).
+        """
+        origin = self.nodes[nodes]
+        direction = others - origin
+        relative = self.neighbors[nodes] - origin[:, None, :] # (lines, 2, 2)
+        cross = direction[:, None, 0] * relative[..., 1] - direction[:, None, 1] * relative[..., 0]
+        scale = np.hypot(direction[:, 0], direction[:, 1]) * np.hypot(relative[:, 0, 0], relative[:, 0, 1])
+        return cross[:, 0] * cross[:, 1] >= -1e-9 * scale ** 2 # Neighbors on the line itself count as either side
+
+    def _containing(self, points: np.ndarray) -> np.ndarray:
+        """
+        This method checks which inflated obstacles contain any of the points.
+
+        :param points: The points, shape (points, 2).
+        :return: Boolean array of shape (obstacles,).
+        """
+        distance = np.hypot(points[:, None, 0] - self.obstacles[None, :, 0], points[:, None, 1] - self.obstacles[None, :, 1])
+        return np.any(distance < self.obstacles[None, :, 2], axis=0)
+
+    def _inside_obstacle(self, points: np.ndarray) -> np.ndarray:
+        """
+        This method checks which points lie inside any inflated obstacle.
+
+        :param points: The points, shape (points, 2).
+        :return: Boolean array of shape (points,).
+        """
+        distance = np.hypot(points[:, None, 0] - self.obstacles[None, :, 0], points[:, None, 1] - self.obstacles[None, :, 1])
+        return np.any(distance < self.obstacles[None, :, 2], axis=1)
+
+    def _visible(self, a: np.ndarray, b: np.ndarray, ignore: np.ndarray | None = None) -> np.ndarray:
+        """
+        This method checks which straight lines between pairs of points are free of obstacles.
+        The lines are checked in chunks, so the number of distances calculated at once stays below _CHUNK_ELEMENTS for any number of obstacles.
+
+        :param a: First point of every line, shape (lines, 2).
+        :param b: Second point of every line, shape (lines, 2).
+        :param ignore: Boolean array of shape (obstacles,), True for every obstacle not to be checked.
+        :return: Boolean array of shape (lines,).
+        """
+        obstacles = self.obstacles if ignore is None else self.obstacles[~ignore]
+        visible = np.ones(len(a), dtype=bool)
+        if len(obstacles) == 0:
+            return visible
+
+        chunk: int = max(1, _CHUNK_ELEMENTS // len(obstacles))
+        for begin in range(0, len(a), chunk):
+            start, direction = a[begin:begin + chunk], b[begin:begin + chunk] - a[begin:begin + chunk]
+            length_squared = np.maximum(np.sum(direction ** 2, axis=1), 1e-12)
+            to_center = obstacles[None, :, :2] - start[:, None, :] # (lines, obstacles, 2)
+            t = np.clip(np.sum(to_center * direction[:, None, :], axis=2) / length_squared[:, None], 0.0, 1.0)
+            closest = start[:, None, :] + t[..., None] * direction[:, None, :]
+            distance_squared = np.sum((obstacles[None, :, :2] - closest) ** 2, axis=2)
+            visible[begin:begin + chunk] = np.all(distance_squared >= obstacles[None, :, 2] ** 2 * (1 - 1e-9), axis=1) # Touching lines (polygon edges) are free
+        return visible
@@ -0,0 +1,251 @@
+"""
+Bulk generation and storage of many environments (scenario bank).
+
+Scenarios are generated in blocks of candidate maps, each block entirely vectorized:
+- All obstacles of all maps are drawn at once, and obstacles colliding with start or goal are drawn again in vectorized rounds
+  (a map still colliding after _PLACEMENT_TRIES rounds is discarded, like a failed Environment.generate_obstacles)
+- All maps are rasterized like Environment.rasterize_obstacles by scattering the cells of every obstacle's disc at once
+- Traversable maps are filtered by labeling the free cells of all maps in one pass: a map is traversable if start and goal share a component.
+  A* never cuts corners, so 4 and 8 connectivity reach the same cells and the labeling always uses 4 connectivity
+Every block has its own random stream, so the bank only depends on the seed and the block size, not on the number of worker processes.
+
+A bank is a single file: a fixed preamble, a JSON header and the obstacles of all scenarios as float32 (scenarios, obstacles, 3).
+`ScenarioBank` memory-maps the file, so a run loading one scenario by index only reads that scenario.
+"""
+
+import json
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import ndimage
+
+from DroneSwarmPathOpti.config import random_stream, STREAM_ENVIRONMENT
+
+BANK_MAGIC: bytes = b'DSPOBANK'
+BANK_VERSION: int = 1 # Increase whenever the layout of the file changes
+_PREAMBLE: struct.Struct = struct.Struct('<8sQ') # Magic and length of the header
+_ALIGNMENT: int = 64 # The obstacles start at a multiple of this many bytes
+_PLACEMENT_TRIES: int = 10 # Rounds of drawing obstacles colliding with start or goal again
+_CHUNK_CELLS: int = 1 << 22 # Cells of obstacle discs evaluated at once when rasterizing
+_BANK_BLOCK: int = 1 # Key of the bank's streams inside of STREAM_ENVIRONMENT (environments themselves use the empty key)
+
+
+def generate_block(block: int,
+                   size: int,
+                   seed: int,
+                   bounds: tuple[int, int],
+                   start: tuple[int, int, float],
+                   goal: tuple[int, int, float],
+                   obstacles: int,
+                   base_radius: float,
+                   traversable: bool) -> np.ndarray:
+    """
+    This method generates a block of candidate maps and keeps the valid ones.
+
+    :param block: Index of the block, addresses its random stream.
+    :param size: Number of candidate maps in the block.
+    :param seed: Seed of the bank.
+    :param bounds: Width and height of the maps.
+    :param start: Position and radius of the start.
+    :param goal: Position and radius of the goal.
+    :param obstacles: Number of obstacles per map.
+    :param base_radius: Average radius of the obstacles.
+    :param traversable: Only keep maps with a path from start to goal.
+    :return: The obstacles (x, y, radius) of the valid maps in candidate order, shape (maps, obstacles, 3).
+    """
+    rng: np.random.Generator = random_stream(seed, STREAM_ENVIRONMENT, _BANK_BLOCK, block)
+    maps = np.empty((size, obstacles, 3))
+    colliding = np.ones((size, obstacles), dtype=bool)
+    for _ in range(_PLACEMENT_TRIES):
+        count: int = int(np.count_nonzero(colliding))
+        if count == 0:
+            break
+        maps[colliding, 0] = rng.integers(0, bounds[0] + 1, size=count)
+        maps[colliding, 1] = rng.integers(0, bounds[1] + 1, size=count)
+        maps[colliding, 2] = rng.uniform(base_radius * 0.5, base_radius * 1.5, size=count)
+        colliding &= _collides(maps, start) | _collides(maps, goal)
+    valid = ~colliding.any(axis=1)
+
+    if traversable and np.any(valid):
+        candidates = np.flatnonzero(valid)
+        valid[candidates] = traversable_maps(rasterize_maps(maps[candidates], bounds), start[:2], goal[:2])
+    return maps[valid].astype(np.float32)
+
+def rasterize_maps(maps: np.ndarray, bounds: tuple[int, int]) -> np.ndarray:
+    """
+    This method rasterizes the obstacles of many maps like Environment.rasterize_obstacles (one cell per unit, integer radius, half-open bounding box).
+
+    :param maps: The obstacles of every map, shape (maps, obstacles, 3).
+    :param bounds: Width and height of the maps.
+    :return: Boolean grids of shape (maps, height, width), True for every cell overlapping with an obstacle.
+    """
+    width, height = bounds
+    grids = np.zeros((len(maps), height, width), dtype=bool)
+    if maps.size == 0:
+        return grids
+    radii = maps[..., 2].astype(int) # Truncated like int(obstacle.radius)
+    reach: int = int(radii.max())
+    offsets = np.arange(-reach, reach)
+    dy, dx = offsets[None, :, None], offsets[None, None, :]
+
+    maps_index, obstacle_index = np.nonzero(radii > 0)
+    chunk: int = max(1, _CHUNK_CELLS // len(offsets) ** 2) # Obstacles whose discs are scattered at once
+    for begin in range(0, len(maps_index), chunk):
+        m, o = maps_index[begin:begin + chunk], obstacle_index[begin:begin + chunk]
+        r = radii[m, o][:, None, None]
+        ox, oy = maps[m, o, 0].astype(int)[:, None, None], maps[m, o, 1].astype(int)[:, None, None]
+        inside = (dx ** 2 + dy ** 2 <= r ** 2) & (dx >= -r) & (dx < r) & (dy >= -r) & (dy < r)
+        inside &= (ox + dx >= 0) & (ox + dx < width) & (oy + dy >= 0) & (oy + dy < height)
+        k, iy, ix = np.nonzero(inside)
+        grids[m[k], oy[k, 0, 0] + offsets[iy], ox[k, 0, 0] + offsets[ix]] = True
+    return grids
+
+def traversable_maps(grids: np.ndarray, start: tuple[int, int], goal: tuple[int, int]) -> np.ndarray:
+    """
+    This method checks many maps at once for a path from start to goal through the free cells.
+
+    :param grids: Boolean grids of shape (maps, height, width), True for blocked cells.
+    :param start: Starting cell (x, y).
+    :param goal: Goal cell (x, y).
+    :return: Whether every map is traversable, shape (maps,).
+    """
+    height, width = grids.shape[1:]
+    if not (0 <= start[0] < width and 0 <= start[1] < height and 0 <= goal[0] < width and 0 <= goal[1] < height):
+        return np.zeros(len(grids), dtype=bool)
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = ndimage.generate_binary_structure(2, 1) # Neighbors inside of a map only
+    labels, _ = ndimage.label(~grids, structure=structure)
+    start_labels = labels[:, int(start[1]), int(start[0])]
+    return (start_labels > 0) & (start_labels == labels[:, int(goal[1]), int(goal[0])])
+
+def generate_scenario_bank(path: str,
+                           count: int,
+                           seed: int,
+                           bounds: tuple[int, int],
+                           start: tuple[int, int, float],
+                           goal: tuple[int, int, float],
+                           obstacles: int,
+                           base_radius: float,
+                           traversable: bool,
+                           block_size: int = 256,
+                           workers: int = 1) -> int:
+    """
+    This method generates a bank of scenarios in blocks distributed across worker processes and writes it to a file.
+    Blocks are generated in rounds of one block per worker until enough maps are valid. The first count valid maps in block order are kept.
+
+    :param path: File to write to.
+    :param count: Number of scenarios.
+    :param seed: Seed of the bank.
+    :param bounds: Width and height of the maps.
+    :param start: Position and radius of the start.
+    :param goal: Position and radius of the goal.
+    :param obstacles: Number of obstacles per map.
+    :param base_radius: Average radius of the obstacles.
+    :param traversable: Only keep maps with a path from start to goal.
+    :param block_size: Number of candidate maps per block.
+    :param workers: Number of worker processes.
+    :return: Number of candidate maps generated.
+    """
+    if count <= 0 or block_size <= 0 or workers <= 0:
+        raise ValueError(f'Count, block size and workers must be positive, got {count}, {block_size} and {workers}')
+    parameters = (block_size, seed, tuple(bounds), tuple(start), tuple(goal), obstacles, base_radius, traversable)
+    blocks: list[np.ndarray] = []
+    accepted: int = 0
+    with ProcessPoolExecutor(workers) as pool:
+        while accepted < count:
+            first: int = len(blocks)
+            if first * block_size > 100 * count and accepted == 0:
+                raise ValueError(f'No valid scenario among {first * block_size} candidates, the obstacles are too many or too large')
+            for result in pool.map(_generate_block, [(block, *parameters) for block in range(first, first + workers)]):
+                blocks.append(result)
+                accepted += len(result)
+
+    scenarios = np.concatenate(blocks)[:count]
+    write_scenario_bank(path, scenarios, {
+        'seed': seed,
+        'bounds': list(bounds),
+        'start': list(start),
+        'goal': list(goal),
+        'base_radius': base_radius,
+        'traversable': traversable,
+        'block_size': block_size,
+    })
+    return len(blocks) * block_size
+
+def write_scenario_bank(path: str, scenarios: np.ndarray, metadata: dict) -> None:
+    """
+    This method writes scenarios into a single bank file.
+
+    :param path: File to write to.
+    :param scenarios: The obstacles of every scenario, shape (scenarios, obstacles, 3).
+    :param metadata: JSON serializable parameters of the scenarios (bounds, start, goal, ...).
+    :return: None
+    """
+    scenarios = np.ascontiguousarray(scenarios, dtype='<f4')
+    header: dict = {'version': BANK_VERSION, 'scenarios': len(scenarios), 'obstacles': scenarios.shape[1], 'dtype': '<f4', **metadata}
+    encoded: bytes = json.dumps(header).encode()
+    padding: int = -(_PREAMBLE.size + len(encoded)) % _ALIGNMENT
+    with open(path, 'wb') as file:
+        file.write(_PREAMBLE.pack(BANK_MAGIC, len(encoded) + padding))
+        file.write(encoded + b' ' * padding)
+        file.write(scenarios.tobytes())
+
+
+class ScenarioBank:
+    """
+    This class reads a scenario bank lazily: the obstacles are memory-mapped and only the requested scenarios are read.
+    """
+
+    path: str
+    header: dict # Parameters of the scenarios (bounds, start, goal, seed, ...)
+    obstacles: np.ndarray # Obstacles of all scenarios, read-only, shape (scenarios, obstacles, 3)
+
+    def __init__(self, path: str):
+        """
+        :param path: File written by write_scenario_bank.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, length = _PREAMBLE.unpack(file.read(_PREAMBLE.size))
+            if magic != BANK_MAGIC:
+                raise ValueError(f'{path} is not a scenario bank')
+            self.header = json.loads(file.read(length))
+        if self.header['version'] != BANK_VERSION:
+            raise ValueError(f"Scenario bank {path} has version {self.header['version']}, expected {BANK_VERSION}")
+        shape = (self.header['scenarios'], self.header['obstacles'], 3)
+        self.obstacles = (np.memmap(path, dtype=self.header['dtype'], mode='r', offset=_PREAMBLE.size + length, shape=shape)
+                          if shape[0] > 0 and shape[1] > 0 else np.empty(shape, dtype=self.header['dtype']))
+
+    def __len__(self) -> int:
+        return self.header['scenarios']
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """
+        This method reads the obstacles of a scenario.
+
+        :param index: Index of the scenario.
+        :return: The obstacles (x, y, radius), shape (obstacles, 3).
+        """
+        return np.asarray(self.obstacles[index], dtype=float)
+
+
+def _collides(maps: np.ndarray, map_object: tuple[int, int, float]) -> np.ndarray:
+    """
+    This method checks the obstacles of many maps for collisions with an object like collision_objects.
+
+    :param maps: The obstacles, shape (maps, obstacles, 3).
+    :param map_object: Position and radius of the object.
+    :return: Whether every obstacle collides with the object, shape (maps, obstacles).
+    """
+    x, y, radius = map_object
+    return (maps[..., 0] - x) ** 2 + (maps[..., 1] - y) ** 2 < (maps[..., 2] + radius) ** 2
+
+def _generate_block(arguments: tuple) -> np.ndarray:
+    """
+    Generates a block in a worker process (see generate_block).
+
+    :param arguments: The arguments of generate_block.
+    :return: The obstacles of the valid maps of the block.
+    """
+    return generate_block(*arguments)
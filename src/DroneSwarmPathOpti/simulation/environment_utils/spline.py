@@ -38,6 +38,16 @@ class CubicBSpline:
         self.x = CubicSpline(t_temp, x_temp) # Interpolate X-movement
         self.y = CubicSpline(t_temp, y_temp) # Interpolate Y-movement
 
+    def get_coefficients(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the piecewise polynomial coefficients of the path.
+
+        Segment i covers the time interval [t[i], t[i+1]] and is a cubic in the local time (t - t[i]).
+
+        :return: Tuple of the x and y coefficients, each of shape (segments, 4), highest degree first.
+        """
+        return self.x.c.T, self.y.c.T
+
     def calculate_energy_usage(self, resolution: int = 50, alpha: float = 1.0, beta: float = 0.1) -> float:
         """
         Compute the estimated energy consumption along a 2D path based on velocity and acceleration profiles.
@@ -0,0 +1,242 @@
+"""
+Export of sampled drone trajectories in a compact columnar format.
+
+Every drone's spline is sampled at a fixed rate into float32 columns (TRAJECTORY_COLUMNS). Samples are produced and
+written in chunks, so a trajectory never has to be held in memory as a whole. Every chunk is stored column by column:
+- 'binary': one raw float32 file (memory-mapped when reading) and a JSON header (<file>.json) describing the chunks
+- 'npz': one uncompressed `.npz` archive with an array per chunk and the header as an additional member
+The header holds the columns, the sampling rate, the duration of every trajectory and arbitrary run metadata.
+`TrajectoryReader` reads both formats lazily: only the chunks of the requested drones are accessed.
+"""
+
+import json
+import os
+import zipfile
+from typing import Iterator
+
+import numpy as np
+
+from .spline import CubicBSpline
+
+TRAJECTORY_FORMATS = ('binary', 'npz')
+TRAJECTORY_COLUMNS: tuple[str, ...] = ('t', 'x', 'y', 'vx', 'vy', 'speed')
+
+_CHUNK_SAMPLES: int = 65536 # Samples sampled and written at once
+_HEADER_MEMBER: str = 'header.json' # Header inside of an npz archive
+
+
+def sample_trajectory(spline: CubicBSpline, rate: float, chunk_samples: int = _CHUNK_SAMPLES) -> Iterator[np.ndarray]:
+    """
+    Samples a spline at a fixed rate, chunk by chunk. The times are 0, 1 / rate, 2 / rate, ... up to the duration of the spline.
+
+    :param spline: The spline of a drone.
+    :param rate: Samples per time unit.
+    :param chunk_samples: Maximum number of samples per chunk.
+    :return: An iterator of chunks, each of shape (columns, samples) and dtype float32.
+    """
+    if rate <= 0:
+        raise ValueError(f'Sampling rate must be positive, got {rate}')
+    duration: float = float(spline.t[-1])
+    samples: int = int(np.floor(duration * rate + 1e-9)) + 1
+    dx, dy = spline.x.derivative(), spline.y.derivative()
+
+    for begin in range(0, samples, chunk_samples):
+        t = np.arange(begin, min(begin + chunk_samples, samples)) / rate
+        vx, vy = dx(t), dy(t)
+        yield np.stack([t, spline.x(t), spline.y(t), vx, vy, np.hypot(vx, vy)]).astype(np.float32)
+
+
+class TrajectoryWriter:
+    """
+    This class streams sampled trajectories to a file (see module documentation). The header is written when the writer is closed.
+    """
+
+    path: str
+    rate: float # Samples per time unit
+    file_format: str # One of TRAJECTORY_FORMATS
+    metadata: dict # Run metadata stored in the header
+
+    drones: list[dict] # Duration, number of samples and further properties of every written trajectory
+    chunks: list[list[int]] # Drone, offset (in values, binary only) and number of samples of every chunk
+
+    def __init__(self, path: str, rate: float, file_format: str = 'binary', metadata: dict | None = None):
+        """
+        :param path: File to write to.
+        :param rate: Samples per time unit.
+        :param file_format: One of TRAJECTORY_FORMATS.
+        :param metadata: JSON serializable run metadata stored in the header.
+        """
+        if file_format not in TRAJECTORY_FORMATS:
+            raise ValueError(f"Unknown trajectory format '{file_format}', expected one of {TRAJECTORY_FORMATS}")
+        self.path = path
+        self.rate = rate
+        self.file_format = file_format
+        self.metadata = metadata or {}
+        self.drones = []
+        self.chunks = []
+
+        self._offset: int = 0
+        if file_format == 'binary':
+            self._stream = open(path, 'wb')
+        else:
+            self._archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, spline: CubicBSpline, **properties) -> int:
+        """
+        This method samples the trajectory of a drone and streams it to the file.
+
+        :param spline: The spline of the drone.
+        :param properties: Further JSON serializable properties of the drone stored in the header (e.g. its radius).
+        :return: Index of the drone in the file.
+        """
+        drone: int = len(self.drones)
+        samples: int = 0
+        for chunk in sample_trajectory(spline, self.rate):
+            length: int = chunk.shape[1]
+            if self.file_format == 'binary':
+                self._stream.write(chunk.tobytes()) # Column by column
+                self.chunks.append([drone, self._offset, length])
+                self._offset += chunk.size
+            else:
+                with self._archive.open(f'{drone}_{len(self.chunks)}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, chunk, allow_pickle=False)
+                self.chunks.append([drone, 0, length])
+            samples += length
+
+        self.drones.append({'duration': float(spline.t[-1]), 'samples': samples, **properties})
+        return drone
+
+    def close(self) -> None:
+        """
+        This method writes the header and closes the file.
+
+        :return: None
+        """
+        header = json.dumps({
+            'columns': list(TRAJECTORY_COLUMNS),
+            'dtype': 'float32',
+            'rate': self.rate,
+            'drones': self.drones,
+            'chunks': self.chunks,
+            'metadata': self.metadata
+        })
+        if self.file_format == 'binary':
+            self._stream.close()
+            with open(f'{self.path}.json', 'w') as file:
+                file.write(header)
+        else:
+            self._archive.writestr(_HEADER_MEMBER, header)
+            self._archive.close()
+
+    def __enter__(self) -> 'TrajectoryWriter':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    This class reads trajectories written by a TrajectoryWriter lazily.
+    """
+
+    path: str
+    file_format: str # One of TRAJECTORY_FORMATS
+    columns: list[str]
+    rate: float # Samples per time unit
+    drones: list[dict] # Duration, number of samples and further properties of every trajectory
+    metadata: dict # Run metadata
+
+    def __init__(self, path: str):
+        """
+        :param path: File written by a TrajectoryWriter. The format is detected automatically.
+        """
+        self.path = path
+        if zipfile.is_zipfile(path): # Checked first, a header next to the archive may be left by an earlier binary export
+            self.file_format = 'npz'
+            self._archive = np.load(path, allow_pickle=False) # Members are only read when accessed
+            header = json.loads(self._archive.zip.read(_HEADER_MEMBER))
+        else:
+            self.file_format = 'binary'
+            with open(f'{path}.json') as file:
+                header = json.load(file)
+            self._values = np.memmap(path, dtype=header['dtype'], mode='r') if os.path.getsize(path) > 0 else np.empty(0, dtype=header['dtype'])
+
+        self.columns = header['columns']
+        self.rate = header['rate']
+        self.drones = header['drones']
+        self.metadata = header['metadata']
+        self._chunks: list[list[tuple[int, int, int]]] = [[] for _ in self.drones] # Chunk index, offset and samples per drone
+        for index, (drone, offset, samples) in enumerate(header['chunks']):
+            self._chunks[drone].append((index, offset, samples))
+
+    def __len__(self) -> int:
+        return len(self.drones)
+
+    def chunks(self, drone: int) -> Iterator[np.ndarray]:
+        """
+        This method iterates over the chunks of a trajectory without reading the others.
+
+        :param drone: Index of the drone.
+        :return: An iterator of chunks, each of shape (columns, samples). Chunks of binary files are read-only views of the memory map.
+        """
+        for index, offset, samples in self._chunks[drone]:
+            if self.file_format == 'binary':
+                yield self._values[offset:offset + samples * len(self.columns)].reshape(len(self.columns), samples)
+            else:
+                yield self._archive[f'{drone}_{index}']
+
+    def trajectory(self, drone: int) -> dict[str, np.ndarray]:
+        """
+        This method reads the whole trajectory of a drone.
+
+        :param drone: Index of the drone.
+        :return: Mapping of column names to their values. A trajectory stored in a single chunk of a binary file is not copied.
+        """
+        chunks = list(self.chunks(drone))
+        values = chunks[0] if len(chunks) == 1 else np.concatenate(chunks, axis=1) if chunks else np.empty((len(self.columns), 0), dtype=np.float32)
+        return dict(zip(self.columns, values))
+
+    def column(self, drone: int, name: str) -> np.ndarray:
+        """
+        This method reads a single column of the trajectory of a drone.
+
+        :param drone: Index of the drone.
+        :param name: Name of the column, one of the columns of the file.
+        :return: The values of the column.
+        """
+        return self.trajectory(drone)[name]
+
+    def close(self) -> None:
+        """
+        This method releases the file.
+
+        :return: None
+        """
+        if self.file_format == 'binary':
+            self._values = None
+        else:
+            self._archive.close()
+
+    def __enter__(self) -> 'TrajectoryReader':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def export_trajectories(path: str, splines: list[CubicBSpline], rate: float, file_format: str = 'binary', metadata: dict | None = None, radii: list[float] | None = None) -> None:
+    """
+    This method samples the splines of all drones and writes them to a file (see TrajectoryWriter).
+
+    :param path: File to write to.
+    :param splines: The spline of every drone.
+    :param rate: Samples per time unit.
+    :param file_format: One of TRAJECTORY_FORMATS.
+    :param metadata: JSON serializable run metadata stored in the header.
+    :param radii: Radius of every drone, stored in the header.
+    :return: None
+    """
+    with TrajectoryWriter(path, rate, file_format, metadata) as writer:
+        for i, spline in enumerate(splines):
+            writer.write(spline, **({'radius': float(radii[i])} if radii is not None else {}))
@@ -1,6 +1,3 @@
-import collections
-import colorsys
-
 import matplotlib
 import matplotlib.pyplot as plt
 
@@ -8,11 +5,9 @@ from DroneSwarmPathOpti.config import get_settings
 
 matplotlib.use('TkAgg')
 import numpy as np
-from matplotlib import cm
-from matplotlib.collections import LineCollection
+from matplotlib.collections import EllipseCollection, LineCollection
 from matplotlib.patches import Circle
 from matplotlib.widgets import Slider
-from scipy.interpolate import interp1d
 
 from DroneSwarmPathOpti.simulation import Environment
 
@@ -22,16 +17,31 @@ plot: matplotlib.pyplot
 fig, ax = plt.subplots()
 plt.title("Map")
 
+_PILOT_SAMPLES: int = 16 # Minimum samples per knot interval estimating the length and the curvature of a drone path on screen
+_PILOT_SPACING: float = 8.0 # Largest distance in pixels between two of these samples
+_TOLERANCE: float = 0.5 # Largest distance in pixels between a drawn path and the exact one
+
+
 def plot_environment(environment: Environment):
     """
     This method plots a specified environment including its obstacles, drones and their respective paths.
 
+    The plot stays responsive for large fleets and long paths:
+        - Obstacles, paths, collisions and control points are drawn as a few collections instead of one artist per object
+        - Paths are sampled according to their curvature on screen (straight parts get few samples) and decimated to the screen resolution (consecutive samples inside of the same pixel are merged)
+        - The positions of all drones are precomputed for every step of the time slider, so moving the slider only replaces the offsets of the drone markers
+        - Slider updates redraw only the drone markers and the slider on top of a cached background (blitting)
+
     :param environment: The specified environment to plot.
     """
+    ax.set_aspect('equal')
+    ax.set_xlim(0, environment.bounds[0])
+    ax.set_ylim(0, environment.bounds[1])
+    plt.grid(True)
+
     # Draw obstacles
-    for obstacle in environment.obstacles:
-        circle = Circle(obstacle.position, obstacle.radius, color='black', alpha=0.5)
-        ax.add_patch(circle)
+    obstacles: np.ndarray = environment.get_obstacle_array()
+    ax.add_collection(_circles(obstacles[:, :2], obstacles[:, 2], color='black', alpha=0.5))
 
     # Draw the start
     if environment.start:
@@ -48,70 +58,133 @@ def plot_environment(environment: Environment):
         x_vals, y_vals = zip(*environment.validation_path)
         ax.plot(x_vals, y_vals, color='red', linewidth=2, label="Path")
 
-    t_max: float = 0
+    # Draw the paths of all drones as a single collection, brighter where a drone is faster
+    colormap = matplotlib.colormaps['brg'].resampled(len(environment.drones))
+    pixels_per_unit: float = fig.dpi * fig.get_size_inches()[0] * ax.get_position().width / environment.bounds[0]
+    segments: list[np.ndarray] = []
+    colors: list[np.ndarray] = []
     for i, drone in enumerate(environment.drones):
-        spline = drone.path
-        if spline.t[-1] > t_max:
-            t_max = float(spline.t[-1])
-        t_vals = np.linspace(spline.t[0], spline.t[-1], 200)
+        path_segments, velocities = _decimated_path(drone.path, pixels_per_unit)
+        v_norm = (velocities - 0.1) / (settings.DRONE_MAX_SPEED - 0.1 + 1e-9) # Normalizing
+        segments.append(path_segments)
+        colors.append(_shade(np.array(colormap(i)[:3]), v_norm))
+    if segments:
+        ax.add_collection(LineCollection(np.concatenate(segments), colors=np.concatenate(colors), linewidth=2))
 
-        x_vals = spline.x(t_vals)
-        y_vals = spline.y(t_vals)
+    # Draw collisions
+    collisions_drones = np.array(environment.get_collisions_drones(), dtype=float).reshape(-1, 2)
+    collisions_obstacles = np.array(environment.get_collisions_obstacles(), dtype=float).reshape(-1, 2)
+    ax.scatter(collisions_drones[:, 0], collisions_drones[:, 1], color='#ff6f00', marker='o', s=36, zorder=3)
+    ax.scatter(collisions_obstacles[:, 0], collisions_obstacles[:, 1], color='#e61d12', marker='o', s=9, zorder=3)
+
+    control_points = np.array([point[:2] for drone in environment.drones for point in drone.path.raw_path[1:-1]], dtype=float).reshape(-1, 2)
+    ax.scatter(control_points[:, 0], control_points[:, 1], color='#e612d8', marker='x', s=36, zorder=3)
+
+    # Precompute the positions of all drones at every step of the slider (drones stay at their goal once they arrived)
+    t_max: float = max((float(drone.path.t[-1]) for drone in environment.drones), default=0.0)
+    steps = np.linspace(0, t_max, settings.PLOT_TIME_STEPS + 1)
+    positions = np.empty((len(steps), len(environment.drones), 2))
+    for i, drone in enumerate(environment.drones):
+        t = np.minimum(steps, drone.path.t[-1])
+        positions[:, i, 0] = drone.path.x(t)
+        positions[:, i, 1] = drone.path.y(t)
 
-        # Velocity interpolation
-        v_vals = interp1d(spline.t, [p[2] for p in spline.raw_path], kind='linear', fill_value='extrapolate')(t_vals)
-        v_norm: collections.Iterable = np.array((v_vals - 0.1) / (settings.DRONE_MAX_SPEED - 0.1 + 1e-9)) # Normalizing
+    ax_slider = plt.axes((0.15, 0.02, 0.7, 0.04))
+    slider = Slider(ax_slider, 't', 0, t_max, valinit=0, valstep=steps)
+    slider.drawon = False # The slider is blitted together with the drones instead of redrawing the whole figure
 
-        # Base color for the path
-        base_rgb = cm.get_cmap("brg", len(environment.drones))(i)[:3]
-        h, l, s = colorsys.rgb_to_hls(*base_rgb)
+    drone_markers = _circles(positions[0], np.array([drone.radius for drone in environment.drones], dtype=float), color='pink', alpha=0.8)
+    drone_markers.set_animated(True) # Only drawn when blitting
+    ax.add_collection(drone_markers)
 
-        # Adjust every point's brightness according to velocity
-        colors = [colorsys.hls_to_rgb(h, l * (0.2 + 0.8 * vn), s) for vn in v_norm]
+    background = None
 
-        # build line segments
-        points = np.array([x_vals, y_vals]).T.reshape(-1, 1, 2)
-        segments = np.concatenate([points[:-1], points[1:]], axis=1)
+    def on_draw(event):
+        nonlocal background
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+        fig.draw_artist(drone_markers)
 
-        lc = LineCollection(segments, colors=colors[:-1], linewidth=2)
-        ax.add_collection(lc)
+    def update(val):
+        step: int = int(np.searchsorted(steps, slider.val - 1e-9)) # The slider only takes values of the grid
+        drone_markers.set_offsets(positions[min(step, len(steps) - 1)])
+        if background is None:
+            fig.canvas.draw_idle()
+            return
+        fig.canvas.restore_region(background)
+        fig.draw_artist(drone_markers)
+        fig.draw_artist(ax_slider)
+        fig.canvas.blit(fig.bbox)
+
+    fig.canvas.mpl_connect('draw_event', on_draw)
+    slider.on_changed(update)
+    plt.show()
 
-    # Draw collisions
-    for collision in environment.get_collisions_drones():
-        x, y = collision
-        ax.plot(x, y, color='#ff6f00', marker='o', markersize=6, linestyle='None')
-    for collision in environment.get_collisions_obstacles():
-        x, y = collision
-        ax.plot(x, y, color='#e61d12', marker='o', markersize=3, linestyle='None')
+def _circles(centers: np.ndarray, radii: np.ndarray, **kwargs) -> EllipseCollection:
+    """
+    This method creates a single collection of circles whose size is given in data units.
 
-    for drone in environment.drones:
-        for control_point in drone.path.raw_path[1:-1]:
-            ax.plot(control_point[0], control_point[1], color='#e612d8', marker='x', markersize=6, linestyle='None')
+    :param centers: The centers, shape (circles, 2).
+    :param radii: The radii, shape (circles,).
+    :param kwargs: Further properties of the collection (color, alpha, ...).
+    :return: The collection.
+    """
+    return EllipseCollection(2 * radii, 2 * radii, np.zeros(len(radii)), units='xy', offsets=centers.reshape(-1, 2), offset_transform=ax.transData, **kwargs)
 
-    ax_slider = plt.axes((0.15, 0.02, 0.7, 0.04))
-    slider = Slider(ax_slider, 't', 0, t_max, valinit=0, valstep=t_max / 200)
+def _decimated_path(spline, pixels_per_unit: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    This method samples a drone path according to its length and curvature on screen and merges consecutive samples falling into the same pixel.
+    A chord of length h on a curve of curvature k deviates by about k * h^2 / 8 from it, so the samples are spread along the path with steps of sqrt(8 * _TOLERANCE / k) pixels:
+    long and winding paths get as many samples as they need, straight parts only a few.
 
-    drone_circles: list[Circle] = []
-    for drone in environment.drones:
-        circle = Circle(environment.start.position, drone.radius, color='pink', alpha=0.8)
-        drone_circles.append(circle)
-        ax.add_patch(circle)
+    :param spline: The path of the drone.
+    :param pixels_per_unit: Pixels per unit of the environment on screen.
+    :return: A tuple of the line segments, shape (segments, 2, 2), and the drone velocity at the start of every segment, shape (segments,).
+    """
+    pilot = _pilot_times(spline.t, np.full(len(spline.t) - 1, _PILOT_SAMPLES))
+    lengths = np.add.reduceat(np.hypot(np.diff(spline.x(pilot)), np.diff(spline.y(pilot))), np.arange(0, len(pilot) - 1, _PILOT_SAMPLES)) * pixels_per_unit
+    pilot = _pilot_times(spline.t, np.maximum(_PILOT_SAMPLES, np.ceil(lengths / _PILOT_SPACING)).astype(int)) # Long knot intervals get more samples
+    dx, dy = spline.x(pilot, 1), spline.y(pilot, 1)
+    speed = np.maximum(np.hypot(dx, dy), 1e-12)
+    curvature = np.abs(dx * spline.y(pilot, 2) - dy * spline.x(pilot, 2)) / speed ** 3 / pixels_per_unit # Per pixel
+    step = np.maximum(np.sqrt(8 * _TOLERANCE / np.maximum(curvature, 1e-12)), 1.0) # Pixels between two samples, at most one sample per pixel
+    arc = np.hypot(np.diff(spline.x(pilot)), np.diff(spline.y(pilot))) * pixels_per_unit # Length of every pilot interval on screen
+    needed = np.concatenate(([0.0], np.cumsum(arc / np.minimum(step[:-1], step[1:])))) # Samples needed up to every pilot sample
+    t = np.interp(np.linspace(0, needed[-1], max(2, int(np.ceil(needed[-1])) + 1)), needed, pilot)
+
+    points = np.column_stack((spline.x(t), spline.y(t)))
+    pixels = np.floor(points * pixels_per_unit)
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:-1] = np.any(pixels[1:-1] != pixels[:-2], axis=1) # The first and the last sample are always kept
+    points, t = points[keep], t[keep]
+    velocities = np.interp(t, spline.t, [p[2] for p in spline.raw_path]) # Velocity interpolation
+    return np.stack((points[:-1], points[1:]), axis=1), velocities[:-1]
+
+def _pilot_times(knots: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    This method spreads samples evenly inside of every knot interval, however short it is.
 
-    def update(val):
-        t_current = slider.val
-        for _circle, _drone in zip(drone_circles, environment.drones):
-            if t_current < _drone.path.t[-1]:
-                new_pos: tuple[float, float] = (_drone.path.x(t_current), _drone.path.y(t_current))
-                _circle._center = new_pos
-            else:
-                new_pos: tuple[float, float] = (_drone.path.x(_drone.path.t[-1]), _drone.path.y(_drone.path.t[-1]))
-                _circle._center = new_pos
-        fig.canvas.draw_idle()
+    :param knots: The knot times, shape (knots,).
+    :param counts: Number of samples of every knot interval, shape (knots - 1,).
+    :return: The sample times including the last knot, shape (sum(counts) + 1,).
+    """
+    interval = np.repeat(np.arange(len(counts)), counts)
+    fractions = (np.arange(len(interval)) - np.repeat(np.cumsum(counts) - counts, counts)) / counts[interval]
+    return np.append(knots[interval] + np.diff(knots)[interval] * fractions, knots[-1])
 
-    slider.on_changed(update)
+def _shade(rgb: np.ndarray, v_norm: np.ndarray) -> np.ndarray:
+    """
+    This method adjusts the brightness of a base color according to normalized velocities (HLS lightness scaled by 0.2 to 1.0).
 
-    plt.grid(True)
-    ax.set_aspect('equal')
-    ax.set_xlim(0, environment.bounds[0])
-    ax.set_ylim(0, environment.bounds[1])
-    plt.show()
+    :param rgb: The base color, shape (3,).
+    :param v_norm: The normalized velocities, shape (n,).
+    :return: The colors, shape (n, 3).
+    """
+    high, low = rgb.max(), rgb.min()
+    lightness = (high + low) / 2
+    if high == low:
+        return np.repeat(np.clip(lightness * (0.2 + 0.8 * v_norm), 0, 1)[:, None], 3, axis=1)
+    saturation = (high - low) / (high + low) if lightness <= 0.5 else (high - low) / (2 - high - low)
+    lightness = np.clip(lightness * (0.2 + 0.8 * v_norm), 0, 1)[:, None]
+    chroma = np.where(lightness <= 0.5, lightness * (1 + saturation), lightness + saturation - lightness * saturation) # Upper channel of the adjusted color
+    lower = 2 * lightness - chroma
+    return lower + (chroma - lower) * (rgb - low) / (high - low) # Every channel keeps its position between the lowest and the highest channel